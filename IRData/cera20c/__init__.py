@@ -47,9 +47,25 @@ will then load the precipitation rates at quarter past 3pm on March 12 1969 from
 
 Note that precipitation in CERA-20C is reported as metres accumulated, and it accumulates over the whole 27-hour forecast, so it reports precip at 15:00 as (accumulated precip at 12:00)+(accumulation in the period 12-15). This module removes the across-timestep accumulation, so 'loading' precip at 15:00 only gives the accumulation in the period 12-15, and the units are 'm accumulated in the last 3-hours'. It is this 3-hour-accumulation that is interpolated if you 'load' the precipitation for a period between timesteps.
 
+To do the de-accumulation for a whole month at once, reading each field only once, use :func:`make_deaccumulated_prate`. The result is stored beside the data, and :func:`load` will use it instead of de-accumulating each field as it is loaded:
+
+.. code-block:: python
+
+    cera20c.make_deaccumulated_prate(1969,3)
+
+To make normals and standard deviations (for each hour of each day of the year) from previously fetched data:
+
+.. code-block:: python
+
+    cera20c.build_climatology('prmsl',range(1951,1981))
+
+The climatology is made in a single pass, one field at a time, using several processes. Running it again with more years adds the new years to the existing climatology, without re-reading the data already used.
+
 |
 """
 
 from .utils import *
 from .fetch import *
 from .load import *
+from .precipitation import *
+from .climatology import *
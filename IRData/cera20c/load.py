@@ -21,6 +21,7 @@ import datetime
 import numpy as np
 
 from .utils import _hourly_get_file_name
+from .utils import _deaccumulated_file_name
 from .utils import _translate_for_file_names
 from .utils import monolevel_analysis
 from .utils import monolevel_forecast
@@ -70,6 +71,20 @@ def _get_slice_at_hour_at_timestep(
     if not _is_in_file(variable, year, month, day, hour):
         raise ValueError("Invalid hour - data not in file")
 
+    file_name = _hourly_get_file_name(
+        variable, year, month, day, hour, type=type, fc_init=fc_init
+    )
+
+    # Precipitation may already have been de-accumulated
+    #  - see make_deaccumulated_prate
+    if (
+        variable == "prate"
+        and deaccumulate
+        and os.path.isfile(_deaccumulated_file_name(file_name))
+    ):
+        file_name = _deaccumulated_file_name(file_name)
+        deaccumulate = False
+
     # Precipitation is accumulated over the forecast, convert to
     # Accumulation over last (3-hour timestep)
     # Still in weird units, be careful.
@@ -85,13 +100,18 @@ def _get_slice_at_hour_at_timestep(
         lt = datetime.datetime(year, month, day, int(hour)) - datetime.timedelta(
             hours=3
         )
+        # The 27-hour forecast follows on from the
+        #  24-hour forecast in the main file
+        lt_fc_init = fc_init
+        if fc_init == "last":
+            lt_fc_init = None
         r2 = _get_slice_at_hour_at_timestep(
             variable,
             lt.year,
             lt.month,
             lt.day,
             lt.hour,
-            fc_init=fc_init,
+            fc_init=lt_fc_init,
             deaccumulate=False,
         )
         r1.data = r1.data - r2.data  # to m/(3-hour period)
@@ -102,9 +122,6 @@ def _get_slice_at_hour_at_timestep(
         return r1
 
     # Not precipitation - just get the data for this timestep
-    file_name = _hourly_get_file_name(
-        variable, year, month, day, hour, type=type, fc_init=fc_init
-    )
     if not os.path.isfile(file_name):
         raise Exception(
             ("%s for %04d/%02d not available" + " might need cera20c.fetch")
@@ -0,0 +1,111 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+
+# Convert the CERA-20C precipitation data, accumulated over each
+#  forecast, into accumulations over each 3-hour timestep.
+
+import os
+import calendar
+import datetime
+import dask.array as da
+import iris
+
+from .utils import _hourly_get_file_name
+from .utils import _deaccumulated_file_name
+
+
+def _check_times(cube, n_days, steps, first_day):
+    """Check the data in the file is the 18Z forecast from each day
+    of the month, ordered by validity time."""
+    tc = cube.coord("time")
+    if tc.shape[0] != n_days * steps:
+        raise Exception(
+            "%s has %d times, expected %d" % (cube.name(), tc.shape[0], n_days * steps)
+        )
+    dates = tc.units.num2date(tc.points)
+    if dates[0].day != first_day or dates[0].hour != 21:
+        raise Exception(
+            "%s starts at %s, expected 21:00 on day %d"
+            % (cube.name(), dates[0].strftime("%Y-%m-%d:%H"), first_day)
+        )
+    spacing = datetime.timedelta(hours=24 // steps)
+    for index in range(1, len(dates)):
+        if dates[index] - dates[index - 1] != spacing:
+            raise Exception("%s times are not evenly spaced" % cube.name())
+
+
+def _save(cube, file_name):
+    """Write to a temporary file, so an interrupted save doesn't leave
+    a partial file that looks like finished data."""
+    cube.attributes["comment"] = (
+        "Accumulation over the last 3 hours - see "
+        + "IRData.cera20c.make_deaccumulated_prate"
+    )
+    iris.save(cube, "%s.part" % file_name, saver="nc")
+    os.rename("%s.part" % file_name, file_name)
+
+
+def make_deaccumulated_prate(year, month):
+    """Convert the CERA-20C precipitation for one month from accumulations over the forecast into 3-hour accumulations.
+
+    The precipitation data in CERA-20C accumulate over the whole forecast (see :func:`load`), so to get the precipitation in each 3-hour period :func:`load` has to read two fields and subtract one from the other. This function does the subtraction for a whole month at once, reading each field only once, and stores the result beside the original data. :func:`load` will then use the stored 3-hour accumulations instead of doing the subtraction itself.
+
+    If the de-accumulated data for the month already exists, this function does nothing.
+
+    Args:
+        year (:obj:`int`): Year to make data for.
+        month (:obj:`int`): Month to make data for (1-12).
+
+    Needs the precipitation data, previously retrieved by :func:`fetch`, for the month. If the 27-hour forecast data (used by :func:`load` with fc_init='last') is available, that is de-accumulated as well.
+
+    Raises:
+        StandardError: Precipitation data not on disc - see :func:`fetch`
+
+    |
+    """
+    n_days = calendar.monthrange(year, month)[1]
+    acc_file = _hourly_get_file_name("prate", year, month)
+    p1d_file = _hourly_get_file_name("prate", year, month, fc_init="last")
+    deacc_file = _deaccumulated_file_name(acc_file)
+    p1d_deacc_file = _deaccumulated_file_name(p1d_file)
+    if os.path.isfile(deacc_file) and (
+        os.path.isfile(p1d_deacc_file) or not os.path.isfile(p1d_file)
+    ):
+        # Made this data already
+        return
+    if not os.path.isfile(acc_file):
+        raise Exception(
+            ("prate for %04d/%02d not available" + " might need cera20c.fetch")
+            % (year, month)
+        )
+
+    # One forecast a day, each with 8 steps (3-24 hours).
+    #  Keep it lazy, and chunked by forecast, so only a few days
+    #  of data are in memory at once.
+    acc = iris.load_cube(acc_file)
+    _check_times(acc, n_days, 8, 1)
+    acc_data = da.asarray(acc.core_data()).rechunk((8,) + acc.shape[1:])
+    by_fc = acc_data.reshape((n_days, 8) + acc.shape[1:])
+    # First step is already a 3-hour accumulation, the others
+    #  are differences from the previous step.
+    deacc = da.concatenate([by_fc[:, :1], by_fc[:, 1:] - by_fc[:, :-1]], axis=1)
+    if not os.path.isfile(deacc_file):
+        _save(acc.copy(data=deacc.reshape(acc.shape)), deacc_file)
+
+    # The 27-hour step is the 24-hour step from the same forecast,
+    #  plus the accumulation in the last 3 hours.
+    if os.path.isfile(p1d_file) and not os.path.isfile(p1d_deacc_file):
+        p1d = iris.load_cube(p1d_file)
+        _check_times(p1d, n_days, 1, 2)
+        p1d_data = da.asarray(p1d.core_data())
+        _save(p1d.copy(data=p1d_data - by_fc[:, 7]), p1d_deacc_file)
@@ -108,3 +108,9 @@ def _hourly_get_file_name(
 
     name = "%s/hourly/%04d/%02d/%s.nc" % (base_dir, year, month, variable)
     return name
+
+
+# File name for the de-accumulated version of a precipitation file
+#  - see cera20c.make_deaccumulated_prate
+def _deaccumulated_file_name(file_name):
+    return "%s.deacc.nc" % file_name[:-3]
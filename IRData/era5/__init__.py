@@ -39,6 +39,8 @@ For example:
 
 will retrieve precipitation rate data for the selected date. ERA5 data is fetched in one-calendar-month blocks, so this will retrieve data for the whole of March 2015. The retrieval is slow, as the data has to be fetched from MARS at ECMWF, but the retrieval is only run if necessary - if that month's data has been previously fetched and is already on local disc, the fetch command will detect this and return instantly.
 
+To get data sooner, set chunk='day' (or chunk='week') and the month will be fetched as several smaller requests, run in parallel (up to 'workers' at once). :func:`load` can use each chunk as soon as it has arrived, and when the whole month has arrived the chunks are joined into the usual monthly file.
+
 Once the data has been fetched, 
 
 .. code-block:: python
@@ -49,9 +51,41 @@ Once the data has been fetched,
 
 will then load the precipitation rates at quarter past 3pm on March 12 2015 from the retrieved dataset as a :class:`iris.cube.Cube`. Note that as ERA5 only provides data at hourly or 3-hourly intervals, the value for 3:15pm will be interpolated between the outputs. Also, as ERA5 stream 'enda' is an ensemble dataset, the result will include all 10 ensemble members.
 
+To load a sequence of fields, use :func:`load_series` rather than calling :func:`load` repeatedly:
+
+.. code-block:: python
+
+    pr=era5.load_series('prate',
+                        datetime.datetime(2015,3,12),
+                        datetime.datetime(2015,3,26),
+                        datetime.timedelta(minutes=30),
+                        stream='enda')
+
+will give a single cube, with a time dimension, containing the precipitation rates every half-hour for two weeks. Each data file is only read once, however many fields come from it.
+
+ERA5 precipitation comes from two forecasts a day, started at 06:00 and 18:00, and switching from one to the other gives a discontinuity in the fields. For a time-continuous series (for videos) make a blended product, once for each month, and then load that:
+
+.. code-block:: python
+
+    era5.make_blended_prate(2015,3,stream='enda')
+    pr=era5.load('prate',
+                 datetime.datetime(2015,3,12,15,15),
+                 stream='enda',
+                 fc_init='blend')
+
+To make normals and standard deviations (for each hour of each day of the year) from previously fetched data:
+
+.. code-block:: python
+
+    era5.build_climatology('prmsl',range(1981,2011))
+
+The climatology is made in a single pass, one field at a time, using several processes. Running it again with more years adds the new years to the existing climatology, without re-reading the data already used.
+
 |
 """
 
 from .utils import *
 from .fetch import *
 from .load import *
+from .precipitation import *
+from .climatology import *
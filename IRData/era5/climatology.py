@@ -0,0 +1,100 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+
+# Make ERA5 normals and standard deviations from previously downloaded data.
+
+import os
+import datetime
+
+from .utils import _hourly_get_file_name
+from .utils import monolevel_analysis
+from .utils import monolevel_forecast
+from .load import _enhance_slice
+from ..utils.climatology import _build_climatology
+from ..utils.climatology import climatology_year
+from ..utils.climatology import _cached_file_cube
+from ..utils.climatology import _field_at_time
+
+
+# One field for the climatology - run in a worker process
+def _get_climatology_field(year, month, day, hour, variable, stream):
+    file_name = _hourly_get_file_name(variable, year, month, day, hour, stream=stream)
+    if not os.path.isfile(file_name):
+        raise Exception(
+            ("%s for %04d/%02d not available" + " might need era5.fetch")
+            % (variable, year, month)
+        )
+    cube = _cached_file_cube(file_name, os.path.getmtime(file_name))
+    return _enhance_slice(
+        _field_at_time(cube, datetime.datetime(year, month, day, hour)),
+        stream=stream,
+    )
+
+
+def build_climatology(variable, years, months=None, stream="enda", workers=None):
+    """Make the normals and standard deviations for a variable, from previously downloaded data.
+
+    Data for all the years must be available in directory $SCRATCH/ERA5, previously retrieved by :func:`fetch`. The results are stored in the same directory (in 'normals' and 'standard.deviations' subdirectories), one file for each calendar month, each with a field for every hour and day of the month (except 29th February).
+
+    Args:
+        variable (:obj:`str`): Variable to use (e.g. 'prmsl').
+        years (:obj:`list` of :obj:`int`): Years to make the climatology from.
+        months (:obj:`list` of :obj:`int`): Months to make the climatology for. Defaults to None - all 12.
+        stream (:obj:`str`): Analysis stream to use, can be 'enda' - ensemble DA, or 'oper' - high res single member.
+        workers (:obj:`int`): Number of processes to use. Defaults to None - one for each CPU.
+
+    The data are read one field at a time, and the mean and (population) standard deviation calculated in a single pass, so memory use does not depend on the number of years. Ensemble members are treated as separate samples. The work is split between processes by year, and the results from each process combined.
+
+    If the climatology files already exist, any of the years not already in them are added to the existing statistics - there is no need to re-read the data for the years already included.
+
+    Returns:
+        :obj:`list` of :obj:`int`: The years added to the climatology.
+
+    Raises:
+        StandardError: Data not on disc - see :func:`fetch`
+
+    |
+    """
+    if (variable not in monolevel_analysis) and (variable not in monolevel_forecast):
+        raise Exception("Unsupported variable %s" % variable)
+    if stream == "enda":
+        hours = range(0, 24, 3)
+    elif stream == "oper":
+        hours = range(0, 24)
+    else:
+        raise Exception("Unsupported stream %s" % stream)
+    if months is None:
+        months = range(1, 13)
+    added = set()
+    for month in months:
+        added |= set(
+            _build_climatology(
+                _get_climatology_field,
+                {"variable": variable, "stream": stream},
+                month,
+                hours,
+                years,
+                _hourly_get_file_name(
+                    variable, climatology_year, month, stream=stream, type="normal"
+                ),
+                _hourly_get_file_name(
+                    variable,
+                    climatology_year,
+                    month,
+                    stream=stream,
+                    type="standard.deviation",
+                ),
+                workers=workers,
+            )
+        )
+    return sorted(added)
@@ -15,18 +15,22 @@
 # store it in $SCRATCH.
 
 import os
-import subprocess
+import shutil
 import datetime
 import calendar
+import concurrent.futures
 import ecmwfapi
+import iris
+import iris.util
 
 from .utils import _hourly_get_file_name
+from .utils import _chunk_file_name
 from .utils import _translate_for_file_names
 from .utils import monolevel_analysis
 from .utils import monolevel_forecast
 
 
-def fetch(variable, dtime, stream="enda"):
+def fetch(variable, dtime, stream="enda", chunk=None, workers=4):
     """Get all data for one variable, for one month, from ECMWF's archive.
 
     Data wil be stored locally in directory $SCRATCH/ERA5, to be retrieved by :func:`load`. If the local file that would be produced already exists, this function does nothing.
@@ -34,11 +38,14 @@ def fetch(variable, dtime, stream="enda"):
     Args:
         variable (:obj:`str`): Variable to fetch (e.g. 'prmsl').
         dtime (:obj:`datetime.datetime`): Date and time to get data for.
-        month (:obj:`int`): Month to get data for (1-12).
         stream (:obj:`str`): Analysis stream to use, can be 'enda' - ensemble DA, or 'oper' - high res single member.
+        chunk (:obj:`str`): If None (default), fetch the month in one request. If 'day' or 'week', split the month into chunks of that length, fetched in parallel. See below.
+        workers (:obj:`int`): Maximum number of chunks to fetch at once. Ignored unless chunk is set. Defaults to 4.
 
     Will retrieve the data for the year and month of the given date-time. If the selected time is very close to the end of the calendar month, loading data for that time will also need data from the next calendar month (for interpolation). In this case, also fetch the data for the next calendar month.
 
+    Fetching a whole month in one request is slow, and none of the data can be used until all of it has arrived. If chunk is set, the month is fetched as several smaller requests (one for each day or week), run in parallel. Each chunk can be used by :func:`load` as soon as it has arrived, and when they have all arrived they are assembled into the same monthly file as is made when chunk is None.
+
     Raises:
         StandardError: If variable is not a supported value.
 
@@ -48,7 +55,18 @@ def fetch(variable, dtime, stream="enda"):
     if stream == "oper":
         ndtime = dtime + datetime.timedelta(hours=1)
     if ndtime.month != dtime.month:
-        fetch(variable, ndtime)
+        fetch(variable, ndtime, stream=stream, chunk=chunk, workers=workers)
+    if variable not in monolevel_analysis and variable not in monolevel_forecast:
+        raise Exception("Unsupported variable %s" % variable)
+    if chunk is not None:
+        return _fetch_data_for_month_in_chunks(
+            variable,
+            dtime.year,
+            dtime.month,
+            stream=stream,
+            chunk=chunk,
+            workers=workers,
+        )
     if variable in monolevel_analysis:
         return _fetch_analysis_data_for_month(
             variable, dtime.year, dtime.month, stream=stream
@@ -57,7 +75,83 @@ def fetch(variable, dtime, stream="enda"):
         return _fetch_forecast_data_for_month(
             variable, dtime.year, dtime.month, stream=stream
         )
-    raise Exception("Unsupported variable %s" % variable)
+
+
+def _analysis_request(variable, year, month, first_day, last_day, stream, target):
+    """MARS request for analysis data for a range of days in a month"""
+    if stream == "oper":
+        return {
+            "dataset": "era5",
+            "stream": "oper",
+            "type": "an",
+            "levtype": "sfc",
+            "param": _translate_for_file_names(variable),
+            "grid": "0.25/0.25",
+            "time": "0/to/23/by/1",
+            "date": "%04d-%02d-%02d/to/%04d-%02d-%02d"
+            % (year, month, first_day, year, month, last_day),
+            "format": "netcdf",
+            "target": target,
+        }
+    if stream == "enda":
+        return {
+            "class": "ea",
+            "dataset": "era5",
+            "date": "%04d-%02d-%02d/to/%04d-%02d-%02d"
+            % (year, month, first_day, year, month, last_day),
+            "expver": "1",
+            "levtype": "sfc",
+            "number": "0/1/2/3/4/5/6/7/8/9",
+            "param": _translate_for_file_names(variable),
+            "stream": "enda",
+            "time": "0/to/21/by/3",
+            "type": "an",
+            "grid": "0.5/0.5",
+            "format": "netcdf",
+            "target": target,
+        }
+    raise Exception("Unsupported stream %s" % stream)
+
+
+def _forecast_request(
+    variable, year, month, first_day, last_day, start_hour, stream, target
+):
+    """MARS request for forecast data, from one initialisation time,
+    for a range of days in a month"""
+    if stream == "oper":
+        return {
+            "dataset": "era5",
+            "stream": "oper",
+            "type": "fc",
+            "levtype": "sfc",
+            "param": _translate_for_file_names(variable),
+            "grid": "0.25/0.25",
+            "time": "%02d" % start_hour,
+            "step": "0/to/18/by/1",
+            "date": "%04d-%02d-%02d/to/%04d-%02d-%02d"
+            % (year, month, first_day, year, month, last_day),
+            "format": "netcdf",
+            "target": target,
+        }
+    if stream == "enda":
+        return {
+            "class": "ea",
+            "dataset": "era5",
+            "date": "%04d-%02d-%02d/to/%04d-%02d-%02d"
+            % (year, month, first_day, year, month, last_day),
+            "expver": "1",
+            "levtype": "sfc",
+            "number": "0/1/2/3/4/5/6/7/8/9",
+            "param": _translate_for_file_names(variable),
+            "stream": "enda",
+            "time": "%02d" % start_hour,
+            "step": "0/to/18/by/3",
+            "type": "fc",
+            "grid": "0.5/0.5",
+            "format": "netcdf",
+            "target": target,
+        }
+    raise Exception("Unsupported stream %s" % stream)
 
 
 def _fetch_analysis_data_for_month(variable, year, month, stream="enda"):
@@ -70,46 +164,18 @@ def _fetch_analysis_data_for_month(variable, year, month, stream="enda"):
     if not os.path.exists(os.path.dirname(local_file)):
         os.makedirs(os.path.dirname(local_file))
 
-    if stream == "oper":
-        grid = "0.25/0.25"
-        server = ecmwfapi.ECMWFDataServer()
-        server.retrieve(
-            {
-                "dataset": "era5",
-                "stream": "oper",
-                "type": "an",
-                "levtype": "sfc",
-                "param": _translate_for_file_names(variable),
-                "grid": "0.25/0.25",
-                "time": "0/to/23/by/1",
-                "date": "%04d-%02d-%02d/to/%04d-%02d-%02d"
-                % (year, month, 1, year, month, calendar.monthrange(year, month)[1]),
-                "format": "netcdf",
-                "target": local_file,
-            }
+    server = ecmwfapi.ECMWFDataServer()
+    server.retrieve(
+        _analysis_request(
+            variable,
+            year,
+            month,
+            1,
+            calendar.monthrange(year, month)[1],
+            stream,
+            local_file,
         )
-    elif stream == "enda":
-        server = ecmwfapi.ECMWFDataServer()
-        server.retrieve(
-            {
-                "class": "ea",
-                "dataset": "era5",
-                "date": "%04d-%02d-%02d/to/%04d-%02d-%02d"
-                % (year, month, 1, year, month, calendar.monthrange(year, month)[1]),
-                "expver": "1",
-                "levtype": "sfc",
-                "number": "0/1/2/3/4/5/6/7/8/9",
-                "param": _translate_for_file_names(variable),
-                "stream": "enda",
-                "time": "0/to/21/by/3",
-                "type": "an",
-                "grid": "0.5/0.5",
-                "format": "netcdf",
-                "target": local_file,
-            }
-        )
-    else:
-        raise Exception("Unsupported stream %s" % stream)
+    )
 
 
 def _fetch_forecast_data_for_month(variable, year, month, stream="enda"):
@@ -127,58 +193,114 @@ def _fetch_forecast_data_for_month(variable, year, month, stream="enda"):
         if not os.path.exists(os.path.dirname(local_file)):
             os.makedirs(os.path.dirname(local_file))
 
-        if stream == "oper":
-            server = ecmwfapi.ECMWFDataServer()
-            server.retrieve(
-                {
-                    "dataset": "era5",
-                    "stream": "oper",
-                    "type": "fc",
-                    "levtype": "sfc",
-                    "param": _translate_for_file_names(variable),
-                    "grid": "0.25/0.25",
-                    "time": "%02d" % start_hour,
-                    "step": "0/to/18/by/1",
-                    "date": "%04d-%02d-%02d/to/%04d-%02d-%02d"
-                    % (
-                        year,
-                        month,
-                        1,
-                        year,
-                        month,
-                        calendar.monthrange(year, month)[1],
-                    ),
-                    "format": "netcdf",
-                    "target": local_file,
-                }
-            )
-        elif stream == "enda":
-            server = ecmwfapi.ECMWFDataServer()
-            server.retrieve(
-                {
-                    "class": "ea",
-                    "dataset": "era5",
-                    "date": "%04d-%02d-%02d/to/%04d-%02d-%02d"
-                    % (
-                        year,
-                        month,
-                        1,
-                        year,
-                        month,
-                        calendar.monthrange(year, month)[1],
-                    ),
-                    "expver": "1",
-                    "levtype": "sfc",
-                    "number": "0/1/2/3/4/5/6/7/8/9",
-                    "param": _translate_for_file_names(variable),
-                    "stream": "enda",
-                    "time": "%02d" % start_hour,
-                    "step": "0/to/18/by/3",
-                    "type": "fc",
-                    "grid": "0.5/0.5",
-                    "format": "netcdf",
-                    "target": local_file,
-                }
+        server = ecmwfapi.ECMWFDataServer()
+        server.retrieve(
+            _forecast_request(
+                variable,
+                year,
+                month,
+                1,
+                calendar.monthrange(year, month)[1],
+                start_hour,
+                stream,
+                local_file,
             )
-        else:
-            raise Exception("Unsupported stream %s" % stream)
+        )
+
+
+def _month_chunks(year, month, chunk):
+    """Split a month into (first_day,last_day) chunks"""
+    last_day = calendar.monthrange(year, month)[1]
+    if chunk == "day":
+        length = 1
+    elif chunk == "week":
+        length = 7
+    else:
+        raise Exception("Unsupported chunk %s" % chunk)
+    return [
+        (first_day, min(first_day + length - 1, last_day))
+        for first_day in range(1, last_day + 1, length)
+    ]
+
+
+def _retrieve_chunk(request, chunk_file):
+    """Run one MARS request, and only give the result its
+    final name once it's all arrived."""
+    request = dict(request)
+    request["target"] = "%s.part" % chunk_file
+    server = ecmwfapi.ECMWFDataServer()
+    server.retrieve(request)
+    os.rename(request["target"], chunk_file)
+
+
+def _assemble_chunks(local_file, chunk_files):
+    """Join all the chunks for a month into the monthly file
+    - then the chunks aren't needed any more."""
+    cubes = iris.load(chunk_files)
+    iris.util.equalise_attributes(cubes)
+    month = cubes.concatenate_cube()
+    iris.save(month, "%s.part" % local_file, saver="nc")
+    os.rename("%s.part" % local_file, local_file)
+    for chunk_file in chunk_files:
+        os.remove(chunk_file)
+    chunk_dir = os.path.dirname(chunk_files[0])
+    if len(os.listdir(chunk_dir)) == 0:
+        shutil.rmtree(chunk_dir)
+
+
+def _fetch_data_for_month_in_chunks(
+    variable, year, month, stream="enda", chunk="day", workers=4
+):
+
+    # Analysis data has one monthly file, forecast data
+    #  has one for each of the runs at 6 and 18
+    if variable in monolevel_forecast:
+        start_hours = (6, 18)
+    else:
+        start_hours = (None,)
+
+    chunk_files = {}
+    requests = []
+    for start_hour in start_hours:
+        local_file = _hourly_get_file_name(
+            variable, year, month, fc_init=start_hour, stream=stream
+        )
+        if os.path.isfile(local_file):
+            # Got this data already
+            continue
+        chunk_files[local_file] = []
+        for (first_day, last_day) in _month_chunks(year, month, chunk):
+            chunk_file = _chunk_file_name(local_file, first_day, last_day)
+            chunk_files[local_file].append(chunk_file)
+            if os.path.isfile(chunk_file):
+                # Got this chunk already
+                continue
+            if not os.path.exists(os.path.dirname(chunk_file)):
+                os.makedirs(os.path.dirname(chunk_file))
+            if start_hour is None:
+                request = _analysis_request(
+                    variable, year, month, first_day, last_day, stream, chunk_file
+                )
+            else:
+                request = _forecast_request(
+                    variable,
+                    year,
+                    month,
+                    first_day,
+                    last_day,
+                    start_hour,
+                    stream,
+                    chunk_file,
+                )
+            requests.append((request, chunk_file))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        retrievals = [
+            executor.submit(_retrieve_chunk, request, chunk_file)
+            for (request, chunk_file) in requests
+        ]
+        for retrieval in concurrent.futures.as_completed(retrievals):
+            retrieval.result()  # Raise any retrieval error
+
+    for local_file in chunk_files.keys():
+        _assemble_chunks(local_file, chunk_files[local_file])
@@ -21,8 +21,9 @@ import iris.time
 import datetime
 import numpy as np
 
-from .utils import _hourly_get_file_name
+from .utils import _hourly_get_available_file_name
 from .utils import _translate_for_file_names
+from .utils import _get_max_read_bytes
 from .utils import monolevel_analysis
 from .utils import monolevel_forecast
 
@@ -73,16 +74,36 @@ def _get_next_field_time(variable, year, month, day, hour, stream="enda"):
 
 
 def _get_slice_at_hour_at_timestep(
-    variable, year, month, day, hour, stream="enda", fc_init=None
+    variable,
+    year,
+    month,
+    day,
+    hour,
+    stream="enda",
+    fc_init=None,
+    window=None,
+    max_bytes=None,
 ):
     """Get the cube with the data, given that the specified time
-    matches a data timestep."""
+    matches a data timestep.
+
+    If a window is given, or there is a limit on the size of reads,
+    read the data from disc immediately - only the selected timestep
+    and window - and fail if that would need too much memory."""
     if not _is_in_file(variable, year, month, day, hour, stream=stream):
         raise ValueError("Invalid hour - data not in file")
-    file_name = _hourly_get_file_name(
+    file_name = _hourly_get_available_file_name(
         variable, year, month, day, hour, stream=stream, fc_init=fc_init
     )
     if not os.path.isfile(file_name):
+        if fc_init == "blend":
+            raise Exception(
+                (
+                    "Blended %s for %04d/%02d not available"
+                    + " might need era5.make_blended_prate"
+                )
+                % (variable, year, month)
+            )
         raise Exception(
             ("%s for %04d/%02d not available" + " might need era5.fetch")
             % (variable, year, month)
@@ -90,13 +111,48 @@ def _get_slice_at_hour_at_timestep(
     time_constraint = iris.Constraint(
         time=iris.time.PartialDateTime(year=year, month=month, day=day, hour=hour)
     )
+    if window is not None:
+        time_constraint = time_constraint & _window_constraint(window)
     try:
         hslice = iris.load_cube(file_name, time_constraint)
     # This isn't the right error to catch
     except iris.exceptions.ConstraintMismatchError:
         print("Data not available")
+    if window is not None or _get_max_read_bytes(max_bytes) is not None:
+        _realise_bounded(hslice, max_bytes=max_bytes)
+    return _enhance_slice(hslice, stream=stream)
+
+
+def _window_constraint(window):
+    """Make a constraint selecting a latitude-longitude window.
+    Window is (lat_min, lat_max, lon_min, lon_max) - if lon_min>lon_max
+    the window wraps round the end of the longitude range."""
+    lat_min, lat_max, lon_min, lon_max = window
+    if lon_min <= lon_max:
+        lon_select = lambda cell: lon_min <= cell <= lon_max
+    else:
+        lon_select = lambda cell: cell >= lon_min or cell <= lon_max
+    return iris.Constraint(
+        latitude=lambda cell: lat_min <= cell <= lat_max, longitude=lon_select
+    )
+
+
+def _realise_bounded(hslice, max_bytes=None):
+    """Read the data for a lazy cube from disc, failing without
+    reading anything if that would take more than the allowed memory."""
+    limit = _get_max_read_bytes(max_bytes)
+    size = int(np.prod(hslice.shape)) * hslice.dtype.itemsize
+    if limit is not None and size > limit:
+        raise MemoryError(
+            "Reading %s would need %d bytes - limit is %d"
+            % (hslice.name(), size, limit)
+        )
+    hslice.data  # Realise just the selected part of the file
+    return hslice
 
-    # Enhance the names and metadata for iris/cartopy
+
+def _enhance_slice(hslice, stream="enda"):
+    """Enhance the names and metadata for iris/cartopy"""
     hslice.coord("latitude").coord_system = coord_s
     hslice.coord("longitude").coord_system = coord_s
     if stream == "enda":
@@ -104,7 +160,7 @@ def _get_slice_at_hour_at_timestep(
     return hslice
 
 
-def load(variable, dtime, stream="enda", fc_init=None):
+def load(variable, dtime, stream="enda", fc_init=None, window=None, max_bytes=None):
     """Load requested data from disc, interpolating if necessary.
 
     Data must be available in directory $SCRATCH/ERA5, previously retrieved by :func:`fetch`.
@@ -112,17 +168,22 @@ def load(variable, dtime, stream="enda", fc_init=None):
     Args:
         variable (:obj:`str`): Variable to fetch (e.g. 'prmsl')
         dtime (:obj:`datetime.datetime`): Date and time to load data for.
-        fc_init (:obj:`int`): If not None; 6 or 18. See below.
+        fc_init (:obj:`int`): If not None; 6, 18, or 'blend'. See below.
+        window (:obj:`tuple`): If not None, (lat_min, lat_max, lon_min, lon_max) - only load data in this latitude-longitude window. Longitudes must be in the same convention as the data files - the files fetched by :func:`fetch` are global, with longitudes from 0 to 359.75 (so, in those files, a window crossing the 0 meridian has lon_min>lon_max). If lon_min>lon_max, the window wraps round the end of the files' longitude range (in a file with longitudes from -180 to 180, that's a window crossing the dateline).
+        max_bytes (:obj:`int`): Largest amount of data (bytes) to read from any one file. Defaults to None - use the value of the environment variable IRDATA_MAX_READ_BYTES, if set.
 
     Returns:
         :obj:`iris.cube.Cube`: Global field of variable at time.
 
     Note that ERA5 data is only output every 3 hours (enda) or hour (oper), so if hour%3!=0, the result may be linearly interpolated in time.
 
-    Precipitation data in ERA5 is a forecast field: twice a day (at 06:00 and 18:00) forecast data is calculated for the next 18 hours. So at 21:00, for example, there are 2 sets of precipitation available: a 3-hour forecast starting at 18 that day, and a 15-hour forecast starting at 06:00, and there is a discontinuity between the two fields. This function will always load the shortest lead-time forecast available unless fc_init is set (to 6 or 18) in which case it will load the forecast starting at the hour specified. You will only need this if you are making videos, or otherwise need time-continuous forecast fields, in which case you will need to be clever in smoothing over the discontinuity. For analysis fields (everything except prate), this issue does not arise and fc_init is ignored.
+    Precipitation data in ERA5 is a forecast field: twice a day (at 06:00 and 18:00) forecast data is calculated for the next 18 hours. So at 21:00, for example, there are 2 sets of precipitation available: a 3-hour forecast starting at 18 that day, and a 15-hour forecast starting at 06:00, and there is a discontinuity between the two fields. This function will always load the shortest lead-time forecast available unless fc_init is set (to 6 or 18) in which case it will load the forecast starting at the hour specified. If you are making videos, or otherwise need time-continuous forecast fields, set fc_init='blend' to load a blend of the two forecasts with no discontinuities. The blended data must first be made, for each month, with :func:`make_blended_prate`. For analysis fields (everything except prate), this issue does not arise and fc_init is ignored.
+
+    If a window or a read limit is set, the data are read from disc immediately, and only the records for the timesteps needed (and only the data in the window) are read. If that would need more than the read limit, a MemoryError is raised before anything is read. Use this on workers with restricted memory, especially with the 'oper' stream, where each month's file holds about 3Gb of data for each variable.
 
     Raises:
         StandardError: Data not on disc - see :func:`fetch`
+        MemoryError: Data to be read is larger than the read limit.
 
     |
     """
@@ -138,6 +199,8 @@ def load(variable, dtime, stream="enda", fc_init=None):
             dhour,
             stream=stream,
             fc_init=fc_init,
+            window=window,
+            max_bytes=max_bytes,
         )
     previous_step = _get_previous_field_time(
         variable, dtime.year, dtime.month, dtime.day, dhour, stream=stream
@@ -163,6 +226,8 @@ def load(variable, dtime, stream="enda", fc_init=None):
         previous_step["hour"],
         stream=stream,
         fc_init=fc_init,
+        window=window,
+        max_bytes=max_bytes,
     )
     s_next = _get_slice_at_hour_at_timestep(
         variable,
@@ -172,6 +237,8 @@ def load(variable, dtime, stream="enda", fc_init=None):
         next_step["hour"],
         stream=stream,
         fc_init=fc_init,
+        window=window,
+        max_bytes=max_bytes,
     )
 
     # Iris won't merge cubes with different attributes
@@ -179,3 +246,168 @@ def load(variable, dtime, stream="enda", fc_init=None):
     s_next = iris.cube.CubeList((s_previous, s_next)).merge_cube()
     s_next = s_next.interpolate([("time", dt_current)], iris.analysis.Linear())
     return s_next
+
+
+def _get_field_times(variable, dtime, stream="enda"):
+    """Get the data timesteps needed to make a field at the given time:
+    just that time if it's in the file, otherwise the timesteps on
+    either side of it."""
+    dhour = dtime.hour + dtime.minute / 60.0 + dtime.second / 3600.0
+    if _is_in_file(variable, dtime.year, dtime.month, dtime.day, dhour, stream=stream):
+        return [dtime]
+    previous_step = _get_previous_field_time(
+        variable, dtime.year, dtime.month, dtime.day, dhour, stream=stream
+    )
+    next_step = _get_next_field_time(
+        variable, dtime.year, dtime.month, dtime.day, dhour, stream=stream
+    )
+    return [
+        datetime.datetime(
+            previous_step["year"],
+            previous_step["month"],
+            previous_step["day"],
+            previous_step["hour"],
+        ),
+        datetime.datetime(
+            next_step["year"], next_step["month"], next_step["day"], next_step["hour"]
+        ),
+    ]
+
+
+def _get_slices_from_file(
+    file_name, dtimes, stream="enda", window=None, max_bytes=None
+):
+    """Get the cubes for a set of data timesteps, all in the same file,
+    opening the file and parsing its metadata only once.
+
+    Returns a dictionary of cubes, indexed by timestep."""
+    if not os.path.isfile(file_name):
+        raise Exception(
+            "%s not available - might need era5.fetch" % os.path.basename(file_name)
+        )
+    wanted = set((dt.year, dt.month, dt.day, dt.hour) for dt in dtimes)
+    time_constraint = iris.Constraint(
+        time=lambda cell: (
+            cell.point.year,
+            cell.point.month,
+            cell.point.day,
+            cell.point.hour,
+        )
+        in wanted
+    )
+    if window is not None:
+        time_constraint = time_constraint & _window_constraint(window)
+    try:
+        block = iris.load_cube(file_name, time_constraint)
+    except iris.exceptions.ConstraintMismatchError:
+        raise Exception("No requested times in %s" % file_name)
+    if window is not None or _get_max_read_bytes(max_bytes) is not None:
+        _realise_bounded(block, max_bytes=max_bytes)
+
+    result = {}
+    for hslice in block.slices_over("time"):
+        point = hslice.coord("time").cell(0).point
+        dtime = datetime.datetime(point.year, point.month, point.day, point.hour)
+        result[dtime] = _enhance_slice(hslice, stream=stream)
+    for dtime in dtimes:
+        if dtime not in result:
+            raise Exception(
+                "%s not available for %s" % (file_name, dtime.strftime("%Y-%m-%d:%H"))
+            )
+    return result
+
+
+def load_series(
+    variable,
+    start,
+    end,
+    step,
+    stream="enda",
+    fc_init=None,
+    window=None,
+    max_bytes=None,
+):
+    """Load a time-series of fields from disc, interpolating if necessary.
+
+    Gives the same fields as calling :func:`load` for each time in turn, but each data file is opened only once, however many times are taken from it, and interpolated fields are made from the data already read.
+
+    Data must be available in directory $SCRATCH/ERA5, previously retrieved by :func:`fetch`.
+
+    Args:
+        variable (:obj:`str`): Variable to fetch (e.g. 'prmsl')
+        start (:obj:`datetime.datetime`): Get fields at or after this time.
+        end (:obj:`datetime.datetime`): Get fields before this time.
+        step (:obj:`datetime.timedelta`): Time between successive fields.
+        stream (:obj:`str`): Analysis stream to use, 'enda' or 'oper'.
+        fc_init (:obj:`int`): If not None; 6, 18, or 'blend'. See :func:`load`.
+        window (:obj:`tuple`): If not None, only load data in this latitude-longitude window. See :func:`load`.
+        max_bytes (:obj:`int`): Largest amount of data (bytes) to read from any one file. See :func:`load`.
+
+    Returns:
+        :obj:`iris.cube.Cube`: Global fields of variable, with a time dimension.
+
+    Raises:
+        StandardError: Data not on disc - see :func:`fetch`
+        MemoryError: Data to be read from a file is larger than the read limit.
+
+    |
+    """
+    if (variable not in monolevel_analysis) and (variable not in monolevel_forecast):
+        raise Exception("Unsupported variable %s" % variable)
+    if step <= datetime.timedelta(0):
+        raise ValueError("Step must be positive")
+    dtimes = []
+    dtime = start
+    while dtime < end:
+        dtimes.append(dtime)
+        dtime += step
+    if len(dtimes) == 0:
+        raise ValueError("No times between start and end")
+
+    # Find the data timesteps needed, and group them by the file they are in
+    field_times = {}
+    file_times = {}
+    for dtime in dtimes:
+        field_times[dtime] = _get_field_times(variable, dtime, stream=stream)
+        for ft in field_times[dtime]:
+            file_name = _hourly_get_available_file_name(
+                variable,
+                ft.year,
+                ft.month,
+                ft.day,
+                ft.hour,
+                stream=stream,
+                fc_init=fc_init,
+            )
+            file_times.setdefault(file_name, set()).add(ft)
+    slices = {}
+    for file_name in sorted(file_times.keys()):
+        slices.update(
+            _get_slices_from_file(
+                file_name,
+                file_times[file_name],
+                stream=stream,
+                window=window,
+                max_bytes=max_bytes,
+            )
+        )
+
+    fields = iris.cube.CubeList()
+    for dtime in dtimes:
+        ft = field_times[dtime]
+        if len(ft) == 1:
+            field = slices[ft[0]].copy()
+        else:
+            weight = (dtime - ft[0]).total_seconds() / (ft[1] - ft[0]).total_seconds()
+            field = slices[ft[0]].copy(
+                data=slices[ft[0]].core_data() * (1 - weight)
+                + slices[ft[1]].core_data() * weight
+            )
+            time_coord = field.coord("time")
+            time_coord.bounds = None
+            time_coord.points = [time_coord.units.date2num(dtime)]
+        # Iris won't merge cubes with different attributes
+        if len(fields) > 0:
+            field.attributes = fields[0].attributes
+        fields.append(field)
+    return fields.merge_cube()
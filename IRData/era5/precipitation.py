@@ -0,0 +1,132 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+
+# Make a time-continuous precipitation product from the two
+#  sets of ERA5 forecast data (started at 06 and 18).
+
+import os
+import datetime
+import iris
+
+from .utils import _hourly_get_file_name
+from .load import _get_slices_from_file
+
+
+def _blend_weights(hour):
+    """Weights for the forecasts started at 06 and 18, for data at the given hour.
+
+    Each forecast is used alone for the 6 hours after its first 6 hours,
+    and the weight shifts linearly from the old forecast to the new one
+    over the 6 hours after each new forecast starts."""
+    if hour < 6:
+        return {18: 1.0}
+    if hour <= 12:
+        return {6: (hour - 6) / 6.0, 18: (12 - hour) / 6.0}
+    if hour < 18:
+        return {6: 1.0}
+    return {6: (24 - hour) / 6.0, 18: (hour - 18) / 6.0}
+
+
+def make_blended_prate(year, month, stream="enda"):
+    """Make a time-continuous precipitation field for one month, from the ERA5 forecast data.
+
+    The precipitation data in ERA5 come from two forecasts a day (see :func:`load`), and there is a discontinuity each time the field switches from one forecast to the next. This function removes the discontinuities by blending the forecasts: for the 6 hours after each new forecast starts, the field is a weighted mean of the new forecast and the previous one, with the weight moving linearly from the old forecast to the new. The result is stored beside the forecast data, and can then be loaded with :func:`load` or :func:`load_series` by setting fc_init='blend'.
+
+    If the blended data for the month already exists, this function does nothing.
+
+    Args:
+        year (:obj:`int`): Year to make data for.
+        month (:obj:`int`): Month to make data for (1-12).
+        stream (:obj:`str`): Analysis stream to use, can be 'enda' - ensemble DA, or 'oper' - high res single member.
+
+    Needs the forecast data, previously retrieved by :func:`fetch`, for the month, and also for the last day of the previous month.
+
+    Raises:
+        StandardError: Forecast data not on disc - see :func:`fetch`
+
+    |
+    """
+    blend_file = _hourly_get_file_name(
+        "prate", year, month, fc_init="blend", stream=stream
+    )
+    if os.path.isfile(blend_file):
+        # Made this data already
+        return
+
+    if stream == "enda":
+        step = datetime.timedelta(hours=3)
+    elif stream == "oper":
+        step = datetime.timedelta(hours=1)
+    else:
+        raise Exception("Unsupported stream %s" % stream)
+    dtimes = []
+    dtime = datetime.datetime(year, month, 1)
+    while dtime.month == month:
+        dtimes.append(dtime)
+        dtime += step
+
+    # Find the forecast data needed, and group it by the file it is in
+    weights = {}
+    file_times = {}
+    for dtime in dtimes:
+        weights[dtime] = _blend_weights(dtime.hour)
+        for fc_init in weights[dtime].keys():
+            if weights[dtime][fc_init] == 0:
+                continue
+            file_name = _hourly_get_file_name(
+                "prate",
+                dtime.year,
+                dtime.month,
+                dtime.day,
+                dtime.hour,
+                fc_init=fc_init,
+                stream=stream,
+            )
+            file_times.setdefault((file_name, fc_init), set()).add(dtime)
+    slices = {}
+    for (file_name, fc_init) in sorted(file_times.keys()):
+        fslices = _get_slices_from_file(
+            file_name, file_times[(file_name, fc_init)], stream=stream
+        )
+        for dtime in fslices.keys():
+            slices[(fc_init, dtime)] = fslices[dtime]
+
+    fields = iris.cube.CubeList()
+    for dtime in dtimes:
+        field = None
+        for fc_init in sorted(weights[dtime].keys()):
+            if weights[dtime][fc_init] == 0:
+                continue
+            contribution = (
+                slices[(fc_init, dtime)].core_data() * weights[dtime][fc_init]
+            )
+            if field is None:
+                field = slices[(fc_init, dtime)].copy(data=contribution)
+            else:
+                field.data = field.core_data() + contribution
+        # Iris won't merge cubes with different attributes
+        if len(fields) > 0:
+            field.attributes = fields[0].attributes
+        fields.append(field)
+    blended = fields.merge_cube()
+    blended.attributes["comment"] = (
+        "Blend of forecasts started at 06 and 18 - see "
+        + "IRData.era5.make_blended_prate"
+    )
+
+    if not os.path.exists(os.path.dirname(blend_file)):
+        os.makedirs(os.path.dirname(blend_file))
+    # Write to a temporary file, so an interrupted save doesn't leave
+    #  a partial file that looks like finished data.
+    iris.save(blended, "%s.part" % blend_file, saver="nc")
+    os.rename("%s.part" % blend_file, blend_file)
@@ -71,9 +71,21 @@ def _get_data_dir():
     return base_file
 
 
+# Largest amount of data (bytes) to read from one file in one go.
+#  None (the default) means no limit. Set for a whole process
+#  with the IRDATA_MAX_READ_BYTES environment variable.
+def _get_max_read_bytes(max_bytes=None):
+    if max_bytes is not None:
+        return int(max_bytes)
+    limit = os.getenv("IRDATA_MAX_READ_BYTES")
+    if limit is None:
+        return None
+    return int(limit)
+
+
 # File name for data for a given variable and month
 def _hourly_get_file_name(
-    variable, year, month, day=15, hour=12, fc_init=None, stream="enda"
+    variable, year, month, day=15, hour=12, fc_init=None, stream="enda", type=None
 ):
     base_dir = _get_data_dir()
     if type == "normal":
@@ -97,6 +109,9 @@ def _hourly_get_file_name(
     dir_name = "%s/%s/hourly/%04d/%02d" % (base_dir, stream, year, month)
     file_name = "%s/%s.nc" % (dir_name, variable)
     if variable in monolevel_forecast:
+        if fc_init == "blend":
+            # Blend of both forecasts, made by make_blended_prate
+            return "%s/%s.blend.nc" % (dir_name, variable)
         if fc_init == None:
             fc_init = 18
             if hour >= 6 and hour < 18:
@@ -118,3 +133,49 @@ def _hourly_get_file_name(
         file_name = "%s/%s.%02d.nc" % (dir_name, variable, fc_init)
 
     return file_name
+
+
+# Name of the file holding one chunk (a range of days) of a monthly file
+#  - see era5.fetch(chunk=...)
+def _chunk_file_name(file_name, first_day, last_day):
+    return "%s/chunks/%s.%02d-%02d.nc" % (
+        os.path.dirname(file_name),
+        os.path.basename(file_name)[:-3],
+        first_day,
+        last_day,
+    )
+
+
+# File name for data for a given variable and time, allowing for
+#  the monthly file still being assembled from chunks. Returns the
+#  monthly file name if neither the monthly file nor a chunk is available.
+def _hourly_get_available_file_name(
+    variable, year, month, day=15, hour=12, fc_init=None, stream="enda"
+):
+    file_name = _hourly_get_file_name(
+        variable, year, month, day, hour, fc_init=fc_init, stream=stream
+    )
+    if os.path.isfile(file_name) or fc_init == "blend":
+        return file_name
+    # Chunks are split by forecast initialisation day
+    init_day = datetime.datetime(year, month, day)
+    if variable in monolevel_forecast:
+        if fc_init is None:
+            fc_init = 18
+            if hour >= 6 and hour < 18:
+                fc_init = 6
+        if hour < fc_init:
+            init_day = init_day - datetime.timedelta(days=1)
+    chunk_dir = "%s/chunks" % os.path.dirname(file_name)
+    if not os.path.isdir(chunk_dir):
+        return file_name
+    prefix = "%s." % os.path.basename(file_name)[:-3]
+    for chunk_file in os.listdir(chunk_dir):
+        if not chunk_file.startswith(prefix) or not chunk_file.endswith(".nc"):
+            continue
+        days = chunk_file[len(prefix) : -3].split("-")
+        if len(days) != 2 or not days[0].isdigit() or not days[1].isdigit():
+            continue
+        if int(days[0]) <= init_day.day <= int(days[1]):
+            return "%s/%s" % (chunk_dir, chunk_file)
+    return file_name
@@ -52,7 +52,9 @@ class TestFetch(unittest.TestCase):
             ecmwfapi.ECMWFDataServer, "retrieve", return_value=None
         ) as mock_method:
             cera20c.fetch("prate", datetime.datetime(1969, 3, 12))
-        mock_method.assert_called_with(
+        # Retrievals run concurrently, so in no particular order
+        self.assertEqual(mock_method.call_count, 2)
+        mock_method.assert_any_call(
             {
                 "dataset": "cera20c",
                 "stream": "enda",
@@ -90,13 +92,31 @@ class TestFetch(unittest.TestCase):
             }
         )
 
+    # Each file is checked separately - fetch a missing 27-hour file
+    #  even if the main file is already on disc
+    def test_fetch_prate_missing_p1d(self):
+        main_file = "%s/CERA_20C/hourly/1969/03/prate.nc" % os.getenv("SCRATCH")
+        os.makedirs(os.path.dirname(main_file))
+        open(main_file, "a").close()
+        with patch.object(
+            ecmwfapi.ECMWFDataServer, "retrieve", return_value=None
+        ) as mock_method:
+            cera20c.fetch("prate", datetime.datetime(1969, 3, 12))
+        self.assertEqual(mock_method.call_count, 1)
+        self.assertEqual(
+            mock_method.call_args[0][0]["target"],
+            "%s/CERA_20C/hourly/1969/03/prate.p1d.nc" % os.getenv("SCRATCH"),
+        )
+        self.assertEqual(mock_method.call_args[0][0]["step"], "27")
+
     # Special case for end of month
     def test_fetch_prmsl_eom(self):
         with patch.object(
             ecmwfapi.ECMWFDataServer, "retrieve", return_value=None
         ) as mock_method:
             cera20c.fetch("prmsl", datetime.datetime(1969, 3, 31, 21))
-        mock_method.assert_called_with(
+        self.assertEqual(mock_method.call_count, 2)
+        mock_method.assert_any_call(
             {
                 "stream": "enda",
                 "format": "netcdf",
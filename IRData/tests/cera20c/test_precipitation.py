@@ -0,0 +1,107 @@
+import unittest
+
+import IRData.cera20c as cera20c
+import datetime
+import os
+import os.path
+import shutil
+import tempfile
+import iris
+import cf_units
+import numpy
+
+
+# Precipitation in each 3-hour period - varies with member and time
+def fake_increment(dtime):
+    hours = (dtime - datetime.datetime(1970, 1, 1)).total_seconds() / 3600
+    return (
+        (numpy.arange(10).reshape(10, 1, 1) + 1)
+        * (hours % 7 + 1)
+        * numpy.ones((1, 3, 4))
+    )
+
+
+# Can only load data if it's on disc - create fake data file
+#  with accumulations from the 18Z forecast each day.
+def fake_data_file(year, month, p1d=False):
+    file_name = "%s/CERA_20C/hourly/%04d/%02d/prate%s.nc" % (
+        os.environ["SCRATCH"],
+        year,
+        month,
+        ".p1d" if p1d else "",
+    )
+    if not os.path.isdir(os.path.dirname(file_name)):
+        os.makedirs(os.path.dirname(file_name))
+    dtimes = []
+    data = []
+    fc_init = datetime.datetime(year, month, 1, 18)
+    while fc_init.month == month:
+        accumulation = 0
+        for step in range(3, 28, 3):
+            dtime = fc_init + datetime.timedelta(hours=step)
+            accumulation = accumulation + fake_increment(dtime)
+            if (step == 27) == p1d:
+                dtimes.append(dtime)
+                data.append(accumulation)
+        fc_init += datetime.timedelta(days=1)
+    time = iris.coords.DimCoord(
+        [(d - datetime.datetime(1900, 1, 1)).total_seconds() / 3600 for d in dtimes],
+        standard_name="time",
+        units=cf_units.Unit("hours since 1900-01-01 00:00:0.0", calendar="gregorian"),
+    )
+    number = iris.coords.DimCoord(numpy.arange(10), long_name="number")
+    latitude = iris.coords.DimCoord(
+        numpy.linspace(-90, 90, 3), standard_name="latitude", units="degrees"
+    )
+    longitude = iris.coords.DimCoord(
+        numpy.linspace(0, 270, 4), standard_name="longitude", units="degrees"
+    )
+    cube = iris.cube.Cube(
+        numpy.array(data, numpy.float32),
+        var_name="tp",
+        units="m",
+        dim_coords_and_dims=[(time, 0), (number, 1), (latitude, 2), (longitude, 3)],
+    )
+    iris.save(cube, file_name, saver="nc")
+
+
+class TestDeaccumulate(unittest.TestCase):
+
+    # Controlled and temporary disc environment
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+        fake_data_file(1970, 2)
+        fake_data_file(1970, 2, p1d=True)
+
+    def tearDown(self):
+        if os.path.isdir("%s/CERA_20C" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/CERA_20C" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    # Same answers from the cache and from de-accumulating on load
+    def test_make_deaccumulated_prate(self):
+        tests = [
+            (datetime.datetime(1970, 2, 12, 21), None),
+            (datetime.datetime(1970, 2, 13, 6), None),
+            (datetime.datetime(1970, 2, 13, 18), None),
+            (datetime.datetime(1970, 2, 12, 21), "last"),
+        ]
+        on_load = [cera20c.load("prate", dtime, fc_init=f) for (dtime, f) in tests]
+        cera20c.make_deaccumulated_prate(1970, 2)
+        deacc_dir = "%s/CERA_20C/hourly/1970/02" % os.environ["SCRATCH"]
+        deacc = iris.load_cube("%s/prate.deacc.nc" % deacc_dir)
+        self.assertEqual(deacc.shape, (28 * 8, 10, 3, 4))
+        p1d = iris.load_cube("%s/prate.p1d.deacc.nc" % deacc_dir)
+        self.assertEqual(p1d.shape, (28, 10, 3, 4))
+        for (index, (dtime, fc_init)) in enumerate(tests):
+            cached = cera20c.load("prate", dtime, fc_init=fc_init)
+            self.assertEqual(cached.coord("time"), on_load[index].coord("time"))
+            expected = fake_increment(dtime)
+            numpy.testing.assert_allclose(cached.data, expected, rtol=1e-5)
+            numpy.testing.assert_allclose(on_load[index].data, expected, rtol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+
+import IRData.era5 as era5
+import datetime
+import os
+import os.path
+import shutil
+import tempfile
+import iris
+import cf_units
+import numpy
+
+
+# Values in the fake data - vary with everything
+def fake_values(year, day, hour):
+    member = numpy.arange(10).reshape(10, 1, 1)
+    grid = numpy.arange(12).reshape(1, 3, 4)
+    return (year - 1980) * 3.0 + member * 0.5 + grid + day * 10.0 + hour
+
+
+# Climatologies are built from data on disc - make a small
+#  monthly data file.
+def fake_data_file(year, month):
+    file_name = "%s/ERA5/enda/hourly/%04d/%02d/prmsl.nc" % (
+        os.environ["SCRATCH"],
+        year,
+        month,
+    )
+    if not os.path.isdir(os.path.dirname(file_name)):
+        os.makedirs(os.path.dirname(file_name))
+    dtimes = []
+    dtime = datetime.datetime(year, month, 1)
+    while dtime.month == month:
+        dtimes.append(dtime)
+        dtime += datetime.timedelta(hours=3)
+    time = iris.coords.DimCoord(
+        [(d - datetime.datetime(1900, 1, 1)).total_seconds() / 3600 for d in dtimes],
+        standard_name="time",
+        units=cf_units.Unit("hours since 1900-01-01 00:00:0.0", calendar="gregorian"),
+    )
+    number = iris.coords.DimCoord(numpy.arange(10), long_name="number")
+    latitude = iris.coords.DimCoord(
+        numpy.linspace(-90, 90, 3), standard_name="latitude", units="degrees"
+    )
+    longitude = iris.coords.DimCoord(
+        numpy.linspace(0, 270, 4), standard_name="longitude", units="degrees"
+    )
+    cube = iris.cube.Cube(
+        numpy.array([fake_values(year, d.day, d.hour) for d in dtimes], numpy.float32),
+        var_name="msl",
+        units="Pa",
+        dim_coords_and_dims=[(number, 1), (time, 0), (latitude, 2), (longitude, 3)],
+    )
+    iris.save(cube, file_name, saver="nc")
+
+
+class TestClimatology(unittest.TestCase):
+
+    # Controlled and temporary disc environment
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+        for year in (1980, 1981, 1982):
+            fake_data_file(year, 2)
+
+    def tearDown(self):
+        if os.path.isdir("%s/ERA5" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/ERA5" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    def check_climatology(self, years):
+        samples = numpy.concatenate([fake_values(y, 12, 6) for y in years])
+        normal = iris.load_cube(
+            "%s/ERA5/normals/enda/hourly/02/prmsl.nc" % os.environ["SCRATCH"]
+        )
+        sd = iris.load_cube(
+            "%s/ERA5/standard.deviations/enda/hourly/02/prmsl.nc"
+            % os.environ["SCRATCH"]
+        )
+        # No 29th February
+        self.assertEqual(normal.shape, (28 * 8, 3, 4))
+        self.assertEqual(sd.shape, (28 * 8, 3, 4))
+        self.assertEqual(normal.attributes["years"], " ".join(str(y) for y in years))
+        slot = iris.Constraint(time=iris.time.PartialDateTime(month=2, day=12, hour=6))
+        numpy.testing.assert_allclose(
+            normal.extract(slot).data, samples.mean(axis=0), rtol=1e-6
+        )
+        numpy.testing.assert_allclose(
+            sd.extract(slot).data, samples.std(axis=0), rtol=1e-5
+        )
+
+    # Build in parallel, then add a year to the existing statistics
+    def test_build_climatology(self):
+        added = era5.build_climatology("prmsl", [1980, 1981], months=[2], workers=2)
+        self.assertEqual(added, [1980, 1981])
+        self.check_climatology([1980, 1981])
+        added = era5.build_climatology(
+            "prmsl", [1980, 1981, 1982], months=[2], workers=1
+        )
+        self.assertEqual(added, [1982])
+        self.check_climatology([1980, 1981, 1982])
+        # Nothing new to add
+        added = era5.build_climatology("prmsl", [1981], months=[2], workers=1)
+        self.assertEqual(added, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
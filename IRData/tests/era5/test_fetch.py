@@ -7,6 +7,40 @@ import ecmwfapi
 import os
 import shutil
 import tempfile
+import iris
+import cf_units
+import numpy
+
+
+# Will mock calls to the MARS server with a fake retrieval,
+#  making a small file with one field for each requested hour
+def fake_retrieve(request):
+    (first, last) = request["date"].split("/to/")
+    dtime = datetime.datetime.strptime(first, "%Y-%m-%d")
+    last = datetime.datetime.strptime(last, "%Y-%m-%d") + datetime.timedelta(days=1)
+    hours = []
+    while dtime < last:
+        hours.append((dtime - datetime.datetime(1900, 1, 1)).total_seconds() / 3600)
+        dtime += datetime.timedelta(hours=1)
+    time = iris.coords.DimCoord(
+        hours,
+        standard_name="time",
+        units=cf_units.Unit("hours since 1900-01-01 00:00:0.0", calendar="gregorian"),
+    )
+    latitude = iris.coords.DimCoord(
+        numpy.linspace(-90, 90, 5), standard_name="latitude", units="degrees"
+    )
+    longitude = iris.coords.DimCoord(
+        numpy.linspace(0, 270, 4), standard_name="longitude", units="degrees"
+    )
+    cube = iris.cube.Cube(
+        numpy.ones((len(hours), 5, 4), numpy.float32)
+        * numpy.array(hours, numpy.float32)[:, None, None],
+        var_name="msl",
+        units="Pa",
+        dim_coords_and_dims=[(time, 0), (latitude, 1), (longitude, 2)],
+    )
+    iris.save(cube, request["target"], saver="nc")
 
 
 class TestFetch(unittest.TestCase):
@@ -135,6 +169,40 @@ class TestFetch(unittest.TestCase):
             }
         )
 
+    # Fetch a month in weekly chunks
+    def test_fetch_prmsl_oper_weeks(self):
+        with patch.object(
+            ecmwfapi.ECMWFDataServer, "retrieve", side_effect=fake_retrieve
+        ) as mock_method:
+            era5.fetch(
+                "prmsl", datetime.datetime(2010, 3, 12), stream="oper", chunk="week"
+            )
+        self.assertEqual(mock_method.call_count, 5)
+        dates = sorted(c[0][0]["date"] for c in mock_method.call_args_list)
+        self.assertEqual(dates[0], "2010-03-01/to/2010-03-07")
+        self.assertEqual(dates[4], "2010-03-29/to/2010-03-31")
+        month_dir = "%s/ERA5/oper/hourly/2010/03" % os.getenv("SCRATCH")
+        self.assertFalse(os.path.exists("%s/chunks" % month_dir))
+        cube = iris.load_cube("%s/prmsl.nc" % month_dir)
+        self.assertEqual(cube.shape, (31 * 24, 5, 4))
+        self.assertTrue(cube.coord("time").is_monotonic())
+
+    # Chunks are usable before the month is complete
+    def test_load_prmsl_oper_from_chunk(self):
+        month_dir = "%s/ERA5/oper/hourly/2010/03" % os.getenv("SCRATCH")
+        os.makedirs("%s/chunks" % month_dir)
+        fake_retrieve(
+            {
+                "date": "2010-03-08/to/2010-03-14",
+                "target": "%s/chunks/prmsl.08-14.nc" % month_dir,
+            }
+        )
+        cube = era5.load("prmsl", datetime.datetime(2010, 3, 12, 6, 30), stream="oper")
+        self.assertEqual(cube.shape, (5, 4))
+        self.assertAlmostEqual(float(cube.data[0, 0]), 965934.5, places=1)
+        with self.assertRaises(Exception):
+            era5.load("prmsl", datetime.datetime(2010, 3, 16, 6), stream="oper")
+
     # Dud variable
     def test_fetch_mslp(self):
         with self.assertRaises(Exception) as cm:
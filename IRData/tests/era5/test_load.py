@@ -81,6 +81,39 @@ def fake_cube(file_name, constraint):
     return cube
 
 
+# Mock calls to iris.load_cube for a whole month of data - data values
+#  are the time (hours since 1900), so interpolation can be checked.
+def fake_month_cube(file_name, constraint):
+    year = int(file_name.split("/")[-3])
+    month = int(file_name.split("/")[-2])
+    start = datetime.datetime(year, month, 1)
+    times = []
+    while start.month == month:
+        times.append((start - datetime.datetime(1900, 1, 1)).total_seconds() / 3600.0)
+        start += datetime.timedelta(hours=3)
+    time = iris.coords.DimCoord(
+        numpy.array(times),
+        standard_name="time",
+        units=cf_units.Unit("hours since 1900-01-01 00:00:0.0", calendar="gregorian"),
+    )
+    ensemble = iris.coords.DimCoord(
+        numpy.linspace(0, 9, 10), long_name="ensemble member"
+    )
+    latitude = iris.coords.DimCoord(
+        numpy.linspace(-90, 90, 19), standard_name="latitude", units="degrees"
+    )
+    longitude = iris.coords.DimCoord(
+        numpy.linspace(-170, 180, 36), standard_name="longitude", units="degrees"
+    )
+    data = numpy.zeros((len(times), 10, 19, 36), numpy.float32)
+    data += numpy.array(times, numpy.float32)[:, None, None, None]
+    cube = iris.cube.Cube(
+        data,
+        dim_coords_and_dims=[(time, 0), (ensemble, 1), (latitude, 2), (longitude, 3)],
+    )
+    return cube.extract(constraint)
+
+
 class TestLoad(unittest.TestCase):
 
     # Controlled and temporary disc environment
@@ -127,6 +160,62 @@ class TestLoad(unittest.TestCase):
         # Right time?
         self.assertEqual(tc.coords()[3].points[0], 965937)
 
+    # load a series across a month boundary
+    def test_load_series(self):
+        fake_data_file("prmsl", "enda", 2010, 3)
+        fake_data_file("prmsl", "enda", 2010, 4)
+        with patch.object(iris, "load_cube", side_effect=fake_month_cube) as mock_load:
+            tc = era5.load_series(
+                "prmsl",
+                datetime.datetime(2010, 3, 31, 18),
+                datetime.datetime(2010, 4, 1, 6),
+                datetime.timedelta(minutes=90),
+                stream="enda",
+            )
+        # Each file read only once
+        self.assertEqual(mock_load.call_count, 2)
+        # Right dimensions
+        self.assertEqual(tc.shape, (8, 10, 19, 36))
+        self.assertEqual(tc.coord_dims("time"), (0,))
+        self.assertEqual(tc.coords()[1].long_name, "member")
+        # Right times, and right (interpolated) values
+        expected = numpy.arange(8) * 1.5 + 966402
+        self.assertTrue(numpy.allclose(tc.coord("time").points, expected))
+        self.assertTrue(numpy.allclose(tc.data[:, 3, 5, 7], expected))
+
+    # load a window, reading only what's needed
+    def test_load_prmsl_window(self):
+        fake_data_file("prmsl", "enda", 2010, 3)
+        with patch.object(iris, "load_cube", side_effect=fake_month_cube) as mock_load:
+            tc = era5.load(
+                "prmsl",
+                datetime.datetime(2010, 3, 12, 7, 30),
+                stream="enda",
+                window=(0, 40, 170, -150),
+            )
+        self.assertEqual(tc.shape, (10, 5, 5))
+        self.assertFalse(tc.has_lazy_data())
+        self.assertTrue(numpy.allclose(tc.data, 965935.5))
+
+    # refuse reads bigger than the limit
+    def test_load_prmsl_max_bytes(self):
+        fake_data_file("prmsl", "enda", 2010, 3)
+        with patch.object(iris, "load_cube", side_effect=fake_month_cube) as mock_load:
+            with self.assertRaises(MemoryError):
+                era5.load(
+                    "prmsl",
+                    datetime.datetime(2010, 3, 12, 6),
+                    stream="enda",
+                    max_bytes=10 * 19 * 36 * 4 - 1,
+                )
+            tc = era5.load(
+                "prmsl",
+                datetime.datetime(2010, 3, 12, 6),
+                stream="enda",
+                max_bytes=10 * 19 * 36 * 4,
+            )
+        self.assertEqual(tc.shape, (10, 19, 36))
+
     # Dud variable
     def test_fetch_mslp(self):
         with self.assertRaises(Exception) as cm:
@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import patch
+
+import IRData.era5 as era5
+import datetime
+import os
+import os.path
+import shutil
+import tempfile
+import iris
+import cf_units
+import numpy
+
+
+# Can only load data if it's on disc - create fake data file
+def fake_data_file(fc_init, year, month):
+    file_name = "%s/ERA5/enda/hourly/%04d/%02d/prate.%02d.nc" % (
+        os.environ["SCRATCH"],
+        year,
+        month,
+        fc_init,
+    )
+    if os.path.isfile(file_name):
+        return
+    if not os.path.isdir(os.path.dirname(file_name)):
+        os.makedirs(os.path.dirname(file_name))
+    fh = open(file_name, "a")
+    fh.close()
+
+
+# Mock calls to iris.load_cube with a fake forecast cube, covering the
+#  whole month - data values are the forecast initialisation hour.
+def fake_fc_cube(file_name, constraint):
+    fc_init = int(file_name[-5:-3])
+    year = int(file_name.split("/")[-3])
+    month = int(file_name.split("/")[-2])
+    start = datetime.datetime(year, month, 1)
+    times = []
+    while start.month == month or start.day == 1:
+        times.append((start - datetime.datetime(1900, 1, 1)).total_seconds() / 3600.0)
+        start += datetime.timedelta(hours=3)
+    time = iris.coords.DimCoord(
+        numpy.array(times),
+        standard_name="time",
+        units=cf_units.Unit("hours since 1900-01-01 00:00:0.0", calendar="gregorian"),
+    )
+    ensemble = iris.coords.DimCoord(
+        numpy.linspace(0, 9, 10), long_name="ensemble member"
+    )
+    latitude = iris.coords.DimCoord(
+        numpy.linspace(-90, 90, 19), standard_name="latitude", units="degrees"
+    )
+    longitude = iris.coords.DimCoord(
+        numpy.linspace(-170, 180, 36), standard_name="longitude", units="degrees"
+    )
+    cube = iris.cube.Cube(
+        numpy.zeros((len(times), 10, 19, 36), numpy.float32) + fc_init,
+        dim_coords_and_dims=[(time, 0), (ensemble, 1), (latitude, 2), (longitude, 3)],
+    )
+    return cube.extract(constraint)
+
+
+# Mock calls to iris.save - just make an empty file
+def fake_save(cube, file_name, **kwargs):
+    fh = open(file_name, "a")
+    fh.close()
+
+
+class TestBlend(unittest.TestCase):
+
+    # Controlled and temporary disc environment
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if os.path.isdir("%s/ERA5" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/ERA5" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    # Make a month of blended data
+    def test_make_blended_prate(self):
+        fake_data_file(18, 2010, 2)
+        fake_data_file(6, 2010, 3)
+        fake_data_file(18, 2010, 3)
+        with patch.object(iris, "load_cube", side_effect=fake_fc_cube) as mock_load:
+            with patch.object(iris, "save", side_effect=fake_save) as mock_save:
+                era5.make_blended_prate(2010, 3, stream="enda")
+        # Each forecast file read only once
+        self.assertEqual(mock_load.call_count, 3)
+        blended = mock_save.call_args[0][0]
+        self.assertEqual(
+            mock_save.call_args[0][1],
+            "%s/ERA5/enda/hourly/2010/03/prate.blend.nc.part" % os.environ["SCRATCH"],
+        )
+        # Whole month, 3-hourly
+        self.assertEqual(blended.shape, (31 * 8, 10, 19, 36))
+        # Continuous blend through the day
+        expected = numpy.array([18, 18, 18, 12, 6, 6, 6, 12], numpy.float32)
+        self.assertTrue(numpy.allclose(blended.data[8:16, 0, 0, 0], expected))
+
+    # Missing blended data
+    def test_load_blend_missing(self):
+        with self.assertRaises(Exception) as cm:
+            era5.load(
+                "prate",
+                datetime.datetime(2010, 3, 12, 6),
+                stream="enda",
+                fc_init="blend",
+            )
+        self.assertIn("might need era5.make_blended_prate", str(cm.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,8 @@ import unittest
 from unittest.mock import patch
 
 import IRData.twcr as twcr
+import IRData.twcr.version_2c.observations as observations
+import IRData.utils.fixed_width as fixed_width
 import datetime
 import sys
 import os
@@ -54,6 +56,67 @@ def fake_prfwf(file_name, **kwargs):
     return fdf
 
 
+# One line of a real (fixed-width) observations file - each value
+#  right-justified in its column, times within 3 hours of the file's
+#  time. The time offset and pressure columns overlap by one
+#  character: the pressure (when there is one) fills its column, so
+#  its first digit is also the last of the time offset.
+def fake_line(index, dtime):
+    line = [" "] * 206
+    for (number, (start, end)) in enumerate(observations._obs_colspecs):
+        name = observations._obs_names[number]
+        if name == "UID":
+            value = "%s%09d" % (
+                (dtime + datetime.timedelta(hours=index % 7 - 3)).strftime("%Y%m%d%H"),
+                index,
+            )
+        elif name == "Time.Offset":
+            value = "%.2f" % ((index % 7 - 3) * 0.25)
+            end = end - 1
+        elif name == "Pressure.after.bias.correction":
+            value = ("%7.2f" % (1000 + index * 0.37), "NA")[index % 5 == 4]
+        elif name == "Latitude":
+            value = "%.1f" % ((index * 37.3) % 180 - 90)
+        elif name == "Name":
+            value = ("SHIP %d" % index, "NA")[index % 4 == 1]
+        elif observations._obs_converters[name] is str:
+            value = "%d" % (index % 13)
+        elif observations._obs_converters[name] is int:
+            value = "%d" % ((index + number) % 10)
+        else:
+            value = ("%.2f" % (index * 1.37 - number), "*****", "-9.99")[
+                (index + number) % 3
+            ]
+        line[start:end] = list(value[: end - start].rjust(end - start))
+    return "".join(line)
+
+
+def fake_text_file(year, month, day, hour, n_lines=50):
+    file_name = (
+        "%s/20CR/version_2c/observations/%04d/prepbufrobs_assim_%04d%02d%02d%02d.txt"
+        % (os.environ["SCRATCH"], year, year, month, day, hour)
+    )
+    if not os.path.isdir(os.path.dirname(file_name)):
+        os.makedirs(os.path.dirname(file_name))
+    dtime = datetime.datetime(year, month, day, hour)
+    with open(file_name, "w") as f:
+        f.write("\n".join(fake_line(index, dtime) for index in range(n_lines)) + "\n")
+    return file_name
+
+
+# What pandas.read_fwf makes of the file
+def read_fwf(file_name):
+    return pandas.read_fwf(
+        file_name,
+        colspecs=observations._obs_colspecs,
+        header=None,
+        names=observations._obs_names,
+        converters=observations._obs_converters,
+        na_values=observations._obs_na_values,
+        comment=None,
+    ).infer_objects()
+
+
 class TestLoad(unittest.TestCase):
 
     # Controlled and temporary disc environment
@@ -126,5 +189,102 @@ class TestLoad(unittest.TestCase):
         self.assertIn("No obs file for given version and date", str(cm.exception))
 
 
+# The same, from real observations files (not a mocked read_fwf)
+class TestLoadFiles(unittest.TestCase):
+
+    # Controlled and temporary disc environment
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if os.path.isdir("%s/20CR" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/20CR" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    def check_same(self, o, expected):
+        pandas.testing.assert_frame_equal(o, expected, check_dtype=False)
+
+    # Parsed the first time (and cached), then read from the cache -
+    #  same as read_fwf both times
+    def test_load_1file_cached(self):
+        file_name = fake_text_file(1987, 7, 2, 6)
+        expected = read_fwf(file_name)
+        self.assertFalse(os.path.isfile("%s.npy" % file_name))
+        with patch.object(
+            fixed_width, "_read_bytes", side_effect=fixed_width._read_bytes
+        ) as mock_read:
+            o = twcr.load_observations_1file(
+                datetime.datetime(1987, 7, 2, 6), version=version
+            )
+        self.assertEqual(mock_read.call_count, 1)
+        self.assertTrue(os.path.isfile("%s.npy" % file_name))
+        self.check_same(o, expected)
+        with patch.object(fixed_width, "_read_bytes") as mock_read:
+            o = twcr.load_observations_1file(
+                datetime.datetime(1987, 7, 2, 6), version=version
+            )
+        self.assertEqual(mock_read.call_count, 0)
+        self.check_same(o, expected)
+
+    # The overlapping columns share a character
+    def test_load_1file_overlap(self):
+        file_name = fake_text_file(1987, 7, 2, 6)
+        o = twcr.load_observations_1file(
+            datetime.datetime(1987, 7, 2, 6), version=version
+        )
+        self.assertAlmostEqual(o["Time.Offset"][0], -0.751)
+        self.assertAlmostEqual(o["Pressure.after.bias.correction"][0], 1000.0)
+        self.assertAlmostEqual(o["Time.Offset"][4], 0.25)
+        self.assertTrue(numpy.isnan(o["Pressure.after.bias.correction"][4]))
+        self.check_same(o, read_fwf(file_name))
+
+    # All the observations in a period, from the files within 3 hours
+    def test_load_period(self):
+        frames = []
+        for hour in (0, 6, 12):
+            o = read_fwf(fake_text_file(1987, 7, 2, hour))
+            dtm = pandas.to_datetime(o.UID.str.slice(0, 10), format="%Y%m%d%H")
+            frames.append(
+                o[
+                    (dtm >= datetime.datetime(1987, 7, 2, 2))
+                    & (dtm < datetime.datetime(1987, 7, 2, 13))
+                ]
+            )
+        expected = pandas.concat(frames)
+        for workers in (None, 2):
+            o = twcr.load_observations(
+                datetime.datetime(1987, 7, 2, 1, 30),
+                datetime.datetime(1987, 7, 2, 12, 15),
+                version=version,
+                workers=workers,
+            )
+            self.check_same(o, expected)
+
+    # Weights of the files around a time, to the second
+    def test_fortime_files(self):
+        self.assertEqual(
+            observations._fortime_files(datetime.datetime(1987, 7, 2, 6)),
+            [(datetime.datetime(1987, 7, 2, 6), 1)],
+        )
+        files = observations._fortime_files(datetime.datetime(1987, 7, 2, 22, 45, 36))
+        self.assertEqual(
+            [dtime for (dtime, weight) in files],
+            [datetime.datetime(1987, 7, 2, 18), datetime.datetime(1987, 7, 3, 0)],
+        )
+        self.assertAlmostEqual(files[0][1], 1 - (4 * 3600 + 45 * 60 + 36) / 21600.0)
+        self.assertAlmostEqual(files[0][1] + files[1][1], 1)
+        fake_text_file(1987, 7, 2, 18)
+        fake_text_file(1987, 7, 3, 0, n_lines=30)
+        o = twcr.load_observations_fortime(
+            datetime.datetime(1987, 7, 2, 22, 45, 36), version=version
+        )
+        expected = numpy.concatenate(
+            (numpy.repeat(files[0][1], 50), numpy.repeat(files[1][1], 30))
+        )
+        self.assertTrue(numpy.allclose(o.weight, expected))
+
+
 if __name__ == "__main__":
     unittest.main()
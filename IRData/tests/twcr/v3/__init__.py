@@ -0,0 +1,70 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+"""
+Tools, built on top of SciTools/Iris, for accessing, plotting and 
+analysing weather data.
+
+"""
+
+import datetime
+import os
+import os.path
+import iris
+import cf_units
+import numpy
+
+
+# Write a small member file: PRMSL at the given times (datetimes), on a
+#  10-degree grid. Data value is the member number plus the offset for
+#  the time (plus latitude/10 + longitude/100 if gradient). north_first
+#  orders the grid as in the release files - latitudes north to south,
+#  longitudes 0 to 350 (otherwise south to north, and -170 to 180).
+def make_member_file(
+    file_name, member, times, offsets, north_first=False, gradient=False
+):
+    if not os.path.isdir(os.path.dirname(file_name)):
+        os.makedirs(os.path.dirname(file_name))
+    time = iris.coords.DimCoord(
+        [(t - datetime.datetime(1800, 1, 1)).total_seconds() / 3600 for t in times],
+        standard_name="time",
+        var_name="time",
+        units=cf_units.Unit("hours since 1800-01-01 00:00:0.0", calendar="gregorian"),
+    )
+    if north_first:
+        (latitudes, longitudes) = (
+            numpy.linspace(90, -90, 19),
+            numpy.linspace(0, 350, 36),
+        )
+    else:
+        (latitudes, longitudes) = (
+            numpy.linspace(-90, 90, 19),
+            numpy.linspace(-170, 180, 36),
+        )
+    latitude = iris.coords.DimCoord(
+        latitudes, standard_name="latitude", var_name="lat", units="degrees"
+    )
+    longitude = iris.coords.DimCoord(
+        longitudes, standard_name="longitude", var_name="lon", units="degrees"
+    )
+    data = numpy.zeros((len(times), 19, 36)) + member
+    data += numpy.asarray(offsets, numpy.float64)[:, None, None]
+    if gradient:
+        data += latitudes[None, :, None] / 10 + longitudes[None, None, :] / 100
+    cube = iris.cube.Cube(
+        data.astype(numpy.float32),
+        var_name="PRMSL",
+        units="Pa",
+        dim_coords_and_dims=[(time, 0), (latitude, 1), (longitude, 2)],
+    )
+    iris.save(cube, file_name, saver="nc")
+    return file_name
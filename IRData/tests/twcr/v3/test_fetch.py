@@ -0,0 +1,119 @@
+import unittest
+from unittest.mock import patch
+
+import IRData.twcr as twcr
+import datetime
+import os
+import os.path
+import shutil
+import tarfile
+import tempfile
+from IRData.tests.twcr.v3 import make_member_file
+
+version = "3"
+
+# Annual member files, with one time in each of March, April and May -
+#  data value is the member number plus the month
+months = [3, 4, 5]
+times = [datetime.datetime(1969, month, 12, 6) for month in months]
+
+
+# Stands in for a wget process writing the tar to its stdout
+class FakeWget:
+    def __init__(self, tar_file):
+        self.stdout = open(tar_file, "rb")
+        self.returncode = None
+
+    def terminate(self):
+        self.returncode = -15
+
+    def wait(self):
+        if self.returncode is None:
+            self.returncode = 0
+        return self.returncode
+
+
+class TestFetch(unittest.TestCase):
+
+    # Controlled and temporary disc environment, with a tar file
+    #  (as it would be on the server) outside it.
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+        self.remote = tempfile.mkdtemp()
+        self.tar_file = "%s/PRMSL_1969.tar" % self.remote
+        with tarfile.open(self.tar_file, "w") as tar:
+            for member in range(1, 81):
+                file_name = "%s/PRMSL.1969_mem%03d.nc" % (self.remote, member)
+                make_member_file(file_name, member, times, months)
+                tar.add(file_name, arcname="1969/%s" % os.path.basename(file_name))
+                os.remove(file_name)
+        self.base_dir = "%s/20CR/version_3/1969" % os.environ["SCRATCH"]
+
+    def tearDown(self):
+        shutil.rmtree(self.remote)
+        if os.path.isdir("%s/20CR" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/20CR" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    # Only the selected members and months are kept
+    def test_fetch_subset_members_months(self):
+        with patch(
+            "IRData.twcr.version_3_release.fetch.subprocess.Popen",
+            side_effect=lambda *args, **kwargs: FakeWget(self.tar_file),
+        ) as mock_wget:
+            twcr.version_3_release.fetch_subset(
+                "PRMSL", 1969, members=[2, 5], months=[3, 4]
+            )
+            # Already got - no download
+            twcr.version_3_release.fetch_subset(
+                "PRMSL", 1969, members=[2, 5], months=[3, 4]
+            )
+        self.assertEqual(mock_wget.call_count, 1)
+        self.assertIn(
+            "https://portal.nersc.gov/archive/home/projects/incite11/www/"
+            + "20C_Reanalysis_version_3/everymember_anal_netcdf/subdaily"
+            + "/PRMSL/PRMSL_1969.tar",
+            mock_wget.call_args[0][0],
+        )
+        self.assertEqual(
+            sorted(os.listdir(self.base_dir)),
+            [
+                "PRMSL.196903_mem002.nc",
+                "PRMSL.196903_mem005.nc",
+                "PRMSL.196904_mem002.nc",
+                "PRMSL.196904_mem005.nc",
+            ],
+        )
+        pr = twcr.load(
+            "PRMSL", datetime.datetime(1969, 4, 12, 6), version=version, member=5
+        )
+        self.assertEqual(pr.data[0, 0], 9)
+
+    # Whole year for the selected members
+    def test_fetch_subset_members(self):
+        with patch(
+            "IRData.twcr.version_3_release.fetch.subprocess.Popen",
+            side_effect=lambda *args, **kwargs: FakeWget(self.tar_file),
+        ):
+            twcr.version_3_release.fetch_subset("PRMSL", 1969, members=[80])
+        self.assertEqual(os.listdir(self.base_dir), ["PRMSL.1969_mem080.nc"])
+        pr = twcr.load(
+            "PRMSL", datetime.datetime(1969, 5, 12, 6), version=version, member=80
+        )
+        self.assertEqual(pr.data[0, 0], 85)
+
+    # Members not in the tar
+    def test_fetch_subset_missing_member(self):
+        with patch(
+            "IRData.twcr.version_3_release.fetch.subprocess.Popen",
+            side_effect=lambda *args, **kwargs: FakeWget(self.tar_file),
+        ):
+            with self.assertRaises(Exception) as cm:
+                twcr.version_3_release.fetch_subset("PRMSL", 1969, members=[1, 81])
+        self.assertIn("members 81", str(cm.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
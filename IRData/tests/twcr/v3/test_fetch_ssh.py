@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import patch
+
+import IRData.twcr as twcr
+import os
+import os.path
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+
+version = "4.5.1"
+
+
+# Stands in for rsync - copies local files, slowly enough
+#  that transfers overlap, and fails for missing sources.
+class FakeRsync:
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, cmd, shell=True):
+        (source, target) = cmd.split()[-2:]
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(0.05)
+            if not os.path.isfile(source):
+                return 23
+            shutil.copy(source, target)
+            return 0
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class TestFetchSSH(unittest.TestCase):
+
+    # Controlled and temporary disc environment, with a local
+    #  directory standing in for the one at NERSC.
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+        self.remote = tempfile.mkdtemp()
+        for variable in ("prmsl", "air.2m"):
+            for month in (1, 2, 3):
+                self.make_remote_tar(variable, 1969, month)
+
+    def tearDown(self):
+        shutil.rmtree(self.remote)
+        if os.path.isdir("%s/20CR" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/20CR" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    # Remote tar file with 2 member files in it
+    def make_remote_tar(self, variable, year, month):
+        tar_dir = "%s/%04d/%02d" % (self.remote, year, month)
+        if not os.path.isdir(tar_dir):
+            os.makedirs(tar_dir)
+        tar_file = "%s/%s_%04d%02d_v3_x451.tar" % (tar_dir, variable, year, month)
+        with tarfile.open(tar_file, "w") as tar:
+            for member in (1, 2):
+                name = "%04d/%s.%04d%02d_mem%03d.nc" % (
+                    year,
+                    variable,
+                    year,
+                    month,
+                    member,
+                )
+                with open("%s/member" % self.remote, "w") as f:
+                    f.write(name)
+                tar.add("%s/member" % self.remote, arcname=name)
+        os.remove("%s/member" % self.remote)
+
+    def check_unpacked(self, variables, months):
+        for variable in variables:
+            for month in months:
+                for member in (1, 2):
+                    self.assertTrue(
+                        os.path.isfile(
+                            "%s/20CR/version_4.5.1/1969/%s.1969%02d_mem%03d.nc"
+                            % (os.environ["SCRATCH"], variable, month, member)
+                        )
+                    )
+
+    # Several transfers at once, each unpacked
+    def test_fetch_ssh_batch(self):
+        rsync = FakeRsync()
+        with patch(
+            "IRData.twcr.version_3_release.fetch_ssh.subprocess.call",
+            side_effect=rsync,
+        ) as mock_rsync:
+            twcr.version_3_release.fetch_ssh_batch(
+                ["prmsl", "air.2m"],
+                [(1969, 1), (1969, 2), (1969, 3)],
+                version,
+                workers=3,
+                remote_dir=self.remote,
+            )
+            self.assertEqual(mock_rsync.call_count, 6)
+            self.assertIn("--partial-dir", mock_rsync.call_args[0][0])
+            self.assertGreater(rsync.max_running, 1)
+            self.check_unpacked(["prmsl", "air.2m"], [1, 2, 3])
+            # Already got - no transfers
+            twcr.version_3_release.fetch_ssh_batch(
+                ["prmsl"], [(1969, 2)], version, remote_dir=self.remote
+            )
+            self.assertEqual(mock_rsync.call_count, 6)
+
+    # Failures reported, after the rest are done
+    def test_fetch_ssh_batch_missing(self):
+        with patch(
+            "IRData.twcr.version_3_release.fetch_ssh.subprocess.call",
+            side_effect=FakeRsync(),
+        ):
+            with self.assertRaises(Exception) as cm:
+                twcr.version_3_release.fetch_ssh_batch(
+                    ["prmsl"],
+                    [(1969, 3), (1969, 4)],
+                    version,
+                    remote_dir=self.remote,
+                )
+        self.assertIn("prmsl 1969-04 (code 23)", str(cm.exception))
+        self.check_unpacked(["prmsl"], [3])
+
+    # With rsync itself, from a local directory
+    @unittest.skipIf(shutil.which("rsync") is None, "rsync not installed")
+    def test_fetch_ssh_batch_rsync(self):
+        twcr.version_3_release.fetch_ssh_batch(
+            ["prmsl"], [(1969, 1), (1969, 2)], version, remote_dir=self.remote
+        )
+        self.check_unpacked(["prmsl"], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+
+import IRData.twcr.version_3_release.utils as utils
+import os
+import os.path
+import shutil
+import tempfile
+import time
+
+
+class TestFileIndex(unittest.TestCase):
+
+    # Controlled and temporary disc environment, with (empty)
+    #  annual member files, last changed some time ago.
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+        self.data_dir = "%s/20CR/version_3/1969" % os.environ["SCRATCH"]
+        os.makedirs(self.data_dir)
+        for member in range(1, 81):
+            open("%s/PRMSL.1969_mem%03d.nc" % (self.data_dir, member), "w").close()
+        self.age_dir(100)
+
+    def tearDown(self):
+        if os.path.isdir("%s/20CR" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/20CR" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    def age_dir(self, seconds):
+        then = time.time() - seconds
+        os.utime(self.data_dir, (then, then))
+
+    # Monthly file if there is one, otherwise annual
+    def test_file_name_monthly_or_annual(self):
+        self.assertEqual(
+            os.path.basename(utils._get_data_file_name("PRMSL", 1969, 3, member=5)),
+            "PRMSL.1969_mem005.nc",
+        )
+        open("%s/PRMSL.196903_mem005.nc" % self.data_dir, "w").close()
+        self.age_dir(50)  # New mtime - listing out of date
+        self.assertEqual(
+            os.path.basename(utils._get_data_file_name("PRMSL", 1969, 3, member=5)),
+            "PRMSL.196903_mem005.nc",
+        )
+        self.assertEqual(
+            os.path.basename(utils._get_data_file_name("PRMSL", 1969, 4, member=5)),
+            "PRMSL.1969_mem005.nc",
+        )
+
+    # Files added just now are seen, even without an mtime change
+    def test_file_name_recent_change(self):
+        utils._get_data_file_name("PRMSL", 1969, 3, member=5)
+        open("%s/PRMSL.196903_mem005.nc" % self.data_dir, "w").close()
+        self.assertEqual(
+            os.path.basename(utils._get_data_file_name("PRMSL", 1969, 3, member=5)),
+            "PRMSL.196903_mem005.nc",
+        )
+
+    # One stat, and no file checks, for all the members
+    def test_file_name_snapshot(self):
+        with patch.object(os, "stat", wraps=os.stat) as mock_stat:
+            with utils._dir_snapshot():
+                for member in range(1, 81):
+                    for month in (3, 4):
+                        utils._get_data_file_name("PRMSL", 1969, month, member=member)
+                        utils._get_available_packed_file_name("PRMSL", 1969, month)
+        self.assertEqual(mock_stat.call_count, 1)
+
+    # No directory - no files
+    def test_file_name_no_directory(self):
+        self.assertFalse(
+            utils._is_data_file("%s/../1970/PRMSL.1970_mem001.nc" % self.data_dir)
+        )
+        self.assertIsNone(utils._get_available_packed_file_name("PRMSL", 1970, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
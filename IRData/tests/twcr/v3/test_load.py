@@ -0,0 +1,169 @@
+import unittest
+from unittest.mock import patch
+
+import IRData.twcr as twcr
+import concurrent.futures
+import importlib
+import datetime
+import os
+import os.path
+import re
+import shutil
+import tempfile
+import time
+import iris
+import cf_units
+import numpy
+
+version = "3"
+
+# (IRData.twcr.version_3_release.load is the function, not the module)
+v3_load = importlib.import_module("IRData.twcr.version_3_release.load")
+
+
+# Will mock calls to iris.load_cube with a fake cube constructor
+#  - one member per file, data value is the member number plus the hour.
+def fake_cube(file_name, constraint):
+
+    year = int(constraint.__dict__["_coord_values"]["time"].year)
+    month = int(constraint.__dict__["_coord_values"]["time"].month)
+    day = int(constraint.__dict__["_coord_values"]["time"].day)
+    hour = int(constraint.__dict__["_coord_values"]["time"].hour)
+    dtime = datetime.datetime(year, month, day, hour)
+    member = int(re.search(r"_mem(\d\d\d)\.nc", file_name).group(1))
+    # Finish out of order, if loaded in parallel
+    time.sleep(0.001 * (member % 3))
+
+    latitude = iris.coords.DimCoord(
+        numpy.linspace(-90, 90, 19), standard_name="latitude", units="degrees"
+    )
+    longitude = iris.coords.DimCoord(
+        numpy.linspace(-170, 180, 36), standard_name="longitude", units="degrees"
+    )
+    cube = iris.cube.Cube(
+        numpy.zeros((19, 36), numpy.float32) + member + hour,
+        dim_coords_and_dims=[(latitude, 0), (longitude, 1)],
+    )
+    dthours = (dtime - datetime.datetime(1900, 1, 1)).total_seconds() / 3600.0
+    cube.add_aux_coord(
+        iris.coords.AuxCoord(
+            dthours,
+            standard_name="time",
+            units=cf_units.Unit(
+                "hours since 1900-01-01 00:00:0.0", calendar="gregorian"
+            ),
+        )
+    )
+    cube.attributes["history"] = file_name
+    return cube
+
+
+# Same, but with missing data: the first point of every 5th member
+#  (at 06), and the second point of every 7th member (at 09)
+def fake_masked_cube(file_name, constraint):
+    cube = fake_cube(file_name, constraint)
+    member = int(re.search(r"_mem(\d\d\d)\.nc", file_name).group(1))
+    hour = int(constraint.__dict__["_coord_values"]["time"].hour)
+    mask = numpy.zeros(cube.shape, bool)
+    if hour == 6 and member % 5 == 0:
+        mask[0, 0] = True
+    if hour == 9 and member % 7 == 0:
+        mask[0, 1] = True
+    cube.data = numpy.ma.array(cube.data, mask=mask, fill_value=-1)
+    cube.data.data[mask] = 1.0e20
+    return cube
+
+
+class TestLoad(unittest.TestCase):
+
+    # Controlled and temporary disc environment
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if os.path.isdir("%s/20CR" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/20CR" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    # All 80 members, with and without parallel loading
+    def test_load_prmsl_all_members(self):
+        for workers in (None, 8):
+            with patch.object(iris, "load_cube", side_effect=fake_cube) as mock_load:
+                tc = twcr.load(
+                    "PRMSL",
+                    datetime.datetime(1969, 3, 12, 6),
+                    version=version,
+                    workers=workers,
+                )
+            if workers is None:
+                # Parallel loads are in other processes, not seen by the mock
+                self.assertEqual(mock_load.call_count, 80)
+            self.assertEqual(tc.shape, (80, 19, 36))
+            # Members in order
+            self.assertEqual(list(tc.coord("member").points), list(range(1, 81)))
+            self.assertEqual(list(tc.data[:, 0, 0]), list(range(7, 87)))
+            self.assertEqual(tc.coord("member").shape, (80,))
+            self.assertEqual(tc.coord_dims("member"), (0,))
+            self.assertEqual(tc.coord("time").points[0], 606534)
+
+    # Interpolated load reads both timesteps for each member - with
+    #  one set of worker processes
+    def test_load_prmsl_interpolated(self):
+        with patch.object(iris, "load_cube", side_effect=fake_cube) as mock_load:
+            with patch.object(
+                v3_load.concurrent.futures,
+                "ProcessPoolExecutor",
+                side_effect=concurrent.futures.ProcessPoolExecutor,
+            ) as mock_pool:
+                tc = twcr.load(
+                    "PRMSL",
+                    datetime.datetime(1969, 3, 12, 7),
+                    version=version,
+                    workers=4,
+                )
+        self.assertEqual(mock_pool.call_count, 1)
+        self.assertEqual(tc.shape, (80, 19, 36))
+        # Linear interpolation between 06 and 09
+        numpy.testing.assert_allclose(tc.data[:, 0, 0], numpy.arange(1, 81) + 7)
+        self.assertEqual(tc.coord("time").points[0], 606535)
+        self.assertEqual(tc.coord_dims("member"), (0,))
+
+    # Worker processes read the data, not just open the files
+    def test_read_member_slice(self):
+        with patch.object(iris, "load_cube", side_effect=fake_cube):
+            hslice = v3_load._read_member_slice(5, "PRMSL", 1969, 3, 12, 6)
+        self.assertFalse(hslice.has_lazy_data())
+        self.assertEqual(hslice.data[0, 0], 11)
+
+    # Missing data stay missing
+    def test_load_prmsl_masked_members(self):
+        members = numpy.arange(1, 81)
+        for workers in (None, 4):
+            with patch.object(iris, "load_cube", side_effect=fake_masked_cube):
+                tc = twcr.load(
+                    "PRMSL",
+                    datetime.datetime(1969, 3, 12, 6),
+                    version=version,
+                    workers=workers,
+                )
+                ti = twcr.load(
+                    "PRMSL",
+                    datetime.datetime(1969, 3, 12, 7),
+                    version=version,
+                    workers=workers,
+                )
+            self.assertTrue(numpy.ma.is_masked(tc.data))
+            numpy.testing.assert_array_equal(tc.data.mask[:, 0, 0], members % 5 == 0)
+            self.assertFalse(tc.data.mask[:, 1:, :].any())
+            self.assertFalse(tc.data.mask[:, 0, 1:].any())
+            self.assertEqual(list(tc.data[:, 0, 1]), list(members + 6))
+            # Missing at either time is missing when interpolated
+            numpy.testing.assert_array_equal(ti.data.mask[:, 0, 0], members % 5 == 0)
+            numpy.testing.assert_array_equal(ti.data.mask[:, 0, 1], members % 7 == 0)
+            numpy.testing.assert_allclose(ti.data[:, 1, 1], members + 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,628 @@
+import unittest
+from unittest.mock import patch
+
+import IRData.twcr as twcr
+import IRData.twcr.version_3_release.observations as observations
+import IRData.utils.fixed_width as fixed_width
+import datetime
+import gzip
+import os
+import os.path
+import shutil
+import tempfile
+import tracemalloc
+import numpy
+import pandas
+
+version = "3"
+
+
+# One line of an observations file - each value right-justified in its
+#  column. Some lines are short (trailing fields blank). Observation
+#  times are within 3 hours of the file's time.
+def fake_line(index, dtime=datetime.datetime(1987, 7, 2, 6)):
+    line = [" "] * 223
+    for (number, (start, end)) in enumerate(observations._obs_colspecs):
+        name = observations._obs_names[number]
+        if name == "UID":
+            value = "%s%09d" % (
+                (dtime + datetime.timedelta(hours=index % 7 - 3)).strftime("%Y%m%d%H"),
+                index,
+            )
+        elif name in ("Latitude", "Longitude") and index % 6 != 5:
+            # Positions all over the globe, and different in each file
+            if name == "Latitude":
+                value = "%.1f" % ((index * 37.3) % 180 - 90)
+            else:
+                value = "%.1f" % ((index * 53.7 + dtime.hour * 7) % 360 - 180)
+        elif name == "Name":
+            value = ("SHIP %d" % index, "NA", "Ste. Agathe\xe9", "9")[index % 4]
+        elif observations._obs_converters[name] is str:
+            value = "%d" % (index % 13)
+        elif observations._obs_converters[name] is int:
+            value = "%d" % ((index + number) % 10)
+        else:
+            # Some numbers, and some of each sort of missing value
+            value = (
+                "%.2f" % (index * 1.37 - number),
+                "*" * max(w for w in (1, 3, 5, 7, 10) if w <= end - start),
+                "-99",
+                "9999.99",
+                "-9.99",
+                "",
+            )[(index + number) % 6]
+        line[start:end] = list(value[: end - start].rjust(end - start))
+    line = "".join(line)
+    if index % 7 == 3:
+        line = line[:145].rstrip()
+    return line
+
+
+def fake_data_file(year, month, day, hour, compress=False, n_lines=100):
+    file_name = (
+        "%s/20CR/version_3/observations/%04d/%04d%02d%02d%02d_psobs_posterior.txt"
+        % (
+            os.environ["SCRATCH"],
+            year,
+            year,
+            month,
+            day,
+            hour,
+        )
+    )
+    if not os.path.isdir(os.path.dirname(file_name)):
+        os.makedirs(os.path.dirname(file_name))
+    dtime = datetime.datetime(year, month, day, hour)
+    text = "\n".join(fake_line(index, dtime) for index in range(n_lines)) + "\n"
+    if compress:
+        with gzip.open("%s.gz" % file_name, "wb") as f:
+            f.write(text.encode("ISO-8859-1"))
+        return "%s.gz" % file_name
+    with open(file_name, "wb") as f:
+        f.write(text.encode("ISO-8859-1"))
+    return file_name
+
+
+# What pandas.read_fwf makes of the file
+def read_fwf(file_name):
+    return pandas.read_fwf(
+        file_name,
+        colspecs=observations._obs_colspecs,
+        header=None,
+        encoding="ISO-8859-1",
+        names=observations._obs_names,
+        converters=observations._obs_converters,
+        na_values=observations._obs_na_values,
+        comment=None,
+        compression="infer",
+    )
+
+
+class TestLoadObservations(unittest.TestCase):
+
+    # Controlled and temporary disc environment
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if os.path.isdir("%s/20CR" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/20CR" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    def check_same(self, o, expected):
+        # pandas leaves numeric columns with missing-value strings
+        #  in them as objects - same values though
+        pandas.testing.assert_frame_equal(
+            o, expected.infer_objects(), check_dtype=False
+        )
+        for name in o.columns:
+            if observations._obs_converters[name] is not str:
+                self.assertTrue(pandas.api.types.is_numeric_dtype(o[name]))
+
+    # Same as read_fwf, without calling it
+    def test_load_1file(self):
+        file_name = fake_data_file(1987, 7, 2, 6)
+        expected = read_fwf(file_name)
+        with patch.object(pandas, "read_fwf") as mock_read:
+            o = twcr.load_observations_1file(
+                datetime.datetime(1987, 7, 2, 6), version=version
+            )
+        self.assertEqual(mock_read.call_count, 0)
+        self.assertEqual(len(o.UID), 100)
+        self.assertTrue(numpy.isnan(o.Name[1]))
+        self.assertEqual(o.Name[2], "Ste. Agathe\xe9")
+        self.assertTrue(numpy.isnan(o.Longitude).any())
+        self.check_same(o, expected)
+
+    # Compressed file
+    def test_load_1file_gz(self):
+        file_name = fake_data_file(1987, 7, 2, 12, compress=True)
+        o = twcr.load_observations_1file(
+            datetime.datetime(1987, 7, 2, 12), version=version
+        )
+        self.check_same(o, read_fwf(file_name))
+
+    # Parsed once, then read from the cache
+    def test_load_1file_cached(self):
+        file_name = fake_data_file(1987, 7, 2, 6)
+        o = twcr.load_observations_1file(
+            datetime.datetime(1987, 7, 2, 6), version=version
+        )
+        self.assertTrue(os.path.isfile("%s.npy" % file_name))
+        with patch.object(fixed_width, "_read_bytes") as mock_read:
+            o2 = twcr.load_observations_1file(
+                datetime.datetime(1987, 7, 2, 6), version=version
+            )
+        self.assertEqual(mock_read.call_count, 0)
+        pandas.testing.assert_frame_equal(o2, o)
+
+    # Cache not used once the file has changed
+    def test_load_1file_cache_out_of_date(self):
+        file_name = fake_data_file(1987, 7, 2, 6)
+        twcr.load_observations_1file(datetime.datetime(1987, 7, 2, 6), version=version)
+        fake_data_file(1987, 7, 2, 6, n_lines=50)
+        os.utime(file_name, ns=(0, 0))
+        o = twcr.load_observations_1file(
+            datetime.datetime(1987, 7, 2, 6), version=version
+        )
+        self.assertEqual(len(o.UID), 50)
+        # Same size, different time
+        with open(file_name, "r+b") as f:
+            f.write(b"1969")
+        o = twcr.load_observations_1file(
+            datetime.datetime(1987, 7, 2, 6), version=version
+        )
+        self.assertEqual(o.UID[0][:4], "1969")
+
+    # Just some of the rows - from the file, and from the cache
+    def test_load_1file_rows(self):
+        file_name = fake_data_file(1987, 7, 2, 6)
+        expected = read_fwf(file_name).iloc[[97, 3, 4, 50]]
+        for attempt in ("parsed", "cached"):
+            o = observations.load_observations_1file(
+                datetime.datetime(1987, 7, 2, 6), version=version, rows=[97, 3, 4, 50]
+            )
+            self.check_same(o, expected)
+        self.assertTrue(os.path.isfile("%s.npy" % file_name))
+
+    # Only some columns, of the observations that pass the conditions
+    def test_load_1file_columns_where(self):
+        file_name = fake_data_file(1987, 7, 2, 6)
+        o = read_fwf(file_name).infer_objects()
+        expected = o[
+            o.Type.isin(["1", "5"]) & (o.Latitude >= -30) & (o.Latitude <= 60)
+        ][["UID", "Latitude", "Observed"]]
+        self.assertGreater(len(expected.index), 0)
+        for attempt in ("parsed", "cached"):
+            o = twcr.load_observations_1file(
+                datetime.datetime(1987, 7, 2, 6),
+                version=version,
+                columns=["Observed", "UID", "Latitude"],
+                where={"Type": ["1", "5"], "Latitude": (-30, 60)},
+            )
+            self.check_same(o, expected)
+        # Without a cache, other columns aren't converted
+        with patch.object(
+            fixed_width, "_convert_column", side_effect=fixed_width._convert_column
+        ) as mock_convert:
+            o = fixed_width._read_fixed_width(
+                file_name,
+                colspecs=observations._obs_colspecs,
+                names=observations._obs_names,
+                converters=observations._obs_converters,
+                na_values=observations._obs_na_values,
+                usecols=["Observed", "UID", "Latitude"],
+                where={"Type": ["1", "5"], "Latitude": (-30, 60)},
+            )
+        self.assertEqual(mock_convert.call_count, 4)
+        self.check_same(o, expected)
+
+    # From the cache, only the wanted values are copied into memory
+    def test_load_1file_columns_where_cached_memory(self):
+        file_name = fake_data_file(1987, 7, 2, 6, n_lines=3000)
+        o = twcr.load_observations_1file(
+            datetime.datetime(1987, 7, 2, 6), version=version
+        )
+        expected = o[(o.Latitude >= 0) & (o.Latitude <= 10)][["Latitude"]]
+        cache_size = os.path.getsize("%s.npy" % file_name)
+        tracemalloc.start()
+        try:
+            o = twcr.load_observations_1file(
+                datetime.datetime(1987, 7, 2, 6),
+                version=version,
+                columns=["Latitude"],
+                where={"Latitude": (0, 10)},
+            )
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.check_same(o, expected)
+        self.assertLess(peak, cache_size / 10)
+
+    # Longitude range crossing 0, and a single value
+    def test_load_1file_where_wrapped(self):
+        o = read_fwf(fake_data_file(1987, 7, 2, 6)).infer_objects()
+        expected = o[
+            ((o.Longitude >= 170) | (o.Longitude <= -170)) & (o["NCEP.Type"] == 7)
+        ]
+        self.assertGreater(len(expected.index), 0)
+        o = twcr.load_observations_1file(
+            datetime.datetime(1987, 7, 2, 6),
+            version=version,
+            where={"Longitude": (170, -170), "NCEP.Type": 7},
+        )
+        self.check_same(o, expected)
+
+    # All the observations in a period - from the files within 3 hours,
+    #  read one after another, or in parallel
+    def test_load_period(self):
+        frames = []
+        for hour in (0, 6, 12, 18):
+            o = read_fwf(fake_data_file(1987, 7, 2, hour))
+            dtm = pandas.to_datetime(o.UID.str.slice(0, 10), format="%Y%m%d%H")
+            frames.append(
+                o[
+                    (dtm >= datetime.datetime(1987, 7, 2, 2))
+                    & (dtm < datetime.datetime(1987, 7, 2, 13))
+                ]
+            )
+        expected = pandas.concat(frames[:3])
+        for workers in (None, 2):
+            o = twcr.load_observations(
+                datetime.datetime(1987, 7, 2, 1, 30),
+                datetime.datetime(1987, 7, 2, 12, 15),
+                version=version,
+                workers=workers,
+            )
+            self.check_same(o, expected)
+        self.assertEqual(len(frames[3].index), 0)
+        o = twcr.load_observations(
+            datetime.datetime(1987, 7, 2, 1, 30),
+            datetime.datetime(1987, 7, 2, 12, 15),
+            version=version,
+            columns=["Observed", "Latitude"],
+            where={"Latitude": (0, None)},
+        )
+        self.check_same(o, expected[expected.Latitude >= 0][["Latitude", "Observed"]])
+        o = twcr.load_observations_fortime(
+            datetime.datetime(1987, 7, 2, 3),
+            version=version,
+            columns=["UID", "Latitude"],
+            where={"Latitude": (0, None)},
+        )
+        self.assertEqual(list(o.columns), ["UID", "Latitude", "weight"])
+        self.assertTrue((o.Latitude >= 0).all())
+        self.assertGreater(len(o.index), 0)
+
+    # Compact observations - same values, in less memory
+    def test_compact(self):
+        for hour in (0, 6, 12, 18):
+            fake_data_file(1987, 7, 2, hour)
+        start = datetime.datetime(1987, 7, 2, 1, 30)
+        end = datetime.datetime(1987, 7, 2, 12, 15)
+        full = twcr.load_observations(start, end, version=version)
+        for workers in (None, 2):
+            o = twcr.load_observations(
+                start, end, version=version, workers=workers, compact=True
+            )
+            self.assertLess(
+                o.memory_usage(deep=True).sum(), full.memory_usage(deep=True).sum() / 2
+            )
+            self.assertEqual(list(o.columns)[:3], ["UID.time", "UID.sequence", "Name"])
+            pandas.testing.assert_series_equal(
+                o["UID.time"],
+                pandas.to_datetime(full.UID.str.slice(0, 10), format="%Y%m%d%H"),
+                check_names=False,
+                check_dtype=False,
+            )
+            self.assertTrue(
+                (o["UID.sequence"] == full.UID.str.slice(10).astype(int)).all()
+            )
+            for name in full.columns:
+                if name == "UID":
+                    continue
+                if observations._obs_converters[name] is str:
+                    self.assertIsInstance(o[name].dtype, pandas.CategoricalDtype)
+                    self.assertTrue(
+                        (
+                            o[name].astype(object).fillna("") == full[name].fillna("")
+                        ).all()
+                    )
+                else:
+                    self.assertLessEqual(o[name].dtype.itemsize, 4)
+                    numpy.testing.assert_allclose(
+                        o[name].to_numpy(dtype=float),
+                        full[name].to_numpy(dtype=float),
+                        rtol=1.0e-6,
+                    )
+        o = twcr.load_observations_fortime(
+            datetime.datetime(1987, 7, 2, 4), version=version, compact=True
+        )
+        self.assertIsInstance(o.Name.dtype, pandas.CategoricalDtype)
+        self.assertEqual(
+            len(o.index),
+            len(
+                twcr.load_observations_fortime(
+                    datetime.datetime(1987, 7, 2, 4), version=version
+                ).index
+            ),
+        )
+
+    # Frame after frame - same as load_observations_fortime, with each
+    #  file read only once
+    def test_stream(self):
+        for hour in (0, 6, 12, 18):
+            fake_data_file(1987, 7, 2, hour)
+        frames = [
+            datetime.datetime(1987, 7, 2) + datetime.timedelta(minutes=15 * step)
+            for step in range(73)
+        ]
+        for (prefetch, times) in (
+            (False, frames),
+            (True, frames),
+            (True, frames[::-1]),
+        ):
+            with patch.object(
+                observations,
+                "load_observations_1file",
+                side_effect=observations.load_observations_1file,
+            ) as mock_load:
+                with twcr.observations_stream(
+                    version=version, columns=["UID", "Observed"], prefetch=prefetch
+                ) as stream:
+                    for v_time in times:
+                        o = stream.load_observations_fortime(v_time)
+                        pandas.testing.assert_frame_equal(
+                            o,
+                            twcr.load_observations_fortime(
+                                v_time, version=version, columns=["UID", "Observed"]
+                            ),
+                        )
+            # Each file once by the stream, and once for each frame by
+            #  load_observations_fortime
+            n_fortime = sum(
+                len(observations._fortime_files(v_time)) for v_time in times
+            )
+            self.assertEqual(mock_load.call_count - n_fortime, (4, 5)[prefetch])
+        # The file after the last isn't there - an error only if it's
+        #  needed
+        with twcr.observations_stream(version=version) as stream:
+            for v_time in frames[-5:]:
+                stream.load_observations_fortime(v_time)
+            with self.assertRaises(IOError):
+                stream.load_observations_fortime(
+                    frames[-1] + datetime.timedelta(hours=5)
+                )
+
+    # Fields the converters can't read - same error as read_fwf
+    def test_load_1file_bad_field(self):
+        file_name = fake_data_file(1987, 7, 2, 18, n_lines=3)
+        with open(file_name, "a") as f:
+            f.write("%s%s\n" % (fake_line(3)[:74], "  abc"))
+        with self.assertRaises(ValueError) as cm:
+            twcr.load_observations_1file(
+                datetime.datetime(1987, 7, 2, 18), version=version
+            )
+        self.assertIn("abc", str(cm.exception))
+
+
+# Great-circle distance (km)
+def distance(lat_0, lon_0, lat_1, lon_1):
+    (lat_0, lon_0, lat_1, lon_1) = (
+        numpy.radians(lat_0),
+        numpy.radians(lon_0),
+        numpy.radians(lat_1),
+        numpy.radians(lon_1),
+    )
+    return 6371.0 * numpy.arccos(
+        numpy.clip(
+            numpy.sin(lat_0) * numpy.sin(lat_1)
+            + numpy.cos(lat_0) * numpy.cos(lat_1) * numpy.cos(lon_1 - lon_0),
+            -1,
+            1,
+        )
+    )
+
+
+class TestObservationsIndex(unittest.TestCase):
+
+    # Controlled and temporary disc environment - a few files from 1987
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+        self.frames = []
+        for (day, hour) in ((1, 0), (1, 6), (2, 12), (3, 18)):
+            self.frames.append(
+                read_fwf(
+                    fake_data_file(1987, 7, day, hour, n_lines=300)
+                ).infer_objects()
+            )
+        self.all = pandas.concat(self.frames)
+
+    def tearDown(self):
+        shutil.rmtree("%s/20CR" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    def check_same(self, o, expected):
+        self.assertGreater(len(expected.index), 0)
+        pandas.testing.assert_frame_equal(
+            o.reset_index(drop=True),
+            expected.reset_index(drop=True).infer_objects(),
+            check_dtype=False,
+        )
+
+    def test_box(self):
+        o = twcr.load_observations_in_box(1987, -30, 45.5, 10, 120, version=version)
+        expected = self.all[
+            (self.all.Latitude >= -30)
+            & (self.all.Latitude <= 45.5)
+            & (self.all.Longitude >= 10)
+            & (self.all.Longitude <= 120)
+        ]
+        self.check_same(o, expected)
+
+    # Box crossing the dateline
+    def test_box_wrapped(self):
+        o = twcr.load_observations_in_box(1987, -60, 60, 150, -160, version=version)
+        expected = self.all[
+            (self.all.Latitude.abs() <= 60)
+            & ((self.all.Longitude >= 150) | (self.all.Longitude <= -160))
+        ]
+        self.check_same(o, expected)
+        self.assertGreater(o.Longitude.max(), 150)
+        self.assertLess(o.Longitude.min(), -160)
+
+    def test_radius(self):
+        for (latitude, longitude) in ((10, 175), (-85, 30), (50, -3)):
+            o = twcr.load_observations_near(
+                1987, latitude, longitude, 3000, version=version
+            )
+            d = distance(latitude, longitude, self.all.Latitude, self.all.Longitude)
+            expected = self.all[d <= 3000].copy()
+            expected["distance"] = d[d <= 3000]
+            self.check_same(o, expected)
+
+    def test_nearest(self):
+        o = twcr.load_observations_nearest(1987, 40, -100, 25, version=version)
+        d = distance(40, -100, self.all.Latitude, self.all.Longitude)
+        self.assertEqual(len(o.index), 25)
+        self.assertTrue((numpy.diff(o.distance) >= 0).all())
+        self.assertAlmostEqual(o.distance.max(), numpy.sort(d.dropna())[24])
+        # More than there are
+        o = twcr.load_observations_nearest(1987, 40, -100, 5000, version=version)
+        self.assertEqual(len(o.index), d.notna().sum())
+
+    # Index made once, and reused - only the files with wanted
+    #  observations are read
+    def test_index_kept(self):
+        twcr.load_observations_in_box(1987, -90, 90, 0, 360, version=version)
+        self.assertTrue(
+            os.path.isfile(
+                "%s/20CR/version_3/observations/1987.spatial_index.npz"
+                % os.environ["SCRATCH"]
+            )
+        )
+        with patch.object(
+            observations,
+            "load_observations_1file",
+            side_effect=observations.load_observations_1file,
+        ) as mock_load:
+            o = twcr.load_observations_nearest(1987, 40, -100, 1, version=version)
+        self.assertEqual(len(o.index), 1)
+        self.assertEqual(mock_load.call_count, 1)
+
+    # Index remade when a file changes
+    def test_index_out_of_date(self):
+        o = twcr.load_observations_in_box(1987, -90, 90, 0, 360, version=version)
+        self.assertEqual(len(o.index), self.positioned(self.frames))
+        self.frames[2] = read_fwf(fake_data_file(1987, 7, 2, 12, n_lines=10))
+        o = twcr.load_observations_in_box(1987, -90, 90, 0, 360, version=version)
+        self.assertEqual(len(o.index), self.positioned(self.frames))
+
+    # One platform's observations - whole year, and part of it
+    def test_platform(self):
+        for workers in (None, 2):
+            o = twcr.load_platform(
+                "5",
+                datetime.datetime(1987, 1, 1),
+                datetime.datetime(1988, 1, 1),
+                version=version,
+                workers=workers,
+            )
+            self.check_same(o, self.all[self.all.ID == "5"])
+            os.remove(
+                "%s/20CR/version_3/observations/1987.platform_index.npz"
+                % os.environ["SCRATCH"]
+            )
+        o = twcr.load_platform(
+            "12",
+            datetime.datetime(1987, 7, 1, 2),
+            datetime.datetime(1987, 7, 2, 10),
+            version=version,
+        )
+        hours = self.all.UID.str.slice(0, 10)
+        self.check_same(
+            o,
+            self.all[
+                (self.all.ID == "12") & (hours >= "1987070102") & (hours < "1987070210")
+            ],
+        )
+        self.assertIsNone(
+            twcr.load_platform(
+                "SHIP",
+                datetime.datetime(1987, 1, 1),
+                datetime.datetime(1988, 1, 1),
+                version=version,
+            )
+        )
+
+    # Index made once, and reused - only the files with the platform's
+    #  observations are read
+    def test_platform_index_kept(self):
+        twcr.load_platform(
+            "5",
+            datetime.datetime(1987, 7, 1),
+            datetime.datetime(1987, 7, 2),
+            version=version,
+        )
+        with patch.object(
+            observations,
+            "load_observations_1file",
+            side_effect=observations.load_observations_1file,
+        ) as mock_load:
+            o = twcr.load_platform(
+                "5",
+                datetime.datetime(1987, 7, 1),
+                datetime.datetime(1987, 7, 2),
+                version=version,
+            )
+        self.assertEqual(mock_load.call_count, 2)
+        self.assertEqual(
+            mock_load.call_args.kwargs["rows"].tolist(), list(range(5, 300, 13))
+        )
+
+    # Counts in each grid box, at each time - made once, then reused
+    def test_coverage(self):
+        for workers in (None, 2):
+            cube = twcr.load_observations_coverage(
+                1987, resolution=30, version=version, workers=workers
+            )
+            self.assertEqual(cube.shape, (1460, 6, 12))
+            self.assertEqual((~cube.data.mask.any(axis=(1, 2))).sum(), 4)
+            for (o, hour) in zip(
+                self.frames, (4 * 181, 4 * 181 + 1, 4 * 182 + 2, 4 * 183 + 3)
+            ):
+                positioned = o[o.Latitude.notna() & o.Longitude.notna()]
+                (expected, lat_edges, lon_edges) = numpy.histogram2d(
+                    positioned.Latitude,
+                    positioned.Longitude % 360,
+                    bins=(numpy.arange(-90, 91, 30), numpy.arange(0, 361, 30)),
+                )
+                numpy.testing.assert_array_equal(cube.data[hour], expected)
+            os.remove(
+                "%s/20CR/version_3/observations/1987.coverage_30.npz"
+                % os.environ["SCRATCH"]
+            )
+        self.assertEqual(
+            cube.coord("time").units.num2date(cube.coord("time").points[4 * 181 + 1]),
+            datetime.datetime(1987, 7, 1, 6),
+        )
+        self.assertEqual(cube.coord("latitude").points[0], -75)
+        twcr.load_observations_coverage(1987, resolution=30, version=version)
+        with patch.object(observations, "load_observations_1file") as mock_load:
+            cube2 = twcr.load_observations_coverage(
+                1987, resolution=30, version=version
+            )
+        self.assertEqual(mock_load.call_count, 0)
+        numpy.testing.assert_array_equal(cube2.data, cube.data)
+
+    # Number of observations with positions (those in the index)
+    def positioned(self, frames):
+        return sum((o.Latitude.notna() & o.Longitude.notna()).sum() for o in frames)
+
+
+if __name__ == "__main__":
+    unittest.main()
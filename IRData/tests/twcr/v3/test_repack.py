@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import patch
+
+import IRData.twcr as twcr
+import datetime
+import os
+import os.path
+import shutil
+import tempfile
+import iris
+import netCDF4
+import numpy
+from IRData.tests.twcr.v3 import make_member_file
+
+version = "3"
+
+# One day, 3-hourly - data value is the member number plus the hour
+hours = numpy.arange(0, 24, 3)
+times = [
+    datetime.datetime(1969, 3, 12) + datetime.timedelta(hours=int(h)) for h in hours
+]
+
+
+class TestRepack(unittest.TestCase):
+
+    # Controlled and temporary disc environment
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+        for member in range(1, 81):
+            make_member_file(
+                "%s/20CR/version_3/1969/PRMSL.196903_mem%03d.nc"
+                % (os.environ["SCRATCH"], member),
+                member,
+                times,
+                hours,
+            )
+
+    def tearDown(self):
+        if os.path.isdir("%s/20CR" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/20CR" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    # Repacked file has all the members, one chunk per timestep
+    def test_repack_prmsl_month(self):
+        file_name = twcr.version_3_release.repack("PRMSL", 1969, 3)
+        self.assertEqual(
+            file_name,
+            "%s/20CR/version_3//1969/PRMSL.196903_ensemble.nc" % os.environ["SCRATCH"],
+        )
+        self.assertFalse(os.path.isfile("%s.part" % file_name))
+        with netCDF4.Dataset(file_name) as nc:
+            self.assertEqual(nc.variables["PRMSL"].chunking(), [80, 1, 19, 36])
+            self.assertTrue(nc.variables["PRMSL"].filters()["zlib"])
+
+    # Load uses the repacked file, and gets the same results
+    def test_load_prmsl_from_repacked(self):
+        unpacked = twcr.load(
+            "PRMSL", datetime.datetime(1969, 3, 12, 7), version=version
+        )
+        unpacked_5 = twcr.load(
+            "PRMSL", datetime.datetime(1969, 3, 12, 6), version=version, member=5
+        )
+        twcr.version_3_release.repack("PRMSL", 1969, 3)
+        with patch.object(iris, "load_cube", wraps=iris.load_cube) as mock_load:
+            packed = twcr.load(
+                "PRMSL", datetime.datetime(1969, 3, 12, 7), version=version
+            )
+            packed_5 = twcr.load(
+                "PRMSL", datetime.datetime(1969, 3, 12, 6), version=version, member=5
+            )
+        # One file read for each timestep
+        self.assertEqual(mock_load.call_count, 3)
+        self.assertEqual(packed.shape, (80, 19, 36))
+        self.assertEqual(list(packed.coord("member").points), list(range(1, 81)))
+        numpy.testing.assert_allclose(packed.data, unpacked.data)
+        self.assertEqual(packed.coord("time"), unpacked.coord("time"))
+        self.assertEqual(packed_5.shape, (19, 36))
+        self.assertEqual(len(packed_5.coords("member")), 0)
+        numpy.testing.assert_allclose(packed_5.data, unpacked_5.data)
+        self.assertEqual(packed_5.data[0, 0], 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+
+import IRData.twcr as twcr
+import datetime
+import os
+import os.path
+import shutil
+import tempfile
+import netCDF4
+import numpy
+from IRData.tests.twcr.v3 import make_member_file
+
+version = "3"
+
+
+# 3-hourly data for one day, from the start of the given month, on the
+#  release files' grid. Data value is the member number + latitude/10
+#  + longitude/100 + hours since the start of the day/1000.
+def make_month_file(file_name, member, year, month):
+    hours = numpy.arange(0, 24, 3)
+    times = [
+        datetime.datetime(year, month, 1) + datetime.timedelta(hours=int(h))
+        for h in hours
+    ]
+    make_member_file(
+        file_name, member, times, hours / 1000, north_first=True, gradient=True
+    )
+
+
+class TestStations(unittest.TestCase):
+
+    # Controlled and temporary disc environment, with annual
+    #  member files for 1969, and monthly files for 1970.
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+        base_dir = "%s/20CR/version_3" % os.environ["SCRATCH"]
+        for member in (1, 2, 3):
+            make_month_file(
+                "%s/1969/PRMSL.1969_mem%03d.nc" % (base_dir, member), member, 1969, 3
+            )
+            for month in (1, 2):
+                make_month_file(
+                    "%s/1970/PRMSL.1970%02d_mem%03d.nc" % (base_dir, month, member),
+                    member,
+                    1970,
+                    month,
+                )
+        self.output_file = "%s/stations/PRMSL.nc" % os.environ["SCRATCH"]
+        # Last is beside the dateline, so interpolates between 350 and 0
+        self.latitudes = [51.5, -33.25, 0.0, 10.0]
+        self.longitudes = [8.9, 151.2, 200.0, 355.0]
+
+    def tearDown(self):
+        shutil.rmtree("%s/20CR" % os.environ["SCRATCH"])
+        if os.path.isdir("%s/stations" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/stations" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    def check_output(self):
+        with netCDF4.Dataset(self.output_file) as nc:
+            values = nc.variables["PRMSL"][:]
+            times = netCDF4.num2date(
+                nc.variables["time"][:],
+                nc.variables["time"].units,
+                only_use_cftime_datetimes=False,
+            )
+            self.assertEqual(list(nc.variables["member"][:]), [2, 3])
+            numpy.testing.assert_allclose(nc.variables["latitude"][:], self.latitudes)
+        self.assertEqual(values.shape, (4, 2, 24))
+        self.assertEqual(times[0], datetime.datetime(1969, 3, 1))
+        self.assertEqual(times[8], datetime.datetime(1970, 1, 1))
+        self.assertEqual(times[23], datetime.datetime(1970, 2, 1, 21))
+        # Field is linear in latitude and longitude, so bilinear
+        #  interpolation gives the exact value
+        hours = numpy.tile(numpy.arange(0, 24, 3), 3) / 1000
+        for (station, (lat, lon)) in enumerate(zip(self.latitudes, self.longitudes)):
+            if lon > 350:
+                continue
+            for (index, member) in enumerate((2, 3)):
+                numpy.testing.assert_allclose(
+                    values[station, index, :],
+                    member + lat / 10 + lon / 100 + hours,
+                    rtol=1.0e-6,
+                )
+        # Across the dateline, interpolated between 350 and 0
+        numpy.testing.assert_allclose(
+            values[3, 0, :], 2 + 1 + (3.5 + 0.0) / 2 + hours, rtol=1.0e-6
+        )
+
+    # One year at a time
+    def test_extract_stations(self):
+        result = twcr.version_3_release.extract_stations(
+            "PRMSL",
+            self.latitudes,
+            self.longitudes,
+            [1969, 1970],
+            self.output_file,
+            members=[2, 3],
+            workers=1,
+        )
+        self.assertEqual(result, self.output_file)
+        self.assertFalse(os.path.isfile("%s.part" % self.output_file))
+        self.check_output()
+
+    # Years in parallel
+    def test_extract_stations_parallel(self):
+        twcr.version_3_release.extract_stations(
+            "PRMSL",
+            self.latitudes,
+            self.longitudes,
+            [1970, 1969],
+            self.output_file,
+            members=[2, 3],
+            workers=2,
+        )
+        self.check_output()
+
+    # Missing data
+    def test_extract_stations_missing_year(self):
+        with self.assertRaises(Exception) as cm:
+            twcr.version_3_release.extract_stations(
+                "PRMSL",
+                self.latitudes,
+                self.longitudes,
+                [1969, 1971],
+                self.output_file,
+                members=[2, 3],
+                workers=1,
+            )
+        self.assertIn("No PRMSL data for 1971", str(cm.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
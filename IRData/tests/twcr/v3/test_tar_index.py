@@ -0,0 +1,137 @@
+import unittest
+from unittest.mock import patch
+
+import IRData.twcr as twcr
+import datetime
+import os
+import os.path
+import shutil
+import tarfile
+import tempfile
+import numpy
+from IRData.tests.twcr.v3 import make_member_file
+
+version = "3"
+
+# Annual member files, with one day, 3-hourly - data value is the
+#  member number plus the hour
+hours = numpy.arange(0, 24, 3)
+times = [
+    datetime.datetime(1969, 3, 12) + datetime.timedelta(hours=int(h)) for h in hours
+]
+
+
+class TestTarIndex(unittest.TestCase):
+
+    # Controlled and temporary disc environment, with a tar file
+    #  as downloaded, and (so far) extracted.
+    def setUp(self):
+        self.oldscratch = os.environ["SCRATCH"]
+        os.environ["SCRATCH"] = tempfile.mkdtemp()
+        self.base_dir = "%s/20CR/version_3" % os.environ["SCRATCH"]
+        self.tar_file = "%s/PRMSL_1969.tar" % self.base_dir
+        file_names = [
+            make_member_file(
+                "%s/1969/PRMSL.1969_mem%03d.nc" % (self.base_dir, member),
+                member,
+                times,
+                hours,
+            )
+            for member in range(1, 81)
+        ]
+        with tarfile.open(self.tar_file, "w") as tar:
+            for file_name in file_names:
+                tar.add(file_name, arcname=file_name[len(self.base_dir) + 1 :])
+
+    def tearDown(self):
+        if os.path.isdir("%s/20CR" % os.environ["SCRATCH"]):
+            shutil.rmtree("%s/20CR" % os.environ["SCRATCH"])
+        os.rmdir(os.environ["SCRATCH"])
+        os.environ["SCRATCH"] = self.oldscratch
+
+    # Data read from the tar are the same as from the extracted files
+    def test_load_prmsl_from_tar(self):
+        extracted = twcr.load(
+            "PRMSL", datetime.datetime(1969, 3, 12, 7), version=version
+        )
+        extracted_5 = twcr.load(
+            "PRMSL", datetime.datetime(1969, 3, 12, 6), version=version, member=5
+        )
+        # Read the data before removing the files
+        extracted.data
+        extracted_5.data
+        shutil.rmtree("%s/1969" % self.base_dir)
+        from_tar = twcr.load(
+            "PRMSL", datetime.datetime(1969, 3, 12, 7), version=version
+        )
+        from_tar_5 = twcr.load(
+            "PRMSL", datetime.datetime(1969, 3, 12, 6), version=version, member=5
+        )
+        self.assertTrue(os.path.isfile("%s.index" % self.tar_file))
+        self.assertEqual(from_tar.shape, (80, 19, 36))
+        numpy.testing.assert_allclose(from_tar.data, extracted.data)
+        self.assertEqual(from_tar.coord("time"), extracted.coord("time"))
+        self.assertEqual(from_tar_5.data[0, 0], 11)
+        self.assertEqual(from_tar_5, extracted_5)
+
+    # Index is made once for each tar
+    def test_tar_index_made_once(self):
+        shutil.rmtree("%s/1969" % self.base_dir)
+        with patch.object(
+            twcr.version_3_release.tar_index,
+            "_make_tar_index",
+            wraps=twcr.version_3_release.tar_index._make_tar_index,
+        ) as mock_index:
+            twcr.load(
+                "PRMSL", datetime.datetime(1969, 3, 12, 6), version=version, member=1
+            )
+            twcr.load("PRMSL", datetime.datetime(1969, 3, 12, 9), version=version)
+        self.assertLessEqual(mock_index.call_count, 1)
+        self.assertTrue(os.path.isfile("%s.index" % self.tar_file))
+
+    # Missing times are reported as for extracted files
+    def test_load_prmsl_from_tar_missing_time(self):
+        shutil.rmtree("%s/1969" % self.base_dir)
+        with self.assertRaises(Exception) as cm:
+            twcr.load(
+                "PRMSL", datetime.datetime(1969, 3, 13, 6), version=version, member=1
+            )
+        self.assertIn("not available", str(cm.exception))
+
+    # Fetch indexes the tar, and only extracts it if asked
+    def test_fetch_prmsl_no_extract(self):
+        shutil.rmtree("%s/1969" % self.base_dir)
+        shutil.move(self.tar_file, "%s.downloaded" % self.tar_file)
+
+        # Fake wget - 'downloads' the tar made in setUp
+        def fake_wget(cmd, shell=True):
+            shutil.copy("%s.downloaded" % self.tar_file, cmd.split()[2])
+            return 0
+
+        with patch(
+            "IRData.twcr.version_3_release.fetch.subprocess.call",
+            side_effect=fake_wget,
+        ) as mock_wget:
+            twcr.fetch("PRMSL", datetime.datetime(1969, 3, 12), version=version)
+            twcr.fetch("PRMSL", datetime.datetime(1969, 3, 12), version=version)
+        self.assertEqual(mock_wget.call_count, 1)
+        self.assertTrue(os.path.isfile(self.tar_file))
+        self.assertFalse(os.path.isfile("%s.part" % self.tar_file))
+        self.assertTrue(os.path.isfile("%s.index" % self.tar_file))
+        self.assertFalse(os.path.isfile("%s/1969/PRMSL.1969_mem080.nc" % self.base_dir))
+        twcr.version_3_release.fetch(
+            "PRMSL", datetime.datetime(1969, 3, 12), extract=True
+        )
+        self.assertTrue(os.path.isfile("%s/1969/PRMSL.1969_mem080.nc" % self.base_dir))
+        os.remove("%s.downloaded" % self.tar_file)
+
+    # Repack can read from the tar too
+    def test_repack_prmsl_from_tar(self):
+        shutil.rmtree("%s/1969" % self.base_dir)
+        twcr.version_3_release.repack("PRMSL", 1969, 3)
+        packed = twcr.load("PRMSL", datetime.datetime(1969, 3, 12, 6), version=version)
+        self.assertEqual(list(packed.data[:, 0, 0]), list(range(7, 87)))
+
+
+if __name__ == "__main__":
+    unittest.main()
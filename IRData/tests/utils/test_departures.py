@@ -0,0 +1,87 @@
+import unittest
+
+import IRData.utils as utils
+import iris
+import iris.analysis
+import iris.coords
+import iris.cube
+import numpy
+import pandas
+
+
+# Ensemble of fields - latitudes north to south, as in 20CR
+def fake_cube(n_members=5):
+    rng = numpy.random.RandomState(1)
+    member = iris.coords.DimCoord(numpy.arange(n_members), long_name="member")
+    latitude = iris.coords.DimCoord(
+        numpy.linspace(90, -90, 19), standard_name="latitude", units="degrees"
+    )
+    longitude = iris.coords.DimCoord(
+        numpy.linspace(0, 350, 36),
+        standard_name="longitude",
+        units="degrees",
+        circular=True,
+    )
+    return iris.cube.Cube(
+        100000 + 1000 * rng.standard_normal((n_members, 19, 36)),
+        standard_name="air_pressure_at_sea_level",
+        units="Pa",
+        dim_coords_and_dims=[(member, 0), (latitude, 1), (longitude, 2)],
+    )
+
+
+def fake_obs(n_obs=200):
+    rng = numpy.random.RandomState(2)
+    obs = pandas.DataFrame(
+        {
+            "Latitude": rng.uniform(-90, 90, n_obs),
+            "Longitude": rng.uniform(-180, 360, n_obs),
+            "Observed": rng.uniform(980, 1020, n_obs),
+        }
+    )
+    obs.loc[3, "Latitude"] = numpy.nan
+    obs.loc[4, "Observed"] = numpy.nan
+    obs.loc[5, "Longitude"] = 355.0
+    obs.loc[6, "Longitude"] = -1.0
+    return obs
+
+
+class TestDepartures(unittest.TestCase):
+
+    # Same as interpolating the cube to each observation
+    def test_departures(self):
+        cube = fake_cube()
+        obs = fake_obs()
+        d = utils.observation_departures(obs, cube, units="hPa")
+        self.assertEqual(len(d.index), len(obs.index))
+        for (index, ob) in obs.iterrows():
+            if index in (3, 4):
+                self.assertTrue(numpy.isnan(d.departure[index]))
+                continue
+            members = (
+                cube.interpolate(
+                    [("latitude", ob.Latitude), ("longitude", ob.Longitude % 360)],
+                    iris.analysis.Linear(),
+                ).data
+                / 100
+            )
+            self.assertAlmostEqual(d["mean"][index], members.mean(), places=4)
+            self.assertAlmostEqual(d.spread[index], members.std(ddof=1), places=4)
+            self.assertAlmostEqual(
+                d.departure[index], ob.Observed - members.mean(), places=4
+            )
+            self.assertEqual(d["rank"][index], (members < ob.Observed).sum())
+
+    # Many observations - done in blocks
+    def test_departures_blocks(self):
+        cube = fake_cube(n_members=3)
+        obs = fake_obs(n_obs=40000)
+        d = utils.observation_departures(obs, cube, units="hPa")
+        single = utils.observation_departures(obs.iloc[[30000]], cube, units="hPa")
+        self.assertAlmostEqual(d["mean"].iloc[30000], single["mean"].iloc[0])
+        self.assertEqual(d["rank"].notna().sum(), 39998)
+        self.assertEqual(((d["rank"] >= 0) & (d["rank"] <= 3)).sum(), 39998)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -49,6 +49,40 @@ Once the data has been fetched,
 
 will then load the precipitation rates at quarter past 3pm on March 12 1987 from the retrieved dataset as an :obj:`iris.cube.Cube`. Note that as 20CR only provides data at 6-hourly or 3-hourly intervals, the value for 3:15pm will be interpolated between the outputs (to get uninterpolated data, only call load for times when 20CR has output). Also, as 20CR2c is an ensemble dataset, the result will include all 56 ensemble members.
 
+Version 3 data is fetched as a tar file for each year, and the member files are read from inside the tar - they are not extracted unless you ask for that (twcr.version_3_release.fetch(...,extract=True)), so the data only take up disc space once. If you only need some of the members, or some of the months, get just those - the tar file is read as it downloads, and only the selected data are kept:
+
+.. code-block:: python
+
+    twcr.version_3_release.fetch_subset('PRATE',1987,
+                                        members=range(1,11),
+                                        months=[3,4])
+
+Version 3 data has a separate file for each of its 80 ensemble members, so loading all the members means reading 80 files (160 if the result has to be interpolated). Set 'workers' to read several of the files at once:
+
+.. code-block:: python
+
+    pr=twcr.load('PRATE',
+                 datetime.datetime(1987,3,12,15,15),
+                 version='3',
+                 workers=8)
+
+Or, better, once a month's member files have been fetched, combine them into one file (compressed, with each timestep of the whole ensemble stored together):
+
+.. code-block:: python
+
+    twcr.version_3_release.repack('PRATE',1987,3)
+
+Load will then use the combined file instead of the 80 member files, whenever it is present. (Leave out the month to combine a year's files.)
+
+To get time-series at a set of station locations, for many years, don't load each field - extract just the grid points needed, for each year in parallel, into one (station, member, time) array (in a netCDF file):
+
+.. code-block:: python
+
+    twcr.version_3_release.extract_stations('PRMSL',
+                                            latitudes,longitudes,
+                                            range(1900,2011),
+                                            'stations_PRMSL.nc')
+
 Observations files are also available. They can be fetched with:
 
 .. code-block:: python
@@ -85,6 +119,64 @@ That's only possible for times that match an assimilation time (hour=0,6,12,18).
 
 This gets all the observations from each field used in the interpolation, and assigns a weight to each one - the same as the weight used in interpolating the fields.
 
+For the frames of an animation, use a stream - it keeps the observations files in use from one frame to the next (at 15-minute frames, the same files are used for up to 24 frames), only changes the weights, and reads the next file in the background:
+
+.. code-block:: python
+
+    with twcr.observations_stream(version='2c') as stream:
+        for v_time in frame_times:
+            o=stream.load_observations_fortime(v_time)
+
+All three of these can get just some of the columns, and just the observations that pass some conditions (the others are skipped while the file is read, so this is faster, and uses less memory, than selecting afterwards):
+
+.. code-block:: python
+
+    o=twcr.load_observations(datetime.datetime(1987,3,12,6),
+                             datetime.datetime(1987,3,12,18),
+                             version='3',
+                             columns=['UID','Latitude','Longitude','Observed'],
+                             where={'QC.failure.flag':0,
+                                    'Latitude':(40,60)})
+
+To hold a lot of observations in memory (a year of them, say), make them compact - this stores the text columns as categoricals, the UID as a time and a sequence number, and the numbers in single precision, and needs several times less memory:
+
+.. code-block:: python
+
+    o=twcr.load_observations(datetime.datetime(1987,1,1),
+                             datetime.datetime(1988,1,1),
+                             version='3',
+                             compact=True)
+
+To get a year's observations from a region, don't load them all and select - query the year's spatial index (made the first time it's needed, and kept with the observations), which reads only the observations wanted:
+
+.. code-block:: python
+
+    o=twcr.load_observations_in_box(1987,50,60,-10,2,version='2c')
+    o=twcr.load_observations_near(1987,51.5,-0.1,500,version='2c')
+    o=twcr.load_observations_nearest(1987,51.5,-0.1,100,version='2c')
+
+(latitude and longitude in degrees, radius in km).
+
+And to get the track of a ship (or the record of a station) - all the observations with a particular ID:
+
+.. code-block:: python
+
+    o=twcr.load_platform('SHIP1',
+                         datetime.datetime(1987,1,1),
+                         datetime.datetime(1988,1,1),
+                         version='2c')
+
+This uses a similar index, of each year's observations by platform.
+
+For coverage maps, get the number of observations in each grid box at each assimilation time, for a whole year, as an :obj:`iris.cube.Cube` (time, latitude, longitude):
+
+.. code-block:: python
+
+    c=twcr.load_observations_coverage(1987,resolution=2,version='2c',
+                                      workers=8)
+
+The counts are kept with the observations, so after the first time they load without reading any observations.
+
 Pre-release version 3
 ---------------------
 
@@ -100,6 +192,15 @@ Version numbers beginning '4.5.' (mostly '4.5.1' and '4.5.2') are the pre-releas
                user='pbrohan')
 
 Note that proto-v3 data is fetched in 1-month blocks (rather than 1-year as for 2c).
+To fetch many months (and variables) at once, use rsync - this runs several transfers at a time, unpacks each month's data as soon as it arrives, and resumes interrupted transfers:
+
+.. code-block:: python
+
+    twcr.version_3_release.fetch_ssh_batch(['prate','observations'],
+                                           [(1987,m) for m in range(1,13)],
+                                           version='4.5.1',
+                                           user='pbrohan')
+
 All the 'load' functions then work exactly as for 2c.
 
 Note: NERSC is soon to enforce multi-factor authentication which will mess this up. Some changes will be required.
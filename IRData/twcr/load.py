@@ -28,6 +28,7 @@ def load(
     version=None,
     type=None,
     member=None,
+    workers=None,
 ):
     """Load requested data from disc, interpolating if necessary.
 
@@ -40,6 +41,7 @@ def load(
         level (:obj:`int`): Pressure level (hPa) for 3d variables. Only used in v3. Variable must be in 20CR output at that exact pressure level (no interpolation). Defaults to None - appropriate for 2d variables.
         ilevel (:obj:`int`): Isentropic level (K) for 3d variables. Only used in v3. Variable must be in 20CR output at that exact pressure level (no interpolation). Defaults to None - appropriate for 2d variables.
         member (:obj:`int`): Member to load (version 3 only). Defaults to None - load all 80 members.
+        workers (:obj:`int`): Number of member files to read at once, when loading all 80 members (version 3 only). Defaults to None - read them one after another.
         version (:obj:`str`): 20CR version to load data from.
         type (:obj:`str`): If None load raw data (default). If 'normal, or standard.deviations load those derived data.
 
@@ -56,5 +58,7 @@ def load(
     if version == "2c":
         return version_2c.load(variable, dtime, type=type)
     if version == "3" or version[0] == "4" or version[0] == "0":
-        return version_3_release.load(variable, dtime, version=version, member=member)
+        return version_3_release.load(
+            variable, dtime, version=version, member=member, workers=workers
+        )
     raise Exception("Invalid version number %s" % version)
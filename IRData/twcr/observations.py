@@ -48,7 +48,9 @@ def fetch_observations(dtime, version="none", user="pbrohan"):
     raise Exception("Unsupported version %s" % version)
 
 
-def load_observations_1file(dtime, version="none"):
+def load_observations_1file(
+    dtime, version="none", columns=None, where=None, compact=False
+):
     """Load observations from disc, that were used in the assimilation run at the time specified.
 
     Data must be available in directory $SCRATCH/20CR, previously retrieved by :func:`fetch_observations`.
@@ -57,6 +59,9 @@ def load_observations_1file(dtime, version="none"):
         dtime (:obj:`int`): Date and time of assimilation run.
         version (:obj:`str`): 20CR version to load data from.
         user (:obj:`str`): NERSC userid to use in retrieval. Only needed for v3-preliminary data. Defaults to 'pbrohan'. This should be your NERSC username.
+        columns (:obj:`list` of :obj:`str`): Only get these columns (e.g. ['UID','Latitude','Longitude','Observed']). Defaults to None - all columns.
+        where (:obj:`dict`): Only get observations that pass these conditions - column name and condition: a value (observations with that value, e.g. {'QC.failure.flag':0}), a list (observations with any of those values, e.g. {'Type':['SHIP','BUOY']}), or a tuple (low,high) (observations with values in that range - e.g. {'Latitude':(40,60)}; either can be None; a range with low>high is outside (high,low) - e.g. {'Longitude':(350,10)}). Observations with a missing value in a condition column don't pass. Defaults to None - all observations.
+        compact (:obj:`bool`): If True, use much less memory: text columns (Name, ID, Type, ...) are categoricals, UID is replaced by 'UID.time' (its date and hour, as datetime64) and 'UID.sequence' (the rest of the UID, as an integer - -1 if it isn't a number), floating-point columns are float32 (about 7 significant figures), and integer columns are the smallest integer type that holds their values. Defaults to False.
 
     Returns:
         :obj:`pandas.DataFrame`: Dataframe of observations.
@@ -68,21 +73,40 @@ def load_observations_1file(dtime, version="none"):
     """
 
     if version == "2c":
-        return version_2c.load_observations_1file(dtime)
+        return version_2c.load_observations_1file(
+            dtime, columns=columns, where=where, compact=compact
+        )
     if version == "3" or version[0] == "4" or version[0] == "0":
-        return version_3_release.load_observations_1file(dtime,version)
+        return version_3_release.load_observations_1file(
+            dtime, version, columns=columns, where=where, compact=compact
+        )
     raise Exception("Unsupported version %s" % version)
 
 
-def load_observations(start, end, version="none", user="pbrohan"):
+def load_observations(
+    start,
+    end,
+    version="none",
+    user="pbrohan",
+    workers=None,
+    columns=None,
+    where=None,
+    compact=False,
+):
     """Load observations from disc, for the selected period
 
     Data must be available in directory $SCRATCH/20CR, previously retrieved by :func:`fetch`.
 
+    Reads the file for each assimilation time in (or within 3 hours of) the period. For long periods, set 'workers' to read several files at once.
+
     Args:
         start (:obj:`datetime.datetime`): Get observations at or after this time.
         end (:obj:`datetime.datetime`): Get observations before this time.
         version (:obj:`str`): 20CR version to load data from.
+        workers (:obj:`int`): Number of files to read at once. Defaults to None - read them one after another.
+        columns (:obj:`list` of :obj:`str`): Only get these columns. See :func:`load_observations_1file`.
+        where (:obj:`dict`): Only get observations that pass these conditions. See :func:`load_observations_1file`.
+        compact (:obj:`bool`): If True, use much less memory (each file is made compact as it's read - worth it for long periods). See :func:`load_observations_1file`.
 
     Returns:
         :obj:`pandas.DataFrame`: Dataframe of observations.
@@ -95,13 +119,25 @@ def load_observations(start, end, version="none", user="pbrohan"):
     """
 
     if version == "2c":
-        return version_2c.load_observations(start, end)
+        return version_2c.load_observations(
+            start, end, workers=workers, columns=columns, where=where, compact=compact
+        )
     if version == "3" or version[0] == "4" or version[0] == "0":
-        return version_3_release.load_observations_1file(dtime, version)
+        return version_3_release.load_observations(
+            start,
+            end,
+            version=version,
+            workers=workers,
+            columns=columns,
+            where=where,
+            compact=compact,
+        )
     raise Exception("Unsupported version %s" % version)
 
 
-def load_observations_fortime(v_time, version="none"):
+def load_observations_fortime(
+    v_time, version="none", columns=None, where=None, compact=False
+):
     """Load observations from disc, that contribute to fields at a given time
 
     Data must be available in directory $SCRATCH/20CR, previously retrieved by :func:`fetch`.
@@ -111,6 +147,9 @@ def load_observations_fortime(v_time, version="none"):
     Args:
         v_time (:obj:`datetime.datetime`): Get observations associated with this time.
         version (:obj:`str`): 20CR version to load data from.
+        columns (:obj:`list` of :obj:`str`): Only get these columns. See :func:`load_observations_1file`.
+        where (:obj:`dict`): Only get observations that pass these conditions. See :func:`load_observations_1file`.
+        compact (:obj:`bool`): If True, use much less memory. See :func:`load_observations_1file`.
 
     Returns:
         :obj:`pandas.DataFrame`: same as from :func:`load_observations`, except with aded column 'weight' giving the weight of each observation at the given time.
@@ -122,7 +161,217 @@ def load_observations_fortime(v_time, version="none"):
     """
 
     if version == "2c":
-        return version_2c.load_observations_fortime(v_time)
+        return version_2c.load_observations_fortime(
+            v_time, columns=columns, where=where, compact=compact
+        )
+    if version == "3" or version[0] == "4" or version[0] == "0":
+        return version_3_release.load_observations_fortime(
+            v_time, version, columns=columns, where=where, compact=compact
+        )
+    raise Exception("Unsupported version %s" % version)
+
+
+def observations_stream(
+    version="none", columns=None, where=None, compact=False, prefetch=True
+):
+    """Load observations that contribute to fields, for one time after another (the frames of an animation).
+
+    Consecutive frames mostly use the same observations files, with different weights - at 15-minute frames, the same files for up to 24 frames. So, instead of calling :func:`load_observations_fortime` for each frame (which would read those files again every time), make a stream and load each frame's observations from it:
+
+    .. code-block:: python
+
+        with twcr.observations_stream(version='3') as stream:
+            for v_time in frame_times:
+                o=stream.load_observations_fortime(v_time)
+
+    The stream keeps the observations from the files in use, and only makes the weights for each frame. It reads the next file (in the direction the frames are going) in the background, while the current frame is being used.
+
+    Args:
+        version (:obj:`str`): 20CR version to load data from.
+        columns (:obj:`list` of :obj:`str`): Only get these columns. See :func:`load_observations_1file`.
+        where (:obj:`dict`): Only get observations that pass these conditions. See :func:`load_observations_1file`.
+        compact (:obj:`bool`): If True, use much less memory. See :func:`load_observations_1file`.
+        prefetch (:obj:`bool`): Read the next file in the background. Defaults to True.
+
+    Returns:
+        Stream - its load_observations_fortime(v_time) returns the same as :func:`load_observations_fortime` (the observations share their data with the stream, so copy them before changing any values). Close it (close()) when finished with it, or use it in a 'with' statement.
+
+    Raises:
+        StandardError: Version number not supported.
+
+    |
+    """
+
+    if version == "2c":
+        return version_2c.observations_stream(
+            columns=columns, where=where, compact=compact, prefetch=prefetch
+        )
+    if version == "3" or version[0] == "4" or version[0] == "0":
+        return version_3_release.observations_stream(
+            version, columns=columns, where=where, compact=compact, prefetch=prefetch
+        )
+    raise Exception("Unsupported version %s" % version)
+
+
+def load_observations_in_box(year, lat_min, lat_max, lon_min, lon_max, version="none"):
+    """Load a year's observations from inside a latitude-longitude box.
+
+    Data must be available in directory $SCRATCH/20CR, previously retrieved by :func:`fetch_observations`.
+
+    Uses a spatial index of the year's observations (made the first time it's needed, and kept beside the observation files - it's remade if any of the files change), so only the files with observations in the box are read, and only those observations are kept.
+
+    Args:
+        year (:obj:`int`): Year to get observations for.
+        lat_min (:obj:`float`): Southern edge of the box (degrees).
+        lat_max (:obj:`float`): Northern edge of the box (degrees).
+        lon_min (:obj:`float`): Western edge of the box (degrees east).
+        lon_max (:obj:`float`): Eastern edge of the box (degrees east). If less than lon_min, the box crosses the 0/360 (or 180/-180) meridian.
+        version (:obj:`str`): 20CR version to load data from.
+
+    Returns:
+        :obj:`pandas.DataFrame`: same as from :func:`load_observations`, in time order. None if there are no observations in the box.
+
+    Raises:
+        StandardError: Version number not supported, or data not on disc - see :func:`fetch_observations`
+
+    |
+    """
+
+    if version == "2c":
+        return version_2c.load_observations_in_box(
+            year, lat_min, lat_max, lon_min, lon_max
+        )
+    if version == "3" or version[0] == "4" or version[0] == "0":
+        return version_3_release.load_observations_in_box(
+            year, lat_min, lat_max, lon_min, lon_max, version=version
+        )
+    raise Exception("Unsupported version %s" % version)
+
+
+def load_observations_near(year, latitude, longitude, radius, version="none"):
+    """Load a year's observations within a distance of a point.
+
+    Data must be available in directory $SCRATCH/20CR, previously retrieved by :func:`fetch_observations`.
+
+    Uses the same spatial index as :func:`load_observations_in_box`.
+
+    Args:
+        year (:obj:`int`): Year to get observations for.
+        latitude (:obj:`float`): Latitude of the point (degrees).
+        longitude (:obj:`float`): Longitude of the point (degrees east).
+        radius (:obj:`float`): Distance from the point (great-circle, km).
+        version (:obj:`str`): 20CR version to load data from.
+
+    Returns:
+        :obj:`pandas.DataFrame`: same as from :func:`load_observations`, in time order, except with added column 'distance' giving the distance (km) of each observation from the point. None if there are no observations that close.
+
+    Raises:
+        StandardError: Version number not supported, or data not on disc - see :func:`fetch_observations`
+
+    |
+    """
+
+    if version == "2c":
+        return version_2c.load_observations_near(year, latitude, longitude, radius)
+    if version == "3" or version[0] == "4" or version[0] == "0":
+        return version_3_release.load_observations_near(
+            year, latitude, longitude, radius, version=version
+        )
+    raise Exception("Unsupported version %s" % version)
+
+
+def load_observations_nearest(year, latitude, longitude, count, version="none"):
+    """Load the year's observations closest to a point.
+
+    Data must be available in directory $SCRATCH/20CR, previously retrieved by :func:`fetch_observations`.
+
+    Uses the same spatial index as :func:`load_observations_in_box`.
+
+    Args:
+        year (:obj:`int`): Year to get observations for.
+        latitude (:obj:`float`): Latitude of the point (degrees).
+        longitude (:obj:`float`): Longitude of the point (degrees east).
+        count (:obj:`int`): Number of observations to get.
+        version (:obj:`str`): 20CR version to load data from.
+
+    Returns:
+        :obj:`pandas.DataFrame`: same as from :func:`load_observations`, nearest first, except with added column 'distance' giving the distance (km) of each observation from the point. Fewer than 'count' observations if the year doesn't have that many (with positions).
+
+    Raises:
+        StandardError: Version number not supported, or data not on disc - see :func:`fetch_observations`
+
+    |
+    """
+
+    if version == "2c":
+        return version_2c.load_observations_nearest(year, latitude, longitude, count)
+    if version == "3" or version[0] == "4" or version[0] == "0":
+        return version_3_release.load_observations_nearest(
+            year, latitude, longitude, count, version=version
+        )
+    raise Exception("Unsupported version %s" % version)
+
+
+def load_platform(id, start, end, version="none", workers=None):
+    """Load all the observations from one platform (ship, station, ...), for the selected period.
+
+    Data must be available in directory $SCRATCH/20CR, previously retrieved by :func:`fetch_observations`.
+
+    Uses an index of each year's observations by platform ID (made the first time it's needed, in one pass over the year's files, and kept beside the observation files - it's remade if any of the files change), so only the platform's own observations are read. Set 'workers' to read several files at once when making the index.
+
+    Args:
+        id (:obj:`str`): Platform ID (the observations' 'ID' column).
+        start (:obj:`datetime.datetime`): Get observations at or after this time.
+        end (:obj:`datetime.datetime`): Get observations before this time.
+        version (:obj:`str`): 20CR version to load data from.
+        workers (:obj:`int`): Number of files to read at once, when making an index. Defaults to None - read them one after another.
+
+    Returns:
+        :obj:`pandas.DataFrame`: same as from :func:`load_observations`, in time order. None if the platform has no observations in the period.
+
+    Raises:
+        StandardError: Version number not supported, or data not on disc - see :func:`fetch_observations`
+
+    |
+    """
+
+    if version == "2c":
+        return version_2c.load_platform(id, start, end, workers=workers)
+    if version == "3" or version[0] == "4" or version[0] == "0":
+        return version_3_release.load_platform(
+            id, start, end, version=version, workers=workers
+        )
+    raise Exception("Unsupported version %s" % version)
+
+
+def load_observations_coverage(year, resolution=2.0, version="none", workers=None):
+    """Load the number of observations in each grid box, at each assimilation time in a year.
+
+    Data must be available in directory $SCRATCH/20CR, previously retrieved by :func:`fetch_observations`.
+
+    The counts are made the first time they're needed (each file's observations binned in one go - set 'workers' to count several files at once), and kept beside the observation files (they're remade if any of the files change), so after that they are loaded without reading any observations.
+
+    Args:
+        year (:obj:`int`): Year to get coverage for.
+        resolution (:obj:`float`): Size of the grid boxes (degrees). Must divide 180.
+        version (:obj:`str`): 20CR version to load data from.
+        workers (:obj:`int`): Number of files to read at once, when making the counts. Defaults to None - read them one after another.
+
+    Returns:
+        :obj:`iris.cube.Cube`: Observation counts (time, latitude, longitude) - masked at times with no observations file.
+
+    Raises:
+        StandardError: Version number not supported, or data not on disc - see :func:`fetch_observations`
+
+    |
+    """
+
+    if version == "2c":
+        return version_2c.load_observations_coverage(
+            year, resolution=resolution, workers=workers
+        )
     if version == "3" or version[0] == "4" or version[0] == "0":
-        return version_3_release.load_observations_fortime(v_time, version)
+        return version_3_release.load_observations_coverage(
+            year, resolution=resolution, version=version, workers=workers
+        )
     raise Exception("Unsupported version %s" % version)
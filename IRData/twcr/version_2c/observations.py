@@ -14,14 +14,29 @@
 # Handle observations for version 2c
 
 import datetime
+import functools
 import os
 import os.path
 import subprocess
 import zipfile
-import pandas
-import numpy
 
 from .utils import _get_data_dir
+from ...utils.fixed_width import _read_fixed_width
+from ...utils.fixed_width import _is_cache_file
+from ...utils.observations import _load_observations_period
+from ...utils.observations import _year_times
+from ...utils.observations import _get_observations_index
+from ...utils.observations import _index_box
+from ...utils.observations import _index_radius
+from ...utils.observations import _index_nearest
+from ...utils.observations import _index_records
+from ...utils.observations import _build_platform_index
+from ...utils.observations import _load_platform
+from ...utils.observations import _build_coverage
+from ...utils.observations import _coverage_cube
+from ...utils.observations import _compact_observations
+from ...utils.observations import _load_observations_fortime
+from ...utils.observations import _ObservationsStream
 from .load import _get_previous_field_time
 from .load import _get_next_field_time
 
@@ -30,6 +45,106 @@ def _observations_remote_file(year):
     return ("https://portal.nersc.gov/project/m958/2c_observations/" + "%04d.zip") % year
 
 
+# Layout of the observations files
+_obs_colspecs = [
+    (0, 19),
+    (20, 23),
+    (24, 25),
+    (26, 33),
+    (34, 40),
+    (41, 46),
+    (47, 52),
+    (53, 61),
+    (60, 67),
+    (68, 75),
+    (76, 83),
+    (84, 94),
+    (95, 100),
+    (101, 106),
+    (107, 108),
+    (109, 110),
+    (111, 112),
+    (113, 114),
+    (115, 116),
+    (117, 127),
+    (128, 138),
+    (139, 149),
+    (150, 160),
+    (161, 191),
+    (192, 206),
+]
+_obs_names = [
+    "UID",
+    "NCEP.Type",
+    "Variable",
+    "Longitude",
+    "Latitude",
+    "Elevation",
+    "Model.Elevation",
+    "Time.Offset",
+    "Pressure.after.bias.correction",
+    "Pressure.after.vertical.interpolation",
+    "SLP",
+    "Bias",
+    "Error.in.surface.pressure",
+    "Error.in.vertically.interpolated.pressure",
+    "Assimilation.indicator",
+    "Usability.check",
+    "QC.flag",
+    "Background.check",
+    "Buddy.check",
+    "Mean.first.guess.pressure.difference",
+    "First.guess.pressure.spread",
+    "Mean.analysis.pressure.difference",
+    "Analysis.pressure.spread",
+    "Name",
+    "ID",
+]
+_obs_converters = {
+    "UID": str,
+    "NCEP.Type": int,
+    "Variable": str,
+    "Longitude": float,
+    "Latitude": float,
+    "Elevation": int,
+    "Model.Elevation": int,
+    "Time.Offset": float,
+    "Pressure.after.bias.correction": float,
+    "Pressure.after.vertical.interpolation": float,
+    "SLP": float,
+    "Bias": float,
+    "Error.in.surface.pressure": float,
+    "Error.in.vertically.interpolated.pressure": float,
+    "Assimilation.indicator": int,
+    "Usability.check": int,
+    "QC.flag": int,
+    "Background.check": int,
+    "Buddy.check": int,
+    "Mean.first.guess.pressure.difference": float,
+    "First.guess.pressure.spread": float,
+    "Mean.analysis.pressure.difference": float,
+    "Analysis.pressure.spread": float,
+    "Name": str,
+    "ID": str,
+}
+_obs_na_values = [
+    "NA",
+    "*",
+    "***",
+    "*****",
+    "*******",
+    "**********",
+    "-99",
+    "9999",
+    "-999",
+    "9999.99",
+    "10000.0",
+    "-9.99",
+    "999999999999",
+    "9",
+]
+
+
 def _observations_zip_file(year):
     return "%s/observations/%04d.zip" % (_get_data_dir(), year)
 
@@ -56,7 +171,7 @@ def fetch_observations(dtime):
         fetch_observations(ndtime)
     o_dir = "%s/observations/%04d" % (_get_data_dir(), dtime.year)
     if os.path.exists(o_dir):
-        if len(os.listdir(o_dir)) >= 1460:
+        if len([f for f in os.listdir(o_dir) if not _is_cache_file(f)]) >= 1460:
             return
     _download_observations(dtime.year)
     _unpack_downloaded_observations(dtime.year)
@@ -83,150 +198,166 @@ def _unpack_downloaded_observations(year):
     os.remove(local_file)
 
 
-def load_observations_1file(dtime):
+def load_observations_1file(dtime, rows=None, columns=None, where=None, compact=False):
     of_name = _observations_file_name(dtime.year, dtime.month, dtime.day, dtime.hour)
     if not os.path.isfile(of_name):
         raise IOError("No obs file for given version and date")
 
-    o = pandas.read_fwf(
+    o = _read_fixed_width(
         of_name,
-        colspecs=[
-            (0, 19),
-            (20, 23),
-            (24, 25),
-            (26, 33),
-            (34, 40),
-            (41, 46),
-            (47, 52),
-            (53, 61),
-            (60, 67),
-            (68, 75),
-            (76, 83),
-            (84, 94),
-            (95, 100),
-            (101, 106),
-            (107, 108),
-            (109, 110),
-            (111, 112),
-            (113, 114),
-            (115, 116),
-            (117, 127),
-            (128, 138),
-            (139, 149),
-            (150, 160),
-            (161, 191),
-            (192, 206),
-        ],
-        header=None,
-        encoding="ISO-8859-1",
-        names=[
-            "UID",
-            "NCEP.Type",
-            "Variable",
-            "Longitude",
-            "Latitude",
-            "Elevation",
-            "Model.Elevation",
-            "Time.Offset",
-            "Pressure.after.bias.correction",
-            "Pressure.after.vertical.interpolation",
-            "SLP",
-            "Bias",
-            "Error.in.surface.pressure",
-            "Error.in.vertically.interpolated.pressure",
-            "Assimilation.indicator",
-            "Usability.check",
-            "QC.flag",
-            "Background.check",
-            "Buddy.check",
-            "Mean.first.guess.pressure.difference",
-            "First.guess.pressure.spread",
-            "Mean.analysis.pressure.difference",
-            "Analysis.pressure.spread",
-            "Name",
-            "ID",
-        ],
-        converters={
-            "UID": str,
-            "NCEP.Type": int,
-            "Variable": str,
-            "Longitude": float,
-            "Latitude": float,
-            "Elevation": int,
-            "Model.Elevation": int,
-            "Time.Offset": float,
-            "Pressure.after.bias.correction": float,
-            "Pressure.after.vertical.interpolation": float,
-            "SLP": float,
-            "Bias": float,
-            "Error.in.surface.pressure": float,
-            "Error.in.vertically.interpolated.pressure": float,
-            "Assimilation.indicator": int,
-            "Usability.check": int,
-            "QC.flag": int,
-            "Background.check": int,
-            "Buddy.check": int,
-            "Mean.first.guess.pressure.difference": float,
-            "First.guess.pressure.spread": float,
-            "Mean.analysis.pressure.difference": float,
-            "Analysis.pressure.spread": float,
-            "Name": str,
-            "ID": str,
-        },
-        na_values=[
-            "NA",
-            "*",
-            "***",
-            "*****",
-            "*******",
-            "**********",
-            "-99",
-            "9999",
-            "-999",
-            "9999.99",
-            "10000.0",
-            "-9.99",
-            "999999999999",
-            "9",
-        ],
-        comment=None,
+        colspecs=_obs_colspecs,
+        names=_obs_names,
+        converters=_obs_converters,
+        na_values=_obs_na_values,
+        cache=True,
+        rows=rows,
+        usecols=columns,
+        where=where,
     )
+    if compact:
+        o = _compact_observations(o)
     return o
 
 
-def load_observations(start, end):
-    result = None
-    ct = start - datetime.timedelta(hours=3)
-    while ct < (end + datetime.timedelta(hours=3)):
-        if int(ct.hour) % 6 != 0:
-            ct = ct + datetime.timedelta(hours=1)
-            continue
-        o = load_observations_1file(ct)
-        dtm = pandas.to_datetime(o.UID.str.slice(0, 10), format="%Y%m%d%H")
-        o2 = o[(dtm >= start) & (dtm < end)]
-        if result is None:
-            result = o2
-        else:
-            result = pandas.concat([result, o2])
-        ct = ct + datetime.timedelta(hours=1)
-    return result
-
-
-def load_observations_fortime(v_time):
-    result = None
+def load_observations(
+    start, end, workers=None, columns=None, where=None, compact=False
+):
+    return _load_observations_period(
+        load_observations_1file,
+        start,
+        end,
+        workers=workers,
+        columns=columns,
+        where=where,
+        compact=compact,
+    )
+
+
+# Observation files for each of the times
+def _year_file_names(times):
+    return [
+        _observations_file_name(dtime.year, dtime.month, dtime.day, dtime.hour)
+        for dtime in times
+    ]
+
+
+def _observations_index_file(year):
+    return "%s/observations/%04d.spatial_index.npz" % (_get_data_dir(), year)
+
+
+# Spatial index of a year's observations (made if necessary)
+def _observations_index(year):
+    times = _year_times(year)
+    return _get_observations_index(
+        load_observations_1file,
+        times,
+        _year_file_names(times),
+        _observations_index_file(year),
+    )
+
+
+def load_observations_in_box(year, lat_min, lat_max, lon_min, lon_max):
+    index = _observations_index(year)
+    return _index_records(
+        load_observations_1file,
+        index,
+        _index_box(index, lat_min, lat_max, lon_min, lon_max),
+    )
+
+
+def load_observations_near(year, latitude, longitude, radius):
+    index = _observations_index(year)
+    (positions, distances) = _index_radius(index, latitude, longitude, radius)
+    return _index_records(load_observations_1file, index, positions, distances)
+
+
+def load_observations_nearest(year, latitude, longitude, count):
+    index = _observations_index(year)
+    (positions, distances) = _index_nearest(index, latitude, longitude, count)
+    return _index_records(load_observations_1file, index, positions, distances)
+
+
+def _platform_index_file(year):
+    return "%s/observations/%04d.platform_index.npz" % (_get_data_dir(), year)
+
+
+# Platform index of a year's observations (made if necessary)
+def _platform_index(year, workers=None):
+    times = _year_times(year)
+    return _get_observations_index(
+        load_observations_1file,
+        times,
+        _year_file_names(times),
+        _platform_index_file(year),
+        build=functools.partial(_build_platform_index, workers=workers),
+    )
+
+
+def load_platform(id, start, end, workers=None):
+    return _load_platform(
+        load_observations_1file,
+        functools.partial(_platform_index, workers=workers),
+        id,
+        start,
+        end,
+    )
+
+
+def _coverage_file(year, resolution):
+    return "%s/observations/%04d.coverage_%g.npz" % (
+        _get_data_dir(),
+        year,
+        resolution,
+    )
+
+
+def load_observations_coverage(year, resolution=2.0, workers=None):
+    times = _year_times(year)
+    return _coverage_cube(
+        _get_observations_index(
+            load_observations_1file,
+            times,
+            _year_file_names(times),
+            _coverage_file(year, resolution),
+            build=functools.partial(
+                _build_coverage, resolution=resolution, workers=workers
+            ),
+            compress=True,
+        )
+    )
+
+
+# Files (assimilation times) with observations contributing to the
+#  fields at a time, and their weights - the same as the interpolation
+#  weights of the fields.
+def _fortime_files(v_time):
     if v_time.hour % 6 == 0:
-        result = load_observations_1file(v_time)
-        result["weight"] = numpy.repeat(1, len(result.index))
-        return result
+        return [(v_time.replace(minute=0, second=0, microsecond=0), 1)]
     prev_time = v_time - datetime.timedelta(
-        hours=v_time.hour % 6, minutes=v_time.minute, seconds=v_time.second
+        hours=v_time.hour % 6,
+        minutes=v_time.minute,
+        seconds=v_time.second,
+        microseconds=v_time.microsecond,
     )
     prev_weight = 1 - (v_time - prev_time).total_seconds() / (3600.0 * 6)
-    result = load_observations_1file(prev_time)
-    result["weight"] = numpy.repeat(prev_weight, len(result.index))
     next_time = prev_time + datetime.timedelta(hours=6)
-    next_weight = 1 - prev_weight
-    result2 = load_observations_1file(next_time)
-    result2["weight"] = numpy.repeat(next_weight, len(result2.index))
-    result = pandas.concat([result, result2])
-    return result
+    return [(prev_time, prev_weight), (next_time, 1 - prev_weight)]
+
+
+def load_observations_fortime(v_time, columns=None, where=None, compact=False):
+    return _load_observations_fortime(
+        functools.partial(
+            load_observations_1file, columns=columns, where=where, compact=compact
+        ),
+        _fortime_files(v_time),
+    )
+
+
+def observations_stream(columns=None, where=None, compact=False, prefetch=True):
+    return _ObservationsStream(
+        functools.partial(
+            load_observations_1file, columns=columns, where=where, compact=compact
+        ),
+        _fortime_files,
+        prefetch=prefetch,
+    )
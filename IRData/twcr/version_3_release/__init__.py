@@ -17,4 +17,6 @@ from .utils import *
 from .load import *
 from .fetch import *
 from .fetch_ssh import *
+from .repack import *
+from .stations import *
 from .observations import *
@@ -15,12 +15,20 @@
 
 import os
 import sys
+import re
+import shutil
 import subprocess
 import datetime
 import tarfile
+import warnings
+import numpy as np
+import iris
 
 from .utils import _get_data_file_name
+from .utils import _get_monthly_data_file_name
 from .utils import _get_data_dir
+from .utils import _get_tar_file_name
+from .tar_index import _get_tar_member
 
 
 def _get_remote_file_name(variable, year):
@@ -55,10 +63,6 @@ def _get_remote_file_name(variable, year):
     return remote_file
 
 
-def _get_tar_file_name(variable, year):
-    return "%s/%s_%04d.tar" % (_get_data_dir(), variable, year)
-
-
 def _unpack_downloaded(variable, year):
     local_file = _get_tar_file_name(variable, year)
     tar = tarfile.open(local_file, "r")
@@ -73,17 +77,34 @@ def _unpack_downloaded(variable, year):
     # os.remove(local_file)
 
 
-def fetch(variable, dtime):
+def fetch(variable, dtime, extract=False):
+    """Get all data for one variable, for one year, from the 20CR archive at NERSC.
+
+    The data come as a tar file of member files. Load reads the member files from inside the tar, so extracting them is optional (and doubles the disc space used).
+
+    Args:
+        variable (:obj:`str`): Variable to fetch (e.g. 'PRMSL').
+        dtime (:obj:`datetime.datetime`): Date and time to get data for.
+        extract (:obj:`bool`): If True, also extract the member files from the tar. Defaults to False.
+
+    |
+    """
 
     ndtime = dtime + datetime.timedelta(hours=6)
     if ndtime.year != dtime.year:
-        fetch(variable, ndtime)
+        fetch(variable, ndtime, extract=extract)
 
     local_file = _get_data_file_name(variable, dtime.year)
+    tar_file = _get_tar_file_name(variable, dtime.year)
 
     if os.path.isfile(local_file):
         # Got this data already
         return
+    if _get_tar_member(local_file, variable, dtime.year) is not None:
+        # Got this data already - not extracted
+        if extract:
+            _unpack_downloaded(variable, dtime.year)
+        return
 
     if not os.path.exists(os.path.dirname(local_file)):
         os.makedirs(os.path.dirname(local_file))
@@ -91,8 +112,126 @@ def fetch(variable, dtime):
     remote_file = _get_remote_file_name(variable, dtime.year)
 
     # Download the tar file
-    cmd = "wget -O %s %s" % (_get_tar_file_name(variable, dtime.year), remote_file)
+    cmd = "wget -O %s %s" % ("%s.part" % tar_file, remote_file)
     wg_retvalue = subprocess.call(cmd, shell=True)
     if wg_retvalue != 0:
         raise Exception("Failed to retrieve data")
-    _unpack_downloaded(variable, dtime.year)
+    os.rename("%s.part" % tar_file, tar_file)
+    # Index it, so the member files can be read without extraction
+    _get_tar_member(local_file, variable, dtime.year)
+    if extract:
+        _unpack_downloaded(variable, dtime.year)
+
+
+# Member number of a data file in the tar (None if not a data file
+#  for this variable and year)
+def _get_tar_member_number(name, variable, year):
+    match = re.match(
+        r"%s\.%04d_mem(\d\d\d)\.nc$" % (re.escape(variable), year),
+        os.path.basename(name),
+    )
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
+# Write out the selected months of one member's data, from an
+#  extracted (annual) file, as monthly files.
+def _split_member_file(file_name, variable, year, member, months):
+    with warnings.catch_warnings():  # Iris is v.fussy
+        warnings.simplefilter("ignore")
+        cube = iris.load_cube(file_name)
+        tc = cube.coord("time")
+        months_in_file = np.array([d.month for d in tc.units.num2date(tc.points)])
+        for month in months:
+            in_month = np.where(months_in_file == month)[0]
+            if len(in_month) == 0:
+                raise Exception(
+                    "No data for %04d-%02d in %s" % (year, month, file_name)
+                )
+            # Keep time as a dimension, as in the annual file
+            monthly = cube[in_month[0] : in_month[-1] + 1]
+            monthly_file = _get_monthly_data_file_name(
+                variable, year, month, member=member
+            )
+            iris.save(monthly, "%s.part" % monthly_file, saver="nc")
+            os.rename("%s.part" % monthly_file, monthly_file)
+
+
+def fetch_subset(variable, year, members=None, months=None):
+    """Get data for some members, and some months, of one year, from the 20CR archive at NERSC.
+
+    The tar file for the year is read as it is downloaded, and only the files for the selected members are kept - the tar is never stored. If months are selected, each member's file is cut down to those months (as a monthly file) as soon as it arrives. The download stops as soon as all the selected members have arrived.
+
+    Args:
+        variable (:obj:`str`): Variable to fetch (e.g. 'PRMSL').
+        year (:obj:`int`): Year to get data for.
+        members (:obj:`list`): Members to get. Defaults to None - all 80.
+        months (:obj:`list`): Months to get. Defaults to None - the whole year.
+
+    Raises:
+        StandardError: If the download fails, or does not contain the selected members.
+
+    |
+    """
+    if members is None:
+        members = range(1, 81)
+    wanted = set(members)
+    if months is None:
+        wanted = set(
+            m
+            for m in wanted
+            if not os.path.isfile(_get_data_file_name(variable, year, member=m))
+        )
+    else:
+        wanted = set(
+            m
+            for m in wanted
+            if not all(
+                os.path.isfile(_get_data_file_name(variable, year, month, member=m))
+                for month in months
+            )
+        )
+    if len(wanted) == 0:
+        # Got this data already
+        return
+    local_dir = os.path.dirname(_get_data_file_name(variable, year))
+    if not os.path.exists(local_dir):
+        os.makedirs(local_dir)
+
+    remote_file = _get_remote_file_name(variable, year)
+    wget = subprocess.Popen(
+        ["wget", "-q", "-O", "-", remote_file], stdout=subprocess.PIPE
+    )
+    try:
+        with tarfile.open(fileobj=wget.stdout, mode="r|") as tar:
+            for tar_member in tar:
+                member = _get_tar_member_number(tar_member.name, variable, year)
+                if member not in wanted:
+                    continue  # Skipped over as the stream is read
+                file_name = _get_data_file_name(variable, year, member=member)
+                with open("%s.part" % file_name, "wb") as f:
+                    shutil.copyfileobj(tar.extractfile(tar_member), f)
+                if months is None:
+                    os.rename("%s.part" % file_name, file_name)
+                else:
+                    try:
+                        _split_member_file(
+                            "%s.part" % file_name, variable, year, member, months
+                        )
+                    finally:
+                        os.remove("%s.part" % file_name)
+                wanted.remove(member)
+                if len(wanted) == 0:
+                    break
+    finally:
+        if len(wanted) == 0:
+            # Don't download the rest
+            wget.terminate()
+        wget.stdout.close()
+        wget.wait()
+    if len(wanted) > 0:
+        raise Exception(
+            "Failed to retrieve data for members %s"
+            % " ".join("%d" % m for m in sorted(wanted))
+        )
@@ -20,18 +20,26 @@ import datetime
 import tarfile
 import glob
 import shutil
+import concurrent.futures
 
 from .utils import _get_data_file_name
 from .utils import _get_data_dir
 
 
-def _get_remote_file_name_ssh(variable, year, month, version, user="pbrohan"):
-
-    remote_dir = (
+def _get_remote_dir_ssh(version, user="pbrohan"):
+    return (
         "%s@dtn02.nersc.gov:/global/cscratch1/sd/%s/"
         + "20CRv3.working.nc/version_%1s%1s%1s"
     ) % (user, user, version[0], version[2], version[4])
 
+
+def _get_remote_file_name_ssh(
+    variable, year, month, version, user="pbrohan", remote_dir=None
+):
+
+    if remote_dir is None:
+        remote_dir = _get_remote_dir_ssh(version, user=user)
+
     if variable == "observations":
         remote_file = "%s/%04d/%02d/%04d%02d_psobs.tar" % (
             remote_dir,
@@ -91,7 +99,7 @@ def fetch_ssh(variable, dtime, version, user="pbrohan"):
 
     ndtime = dtime + datetime.timedelta(hours=6)
     if ndtime.month != dtime.month:
-        fetch_ssh(variable, ndtime)
+        fetch_ssh(variable, ndtime, version, user=user)
 
     local_file = _get_tar_file_name_ssh(variable, dtime.year, dtime.month, version)
 
@@ -112,3 +120,74 @@ def fetch_ssh(variable, dtime, version, user="pbrohan"):
     if scp_retvalue != 0:
         raise Exception("Failed to retrieve data. Code: %d" % scp_retvalue)
     _unpack_downloaded_ssh(variable, dtime.year, dtime.month, version)
+
+
+def _fetch_month_rsync(variable, year, month, version, user="pbrohan", remote_dir=None):
+    """Get one month's tar file with rsync, and unpack it.
+
+    Returns None if successful, otherwise a description of the failure."""
+    local_file = _get_tar_file_name_ssh(variable, year, month, version)
+    if os.path.isfile(local_file):
+        # Got this data already
+        return None
+    remote_file = _get_remote_file_name_ssh(
+        variable, year, month, version, user=user, remote_dir=remote_dir
+    )
+    # Interrupted transfers are kept in the partial dir, and resumed from
+    #  there next time - the tar file only appears when it's complete.
+    cmd = "rsync -t --partial-dir=.rsync-partial %s %s" % (remote_file, local_file)
+    rs_retvalue = subprocess.call(cmd, shell=True)
+    if rs_retvalue != 0:
+        return "%s %04d-%02d (code %d)" % (variable, year, month, rs_retvalue)
+    _unpack_downloaded_ssh(variable, year, month, version)
+    return None
+
+
+def fetch_ssh_batch(
+    variables, months, version, user="pbrohan", workers=4, remote_dir=None
+):
+    """Get data for several variables and months, by rsync from NERSC.
+
+    Runs several transfers at once, and unpacks each tar file as soon as it
+    arrives. Interrupted transfers resume where they stopped, when run again.
+    Months already on disc are skipped.
+
+    Args:
+        variables (:obj:`list`): Variables to fetch (e.g. ['prmsl','observations']).
+        months (:obj:`list`): (year, month) pairs to fetch.
+        version (:obj:`str`): 20CR version to retrieve data for (e.g. '4.5.1').
+        user (:obj:`str`): NERSC userid to use in retrieval. Defaults to 'pbrohan'.
+        workers (:obj:`int`): Number of transfers to run at once. Defaults to 4.
+        remote_dir (:obj:`str`): Where to get the data from. Defaults to None - the usual place at NERSC. (Any rsync source will do - including a local directory).
+
+    Raises:
+        StandardError: If any of the transfers failed (after all the others have finished).
+
+    |
+    """
+    tasks = [
+        (variable, year, month) for variable in variables for (year, month) in months
+    ]
+    for variable in variables:
+        local_dir = os.path.dirname(
+            _get_tar_file_name_ssh(variable, months[0][0], months[0][1], version)
+        )
+        if not os.path.exists(local_dir):
+            os.makedirs(local_dir)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _fetch_month_rsync,
+                variable,
+                year,
+                month,
+                version,
+                user=user,
+                remote_dir=remote_dir,
+            )
+            for (variable, year, month) in tasks
+        ]
+        failures = [f.result() for f in futures]
+    failures = [f for f in failures if f is not None]
+    if len(failures) > 0:
+        raise Exception("Failed to retrieve data: %s" % ", ".join(failures))
@@ -19,12 +19,24 @@ import iris
 import iris.time
 import datetime
 import warnings
+import functools
+import concurrent.futures
+import numpy as np
+import dask
 
 from .utils import _get_data_file_name
+from .utils import _get_available_packed_file_name
+from .utils import _is_data_file
+from .utils import _dir_snapshot
+from .tar_index import _get_tar_member
+from .tar_index import _load_tar_member_cube
 
 # Need to add coordinate system metadata so they work with cartopy
 coord_s = iris.coord_systems.GeogCS(iris.fileformats.pp.EARTH_RADIUS)
 
+# Ensemble members, each in its own file
+_members = range(1, 81)
+
 
 def _is_in_file(variable, hour):
     """Is the variable available for this time?
@@ -56,41 +68,57 @@ def _get_next_field_time(variable, year, month, day, hour):
     return dr
 
 
+def _load_data_cube(file_name, constraint, variable, year, version="3"):
+    """Load a cube from a data file - from disc if it has been
+    extracted, otherwise from inside the downloaded tar file."""
+    if not _is_data_file(file_name):
+        tar_member = _get_tar_member(file_name, variable, year, version=version)
+        if tar_member is not None:
+            return _load_tar_member_cube(tar_member, constraint)
+    return iris.load_cube(file_name, constraint)
+
+
 def _get_slice_at_hour_at_timestep(
-    variable, year, month, day, hour, version="3", member=None
+    variable, year, month, day, hour, version="3", member=None, executor=None
 ):
     """Get the cube with the data, given that the specified time
     matches a data timestep."""
     if not _is_in_file(variable, hour):
         raise ValueError("Invalid hour - data not in file")
-    if member is None:
-        res = iris.cube.CubeList()
-        for mem in range(1, 81):
-            res.append(
-                _get_slice_at_hour_at_timestep(
-                    variable, year, month, day, hour, version=version, member=mem
-                )
-            )
-            if mem > 1:
-                res[mem - 1].attributes = res[0].attributes
-            res[mem - 1].add_aux_coord(iris.coords.AuxCoord(mem, long_name="member"))
-        return res.merge_cube()
-    file_name = _get_data_file_name(
-        variable, year, month, version=version, member=member
+    # Use the repacked file (all members in one) if there is one
+    packed_file = _get_available_packed_file_name(
+        variable, year, month, version=version
     )
+    if member is None and packed_file is None:
+        return _get_all_members(
+            variable, year, month, day, hour, version=version, executor=executor
+        )
     time_constraint = iris.Constraint(
         time=iris.time.PartialDateTime(year=year, month=month, day=day, hour=hour)
     )
+    if packed_file is not None:
+        file_name = packed_file
+        if member is not None:
+            time_constraint = time_constraint & iris.Constraint(member=member)
+    else:
+        file_name = _get_data_file_name(
+            variable, year, month, version=version, member=member
+        )
     try:
         with warnings.catch_warnings():  # Iris is v.fussy
             warnings.simplefilter("ignore")
-            hslice = iris.load_cube(file_name, time_constraint)
+            hslice = _load_data_cube(
+                file_name, time_constraint, variable, year, version=version
+            )
     except iris.exceptions.ConstraintMismatchError:
         raise Exception(
             "%s not available for %04d-%02d-%02d:%02d"
             % (variable, year, month, day, hour)
         )
 
+    # Single members look the same, whichever file they came from
+    if packed_file is not None and member is not None:
+        hslice.remove_coord("member")
     # Enhance the names and metadata for iris/cartopy
     hslice.coord("latitude").coord_system = coord_s
     hslice.coord("longitude").coord_system = coord_s
@@ -104,27 +132,134 @@ def _get_slice_at_hour_at_timestep(
     return hslice
 
 
-def load(variable, dtime, version="3", member=None):
-    """Load requested data from disc, interpolating if necessary.
+def _get_member_slice(member, variable, year, month, day, hour, version="3"):
+    """One member's (lazy) data"""
+    return _get_slice_at_hour_at_timestep(
+        variable, year, month, day, hour, version=version, member=member
+    )
 
-    Data must be available in directory $SCRATCH/20CR.
 
-    Args:
-        variable (:obj:`str`): Variable to fetch (e.g. 'prmsl')
-        dtime (:obj:`datetime.datetime`): Date and time to load data for.
-        version (:obj:`str`): Reanalysis version (e.g. '4.5.1') defaults to '3'
-        member (:obj:`int`): Which member to load. Defaults to None - load all 80 members.
+def _read_member_slice(member, variable, year, month, day, hour, version="3"):
+    """One member's data, read - run in a worker process, so the
+    reading (not just the opening of the file) is done there. (Without
+    dask's threads - a forked worker has a copy of the parent's thread
+    pool, but not its threads.)"""
+    hslice = _get_member_slice(member, variable, year, month, day, hour, version)
+    with dask.config.set(scheduler="synchronous"):
+        hslice.data
+    return hslice
 
-    Returns:
-        :obj:`iris.cube.Cube`: Global field of variable at time.
 
-    Note that 20CR data is only output every 3 hours, so if hour%3!=0, the result may be linearly interpolated in time.
+def _member_slices(variable, year, month, day, hour, version="3", executor=None):
+    """The member slices, in member order - lazy if they are read here,
+    or read in the executor's worker processes (the netCDF library is
+    not thread-safe, so files are not read in threads)."""
+    if executor is None:
+        return (
+            _get_member_slice(member, variable, year, month, day, hour, version)
+            for member in _members
+        )
+    return executor.map(
+        functools.partial(
+            _read_member_slice,
+            variable=variable,
+            year=year,
+            month=month,
+            day=day,
+            hour=hour,
+            version=version,
+        ),
+        _members,
+    )
 
-    Raises:
-        StandardError: Data not on disc.
 
-    |
-    """
+def _get_all_members(
+    variable,
+    year,
+    month,
+    day,
+    hour,
+    version="3",
+    executor=None,
+    cube=None,
+    weight=None,
+):
+    """Get the data for all 80 members, one file per member.
+
+    If executor (a ProcessPoolExecutor) is given, the files are read in
+    its worker processes. The members are always in the same order,
+    however they are read.
+
+    Each member's data (and mask) go straight into their place in one
+    (80,lat,lon) array, and the ensemble cube is built once, around that
+    array - no merging of 80 separate cubes. If cube (all the members
+    at another time) is given, its array is used instead: the members
+    are added to it, with the given weight, as cube*(1-weight) +
+    members*weight - so the second timestep of an interpolation needs
+    no array of its own."""
+    data = None
+    for (index, hslice) in enumerate(
+        _member_slices(variable, year, month, day, hour, version, executor)
+    ):
+        if data is None:
+            template = hslice
+            if cube is None:
+                data = np.empty((len(_members),) + hslice.shape, dtype=hslice.dtype)
+                mask = np.zeros(data.shape, dtype=bool)
+            else:
+                data = np.ma.getdata(cube.data)
+                mask = np.ma.getmaskarray(cube.data)
+        values = hslice.data
+        if cube is None:
+            data[index] = np.ma.getdata(values)
+            mask[index] = np.ma.getmaskarray(values)
+        else:
+            data[index] *= 1.0 - weight
+            data[index] += weight * np.ma.getdata(values)
+            mask[index] |= np.ma.getmaskarray(values)
+    if mask.any():
+        data = np.ma.array(data, mask=mask)
+    if cube is not None:
+        cube.data = data
+        return cube
+    return _ensemble_cube(template, _members, data)
+
+
+def _ensemble_cube(template, members, data):
+    """Make a cube with a member dimension, from a single-member cube
+    (for the metadata and coordinates), the member numbers, and the
+    data for all those members."""
+    cube = iris.cube.Cube(data)
+    cube.metadata = template.metadata
+    cube.add_dim_coord(
+        iris.coords.DimCoord(np.array(members, dtype=np.int32), long_name="member"),
+        0,
+    )
+    for coord in template.dim_coords:
+        cube.add_dim_coord(coord.copy(), template.coord_dims(coord)[0] + 1)
+    for coord in template.aux_coords:
+        cube.add_aux_coord(
+            coord.copy(), [dim + 1 for dim in template.coord_dims(coord)]
+        )
+    return cube
+
+
+def _load(variable, dtime, version="3", member=None, workers=None):
+    """Load the data - see :func:`load`."""
+    # One set of worker processes for all the timesteps needed
+    executor = None
+    if member is None and workers is not None and workers > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    try:
+        return _load_with_executor(
+            variable, dtime, version=version, member=member, executor=executor
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def _load_with_executor(variable, dtime, version="3", member=None, executor=None):
     dhour = dtime.hour + dtime.minute / 60.0 + dtime.second / 3600.0
     if _is_in_file(variable, dhour):
         return _get_slice_at_hour_at_timestep(
@@ -135,6 +270,7 @@ def load(variable, dtime, version="3", member=None):
             dhour,
             version=version,
             member=member,
+            executor=executor,
         )
     previous_step = _get_previous_field_time(
         variable, dtime.year, dtime.month, dtime.day, dhour
@@ -160,18 +296,76 @@ def load(variable, dtime, version="3", member=None):
         previous_step["hour"],
         version=version,
         member=member,
+        executor=executor,
     )
-    s_next = _get_slice_at_hour_at_timestep(
-        variable,
-        next_step["year"],
-        next_step["month"],
-        next_step["day"],
-        next_step["hour"],
-        version=version,
-        member=member,
-    )
-    # Iris won't merge cubes with different attributes
-    s_previous.attributes = s_next.attributes
-    s_next = iris.cube.CubeList((s_previous, s_next)).merge_cube()
-    s_next = s_next.interpolate([("time", dt_current)], iris.analysis.Linear())
-    return s_next
+    # Linear interpolation in time, done in place in the array already
+    #  holding the previous timestep's data - no merged or interpolated
+    #  copies.
+    weight = (dt_current - dt_previous).total_seconds() / (
+        dt_next - dt_previous
+    ).total_seconds()
+    if not np.issubdtype(s_previous.dtype, np.floating):
+        s_previous.data = s_previous.data.astype(np.float32)
+    if member is None and (
+        _get_available_packed_file_name(
+            variable, next_step["year"], next_step["month"], version=version
+        )
+        is None
+    ):
+        # Member by member, straight into the previous timestep's array
+        _get_all_members(
+            variable,
+            next_step["year"],
+            next_step["month"],
+            next_step["day"],
+            next_step["hour"],
+            version=version,
+            executor=executor,
+            cube=s_previous,
+            weight=weight,
+        )
+    else:
+        s_next = _get_slice_at_hour_at_timestep(
+            variable,
+            next_step["year"],
+            next_step["month"],
+            next_step["day"],
+            next_step["hour"],
+            version=version,
+            member=member,
+        )
+        result = s_previous.data
+        result *= 1.0 - weight
+        next_data = s_next.data
+        next_data *= weight
+        result += next_data
+    tc = s_previous.coord("time")
+    tc.bounds = None
+    tc.points = [tc.units.date2num(dt_current)]
+    return s_previous
+
+
+def load(variable, dtime, version="3", member=None, workers=None):
+    """Load requested data from disc, interpolating if necessary.
+
+    Data must be available in directory $SCRATCH/20CR. If the member files have been combined with :func:`repack`, the combined file is used instead. Member files not extracted from the downloaded tar file are read from inside it.
+
+    Args:
+        variable (:obj:`str`): Variable to fetch (e.g. 'prmsl')
+        dtime (:obj:`datetime.datetime`): Date and time to load data for.
+        version (:obj:`str`): Reanalysis version (e.g. '4.5.1') defaults to '3'
+        member (:obj:`int`): Which member to load. Defaults to None - load all 80 members.
+        workers (:obj:`int`): When loading all 80 members (one file each), read up to this many files at once, each in its own process. Defaults to None - read them one after another.
+
+    Returns:
+        :obj:`iris.cube.Cube`: Global field of variable at time.
+
+    Note that 20CR data is only output every 3 hours, so if hour%3!=0, the result may be linearly interpolated in time.
+
+    Raises:
+        StandardError: Data not on disc.
+
+    |
+    """
+    with _dir_snapshot():
+        return _load(variable, dtime, version=version, member=member, workers=workers)
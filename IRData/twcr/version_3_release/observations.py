@@ -14,15 +14,126 @@
 # Handle observations for version 3-final
 
 import datetime
+import functools
 import os
 import os.path
 import subprocess
 import zipfile
-import pandas
-import numpy
-import getpass
 
 from .utils import _get_data_dir
+from ...utils.fixed_width import _read_fixed_width
+from ...utils.fixed_width import _is_cache_file
+from ...utils.observations import _load_observations_period
+from ...utils.observations import _year_times
+from ...utils.observations import _get_observations_index
+from ...utils.observations import _index_box
+from ...utils.observations import _index_radius
+from ...utils.observations import _index_nearest
+from ...utils.observations import _index_records
+from ...utils.observations import _build_platform_index
+from ...utils.observations import _load_platform
+from ...utils.observations import _build_coverage
+from ...utils.observations import _coverage_cube
+from ...utils.observations import _compact_observations
+from ...utils.observations import _load_observations_fortime
+from ...utils.observations import _ObservationsStream
+
+
+# Layout of the observations files
+_obs_colspecs = [
+    (0, 19),
+    (20, 50),
+    (52, 64),
+    (66, 68),
+    (69, 72),
+    (74, 80),
+    (81, 87),
+    (88, 95),
+    (97, 102),
+    (103, 110),
+    (111, 112),
+    (113, 123),
+    (124, 134),
+    (135, 145),
+    (146, 156),
+    (157, 167),
+    (168, 175),
+    (176, 183),
+    (184, 191),
+    (192, 200),
+    (201, 205),
+    (206, 213),
+    (214, 221),
+    (222, 223),
+]
+_obs_names = [
+    "UID",
+    "Name",
+    "ID",
+    "Type",
+    "NCEP.Type",
+    "Longitude",
+    "Latitude",
+    "Observed",
+    "Time.offset",
+    "Observed.2",
+    "Skipped",
+    "Bias.correction",
+    "Obfit.prior",
+    "Obfit.post",
+    "Obsprd.prior",
+    "Obsprd.post",
+    "Oberrvar.orig.out",
+    "Oberrvar.out",
+    "Oberrvar.use",
+    "Paoverpb.save",
+    "Prob.gross.error",
+    "Localization.length.scale",
+    "Lnsigl",
+    "QC.failure.flag",
+]
+_obs_converters = {
+    "UID": str,
+    "Name": str,
+    "ID": str,
+    "Type": str,
+    "NCEP.Type": int,
+    "Longitude": float,
+    "Latitude": float,
+    "Observed": float,
+    "Time.offset": float,
+    "Observed.2": float,
+    "Skipped": int,
+    "Bias.correction": float,
+    "Obfit.prior": float,
+    "Obfit.post": float,
+    "Obsprd.prior": float,
+    "Obsprd.post": float,
+    "Oberrvar.orig.out": float,
+    "Oberrvar.out": float,
+    "Oberrvar.use": float,
+    "Paoverpb.save": float,
+    "Prob.gross.error": float,
+    "Localization.length.scale": float,
+    "Lnsigl": float,
+    "QC.failure.flag": int,
+}
+_obs_na_values = [
+    "NA",
+    "*",
+    "***",
+    "*****",
+    "*******",
+    "**********",
+    "-99",
+    "9999",
+    "-999",
+    "9999.99",
+    "10000.0",
+    "-9.99",
+    "999999999999",
+    "9",
+]
 
 
 def _observations_zip_file(year, version="3"):
@@ -73,7 +184,7 @@ def fetch_observations(dtime):
         fetch_observations(ndtime)
     o_dir = "%s/observations/%04d" % (_get_data_dir(), dtime.year)
     if os.path.exists(o_dir):
-        if len(os.listdir(o_dir)) >= 1460:
+        if len([f for f in os.listdir(o_dir) if not _is_cache_file(f)]) >= 1460:
             return
     _download_observations(dtime.year)
     _unpack_downloaded_observations(dtime.year)
@@ -100,155 +211,196 @@ def _unpack_downloaded_observations(year):
     os.remove(local_file)
 
 
-def load_observations_1file(dtime, version):
-    """Retrieve all the observations for an individual assimilation run."""
+def load_observations_1file(
+    dtime, version, rows=None, columns=None, where=None, compact=False
+):
+    """Retrieve all the observations for an individual assimilation run
+    (or just those at the given rows, and just the given columns, of
+    the observations that pass the where conditions - compact, if
+    compact=True)."""
     of_name = _observations_file_name(
         dtime.year, dtime.month, dtime.day, dtime.hour, version=version
     )
-    if not os.path.isfile(of_name):
+    if of_name is None or not os.path.isfile(of_name):
         raise IOError("No obs file for given version and date")
 
-    o = pandas.read_fwf(
+    o = _read_fixed_width(
         of_name,
-        colspecs=[
-            (0, 19),
-            (20, 50),
-            (52, 64),
-            (66, 68),
-            (69, 72),
-            (74, 80),
-            (81, 87),
-            (88, 95),
-            (97, 102),
-            (103, 110),
-            (111, 112),
-            (113, 123),
-            (124, 134),
-            (135, 145),
-            (146, 156),
-            (157, 167),
-            (168, 175),
-            (176, 183),
-            (184, 191),
-            (192, 200),
-            (201, 205),
-            (206, 213),
-            (214, 221),
-            (222, 223),
-        ],
-        header=None,
-        encoding="ISO-8859-1",
-        names=[
-            "UID",
-            "Name",
-            "ID",
-            "Type",
-            "NCEP.Type",
-            "Longitude",
-            "Latitude",
-            "Observed",
-            "Time.offset",
-            "Observed.2",
-            "Skipped",
-            "Bias.correction",
-            "Obfit.prior",
-            "Obfit.post",
-            "Obsprd.prior",
-            "Obsprd.post",
-            "Oberrvar.orig.out",
-            "Oberrvar.out",
-            "Oberrvar.use",
-            "Paoverpb.save",
-            "Prob.gross.error",
-            "Localization.length.scale",
-            "Lnsigl",
-            "QC.failure.flag",
-        ],
-        converters={
-            "UID": str,
-            "Name": str,
-            "ID": str,
-            "Type": str,
-            "NCEP.Type": int,
-            "Longitude": float,
-            "Latitude": float,
-            "Observed": float,
-            "Time.offset": float,
-            "Observed.2": float,
-            "Skipped": int,
-            "Bias.correction": float,
-            "Obfit.prior": float,
-            "Obfit.post": float,
-            "Obsprd.prior": float,
-            "Obsprd.post": float,
-            "Oberrvar.orig.out": float,
-            "Oberrvar.out": float,
-            "Oberrvar.use": float,
-            "Paoverpb.save": float,
-            "Prob.gross.error": float,
-            "Localization.length.scale": float,
-            "Lnsigl": float,
-            "QC.failure.flag": int,
-        },
-        na_values=[
-            "NA",
-            "*",
-            "***",
-            "*****",
-            "*******",
-            "**********",
-            "-99",
-            "9999",
-            "-999",
-            "9999.99",
-            "10000.0",
-            "-9.99",
-            "999999999999",
-            "9",
-        ],
-        comment=None,
-        compression="infer",
+        colspecs=_obs_colspecs,
+        names=_obs_names,
+        converters=_obs_converters,
+        na_values=_obs_na_values,
+        cache=True,
+        rows=rows,
+        usecols=columns,
+        where=where,
     )
+    if compact:
+        o = _compact_observations(o)
     return o
 
 
-def load_observations(start, end, version="3"):
-    result = None
-    ct = start
-    while ct < end:
-        if int(ct.hour) % 6 != 0:
-            ct = ct + datetime.timedelta(hours=1)
-            continue
-        o = load_observations_1file(ct, version=version)
-        dtm = pandas.to_datetime(o.UID.str.slice(0, 10), format="%Y%m%d%H")
-        o2 = o[(dtm >= start) & (dtm < end)]
-        if result is None:
-            result = o2
-        else:
-            result = pandas.concat([result, o2])
-        ct = ct + datetime.timedelta(hours=1)
-    return result
-
-
-def load_observations_fortime(v_time, version="3"):
-    result = None
+def load_observations(
+    start, end, version="3", workers=None, columns=None, where=None, compact=False
+):
+    return _load_observations_period(
+        functools.partial(load_observations_1file, version=version),
+        start,
+        end,
+        workers=workers,
+        columns=columns,
+        where=where,
+        compact=compact,
+    )
+
+
+# Observation files for each of the times (None if not there)
+def _year_file_names(times, version="3"):
+    return [
+        _observations_file_name(
+            dtime.year, dtime.month, dtime.day, dtime.hour, version=version
+        )
+        for dtime in times
+    ]
+
+
+def _observations_index_file(year, version="3"):
+    return "%s/observations/%04d.spatial_index.npz" % (_get_data_dir(version), year)
+
+
+# Spatial index of a year's observations (made if necessary)
+def _observations_index(year, version="3"):
+    times = _year_times(year)
+    return _get_observations_index(
+        functools.partial(load_observations_1file, version=version),
+        times,
+        _year_file_names(times, version=version),
+        _observations_index_file(year, version=version),
+    )
+
+
+def load_observations_in_box(year, lat_min, lat_max, lon_min, lon_max, version="3"):
+    index = _observations_index(year, version=version)
+    return _index_records(
+        functools.partial(load_observations_1file, version=version),
+        index,
+        _index_box(index, lat_min, lat_max, lon_min, lon_max),
+    )
+
+
+def load_observations_near(year, latitude, longitude, radius, version="3"):
+    index = _observations_index(year, version=version)
+    (positions, distances) = _index_radius(index, latitude, longitude, radius)
+    return _index_records(
+        functools.partial(load_observations_1file, version=version),
+        index,
+        positions,
+        distances,
+    )
+
+
+def load_observations_nearest(year, latitude, longitude, count, version="3"):
+    index = _observations_index(year, version=version)
+    (positions, distances) = _index_nearest(index, latitude, longitude, count)
+    return _index_records(
+        functools.partial(load_observations_1file, version=version),
+        index,
+        positions,
+        distances,
+    )
+
+
+def _platform_index_file(year, version="3"):
+    return "%s/observations/%04d.platform_index.npz" % (_get_data_dir(version), year)
+
+
+# Platform index of a year's observations (made if necessary)
+def _platform_index(year, version="3", workers=None):
+    times = _year_times(year)
+    return _get_observations_index(
+        functools.partial(load_observations_1file, version=version),
+        times,
+        _year_file_names(times, version=version),
+        _platform_index_file(year, version=version),
+        build=functools.partial(_build_platform_index, workers=workers),
+    )
+
+
+def load_platform(id, start, end, version="3", workers=None):
+    return _load_platform(
+        functools.partial(load_observations_1file, version=version),
+        functools.partial(_platform_index, version=version, workers=workers),
+        id,
+        start,
+        end,
+    )
+
+
+def _coverage_file(year, resolution, version="3"):
+    return "%s/observations/%04d.coverage_%g.npz" % (
+        _get_data_dir(version),
+        year,
+        resolution,
+    )
+
+
+def load_observations_coverage(year, resolution=2.0, version="3", workers=None):
+    times = _year_times(year)
+    return _coverage_cube(
+        _get_observations_index(
+            functools.partial(load_observations_1file, version=version),
+            times,
+            _year_file_names(times, version=version),
+            _coverage_file(year, resolution, version=version),
+            build=functools.partial(
+                _build_coverage, resolution=resolution, workers=workers
+            ),
+            compress=True,
+        )
+    )
+
+
+# Files (assimilation times) with observations contributing to the
+#  fields at a time, and their weights - the same as the interpolation
+#  weights of the fields.
+def _fortime_files(v_time):
+    hour = v_time.replace(minute=0, second=0, microsecond=0)
     if v_time.hour % 6 == 0:
-        result = load_observations_1file(v_time, version=version)
-        result["weight"] = numpy.repeat(1, len(result.index))
-        return result
+        return [(hour, 1)]
+    prev_time = hour - datetime.timedelta(hours=v_time.hour % 6)
     if v_time.hour % 6 <= 3:
-        prev_time = v_time - datetime.timedelta(hours=v_time.hour % 6)
-        prev_weight = 1.0
-        result = load_observations_1file(prev_time, version=version)
-        result["weight"] = numpy.repeat(prev_weight, len(result.index))
-        return result
-    prev_time = v_time - datetime.timedelta(hours=v_time.hour % 6)
+        return [(prev_time, 1.0)]
     prev_weight = (3 - v_time.hour % 3) / 3.0
-    result = load_observations_1file(prev_time, version=version)
-    result["weight"] = numpy.repeat(prev_weight, len(result.index))
     next_time = prev_time + datetime.timedelta(hours=6)
-    next_weight = 1 - prev_weight
-    result2 = load_observations_1file(next_time, version=version)
-    result2["weight"] = numpy.repeat(next_weight, len(result2.index))
-    result = pandas.concat([result, result2])
-    return result
+    return [(prev_time, prev_weight), (next_time, 1 - prev_weight)]
+
+
+def load_observations_fortime(
+    v_time, version="3", columns=None, where=None, compact=False
+):
+    return _load_observations_fortime(
+        functools.partial(
+            load_observations_1file,
+            version=version,
+            columns=columns,
+            where=where,
+            compact=compact,
+        ),
+        _fortime_files(v_time),
+    )
+
+
+def observations_stream(
+    version="3", columns=None, where=None, compact=False, prefetch=True
+):
+    return _ObservationsStream(
+        functools.partial(
+            load_observations_1file,
+            version=version,
+            columns=columns,
+            where=where,
+            compact=compact,
+        ),
+        _fortime_files,
+        prefetch=prefetch,
+    )
@@ -0,0 +1,100 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+
+# Repack the v3-final one-file-per-member data into one file
+#  with all the members, so loading the whole ensemble at a
+#  timestep needs one file open, not 80.
+
+import os
+import os.path
+import iris
+import iris.time
+import warnings
+import dask.array as da
+
+from .utils import _get_data_file_name
+from .utils import _get_packed_file_name
+from .utils import _is_data_file
+from .load import _ensemble_cube
+from .load import _load_data_cube
+from .tar_index import _get_tar_member
+
+
+def _get_member_cube(variable, year, month, version="3", member=1):
+    """All the (lazy) data for one member, for the year or month"""
+    file_name = _get_data_file_name(
+        variable, year, month, version=version, member=member
+    )
+    if not _is_data_file(file_name) and (
+        _get_tar_member(file_name, variable, year, version=version) is None
+    ):
+        raise Exception("No data file %s - fetch it first" % file_name)
+    constraint = None
+    if month is not None:
+        constraint = iris.Constraint(
+            time=iris.time.PartialDateTime(year=year, month=month)
+        )
+    with warnings.catch_warnings():  # Iris is v.fussy
+        warnings.simplefilter("ignore")
+        return _load_data_cube(file_name, constraint, variable, year, version=version)
+
+
+def repack(variable, year, month=None, version="3", members=range(1, 81)):
+    """Combine the separate member files for a year (or month) into one file.
+
+    The new file has all the members, compressed, and chunked so each
+    timestep of the whole ensemble is one chunk. :func:`load` will use it,
+    in preference to the member files, whenever it is there. The member
+    files are not changed.
+
+    Args:
+        variable (:obj:`str`): Variable to repack (e.g. 'PRMSL').
+        year (:obj:`int`): Year to repack.
+        month (:obj:`int`): Month to repack. Defaults to None - repack the whole year.
+        version (:obj:`str`): Reanalysis version. Defaults to '3'.
+        members (:obj:`list`): Members to include. Defaults to all 80.
+
+    Returns:
+        :obj:`str`: Name of the file made.
+
+    Raises:
+        StandardError: Member data not on disc.
+
+    |
+    """
+    file_name = _get_packed_file_name(variable, year, month, version=version)
+    members = list(members)
+    cubes = [
+        _get_member_cube(variable, year, month, version=version, member=member)
+        for member in members
+    ]
+    data = da.stack([da.asarray(cube.core_data()) for cube in cubes])
+    # Each chunk is one timestep (time is the first dimension of the
+    #  member data), for all the members
+    chunks = (len(members), 1) + cubes[0].shape[1:]
+    data = data.rechunk(chunks)
+    ensemble = _ensemble_cube(cubes[0], members, data)
+    # Not there if the member files are still in the tar
+    if not os.path.isdir(os.path.dirname(file_name)):
+        os.makedirs(os.path.dirname(file_name))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        iris.save(
+            ensemble,
+            "%s.part" % file_name,
+            saver="nc",
+            zlib=True,
+            chunksizes=chunks,
+        )
+    os.rename("%s.part" % file_name, file_name)
+    return file_name
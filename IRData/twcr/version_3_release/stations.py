@@ -0,0 +1,334 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+
+# Extract time-series at station locations from the v3-final member files.
+#
+# Reads the member files directly (netCDF4, not iris), and reads only
+#  the grid cells needed to interpolate to the stations - one latitude
+#  row at a time, all the times in the file at once. So no global field
+#  is ever read, and each file is only opened once.
+
+import os
+import os.path
+import functools
+import concurrent.futures
+import numpy as np
+import netCDF4
+
+from .utils import _get_data_file_name
+from .utils import _get_monthly_data_file_name
+from .utils import _is_data_file
+from .tar_index import _get_tar_member
+from .tar_index import _open_tar_member
+
+# Times in the output file
+time_units = "hours since 1800-01-01 00:00:0.0"
+time_calendar = "standard"
+
+
+def _open_data_file(file_name, variable, year, version="3"):
+    """Open a data file as a netCDF4 Dataset - extracted, or from the tar.
+    None if it's not there."""
+    if _is_data_file(file_name):
+        return netCDF4.Dataset(file_name)
+    tar_member = _get_tar_member(file_name, variable, year, version=version)
+    if tar_member is not None:
+        return _open_tar_member(tar_member)
+    return None
+
+
+def _get_year_file_names(variable, year, member, version="3"):
+    """The data files with a year's data for one member - the annual
+    file if there is one, otherwise the monthly files."""
+    annual = _get_data_file_name(variable, year, version=version, member=member)
+    if _is_data_file(annual) or (
+        _get_tar_member(annual, variable, year, version=version) is not None
+    ):
+        return [annual]
+    monthly = [
+        _get_monthly_data_file_name(
+            variable, year, month, version=version, member=member
+        )
+        for month in range(1, 13)
+    ]
+    monthly = [name for name in monthly if _is_data_file(name)]
+    if len(monthly) == 0:
+        raise Exception(
+            "No %s data for %04d member %d - fetch it first" % (variable, year, member)
+        )
+    return monthly
+
+
+def _get_grid_variable(dataset, names):
+    for name in names:
+        if name in dataset.variables:
+            return dataset.variables[name]
+    for var in dataset.variables.values():
+        if getattr(var, "standard_name", None) == names[-1]:
+            return var
+    raise Exception("No %s in data file" % names[-1])
+
+
+def _get_data_variable(dataset):
+    """The field variable - the one with time, latitude, and longitude."""
+    for var in dataset.variables.values():
+        if len(var.dimensions) >= 3 and var.dimensions[0] == "time":
+            return var
+    raise Exception("No (time,latitude,longitude) variable in data file")
+
+
+def _bilinear_weights(latitudes, longitudes, grid_latitudes, grid_longitudes):
+    """Indices of the 4 surrounding grid points for each station, and
+    their interpolation weights. Longitude is cyclic; latitudes beyond
+    the outermost grid rows take the value of the outermost row.
+
+    Returns (rows, columns, weights) - each (n_stations, 4)."""
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    grid_latitudes = np.asarray(grid_latitudes, dtype=np.float64)
+    grid_longitudes = np.asarray(grid_longitudes, dtype=np.float64)
+    # Fractional row - grid latitudes can run either way
+    n_lat = len(grid_latitudes)
+    if grid_latitudes[0] > grid_latitudes[-1]:
+        y = (n_lat - 1) - np.interp(
+            latitudes, grid_latitudes[::-1], np.arange(n_lat, dtype=np.float64)
+        )
+    else:
+        y = np.interp(latitudes, grid_latitudes, np.arange(n_lat, dtype=np.float64))
+    row_0 = np.minimum(np.floor(y).astype(int), n_lat - 2)
+    w_y = y - row_0
+    # Fractional column - on a regular cyclic grid
+    n_lon = len(grid_longitudes)
+    d_lon = 360.0 / n_lon
+    x = ((longitudes - grid_longitudes[0]) % 360.0) / d_lon
+    column_0 = np.floor(x).astype(int) % n_lon
+    w_x = x - np.floor(x)
+    column_1 = (column_0 + 1) % n_lon
+    rows = np.stack([row_0, row_0, row_0 + 1, row_0 + 1], axis=1)
+    columns = np.stack([column_0, column_1, column_0, column_1], axis=1)
+    weights = np.stack(
+        [(1 - w_y) * (1 - w_x), (1 - w_y) * w_x, w_y * (1 - w_x), w_y * w_x], axis=1
+    )
+    return (rows, columns, weights)
+
+
+def _get_station_weights(variable, year, member, latitudes, longitudes, version="3"):
+    """Bilinear weights for the stations, on the grid of the data files."""
+    file_name = _get_year_file_names(variable, year, member, version=version)[0]
+    dataset = _open_data_file(file_name, variable, year, version=version)
+    try:
+        grid_latitudes = _get_grid_variable(dataset, ("lat", "latitude"))[:]
+        grid_longitudes = _get_grid_variable(dataset, ("lon", "longitude"))[:]
+    finally:
+        dataset.close()
+    return _bilinear_weights(latitudes, longitudes, grid_latitudes, grid_longitudes)
+
+
+def _read_stations(dataset, rows, columns, weights):
+    """Interpolated values at the stations, for all the times in a file.
+
+    Returns (times (as datetimes), values (n_times, n_stations))."""
+    var = _get_data_variable(dataset)
+    time_var = dataset.variables["time"]
+    times = netCDF4.num2date(
+        time_var[:],
+        time_var.units,
+        calendar=getattr(time_var, "calendar", "standard"),
+        only_use_cftime_datetimes=False,
+    )
+    # Any dimensions between time and latitude (height) are length 1
+    extra = (0,) * (len(var.dimensions) - 3)
+    # The grid cells we need: read each row once, just the columns needed
+    cells = np.stack([rows.ravel(), columns.ravel()], axis=1)
+    (unique_cells, cell_index) = np.unique(cells, axis=0, return_inverse=True)
+    cell_values = np.ma.empty((len(times), len(unique_cells)), dtype=np.float64)
+    for row in np.unique(unique_cells[:, 0]):
+        in_row = np.where(unique_cells[:, 0] == row)[0]
+        cell_values[:, in_row] = var[
+            (slice(None),) + extra + (row, unique_cells[in_row, 1])
+        ]
+    corners = cell_values[:, cell_index.ravel()].reshape((len(times),) + rows.shape)
+    # Missing if any of the surrounding points are
+    values = np.ma.masked_array(
+        (np.ma.filled(corners, 0.0) * weights[np.newaxis, :, :]).sum(axis=2),
+        mask=np.ma.getmaskarray(corners).any(axis=2),
+    )
+    return (times, values)
+
+
+def _extract_year(
+    variable, year, rows, columns, weights, members, output_file, version="3"
+):
+    """Station values for a year, all members, written to a part file.
+    Run in a worker process.
+
+    Returns the name of the file."""
+    values = None
+    for (member_index, member) in enumerate(members):
+        m_times = []
+        m_values = []
+        for file_name in _get_year_file_names(variable, year, member, version=version):
+            dataset = _open_data_file(file_name, variable, year, version=version)
+            try:
+                (times, file_values) = _read_stations(dataset, rows, columns, weights)
+            finally:
+                dataset.close()
+            m_times.extend(times)
+            m_values.append(file_values)
+        m_values = np.ma.concatenate(m_values)
+        if values is None:
+            year_times = m_times
+            values = np.ma.masked_all(
+                (rows.shape[0], len(members), len(year_times)), dtype=np.float32
+            )
+        elif m_times != year_times:
+            raise Exception(
+                "Member %d has different times in %04d from member %d"
+                % (member, year, members[0])
+            )
+        values[:, member_index, :] = m_values.T
+    part_file = "%s.%04d.part" % (output_file, year)
+    with netCDF4.Dataset(part_file, "w") as nc:
+        nc.createDimension("station", values.shape[0])
+        nc.createDimension("member", values.shape[1])
+        nc.createDimension("time", values.shape[2])
+        nc.createVariable("time", "f8", ("time",))[:] = netCDF4.date2num(
+            year_times, time_units, calendar=time_calendar
+        )
+        nc.createVariable(
+            variable, "f4", ("station", "member", "time"), fill_value=1.0e20
+        )[:] = values
+    return part_file
+
+
+def _create_station_file(
+    output_file, variable, latitudes, longitudes, members, attributes
+):
+    """The output file, with the station and member metadata, ready
+    for the times to be added."""
+    with netCDF4.Dataset(output_file, "w") as nc:
+        nc.setncatts(attributes)
+        nc.createDimension("station", len(latitudes))
+        nc.createDimension("member", len(members))
+        nc.createDimension("time", None)
+        var = nc.createVariable("latitude", "f4", ("station",))
+        var.setncatts({"standard_name": "latitude", "units": "degrees_north"})
+        var[:] = latitudes
+        var = nc.createVariable("longitude", "f4", ("station",))
+        var.setncatts({"standard_name": "longitude", "units": "degrees_east"})
+        var[:] = longitudes
+        var = nc.createVariable("member", "i4", ("member",))
+        var.setncatts({"long_name": "member"})
+        var[:] = members
+        var = nc.createVariable("time", "f8", ("time",))
+        var.setncatts(
+            {"standard_name": "time", "units": time_units, "calendar": time_calendar}
+        )
+        var = nc.createVariable(
+            variable,
+            "f4",
+            ("station", "member", "time"),
+            fill_value=1.0e20,
+            zlib=True,
+            chunksizes=(len(latitudes), len(members), 8),
+        )
+        var.setncatts({"coordinates": "latitude longitude"})
+
+
+def _append_year(output_file, variable, part_file):
+    with netCDF4.Dataset(part_file) as part, netCDF4.Dataset(output_file, "a") as nc:
+        start = len(nc.dimensions["time"])
+        end = start + len(part.dimensions["time"])
+        nc.variables["time"][start:end] = part.variables["time"][:]
+        nc.variables[variable][:, :, start:end] = part.variables[variable][:]
+    os.remove(part_file)
+
+
+def extract_stations(
+    variable,
+    latitudes,
+    longitudes,
+    years,
+    output_file,
+    members=range(1, 81),
+    version="3",
+    workers=None,
+):
+    """Extract time-series at a set of station locations, for all members, for many years.
+
+    The values at each station are bilinearly interpolated from the
+    surrounding grid points. Only those grid points are read from the
+    data files - global fields are never read - so this is much faster,
+    and needs much less memory, than loading each field with
+    :func:`load`. Years are processed in parallel.
+
+    The data must have been fetched already (annual or monthly member
+    files, or the annual tar files).
+
+    Args:
+        variable (:obj:`str`): Variable to extract (e.g. 'PRMSL').
+        latitudes (:obj:`list`): Station latitudes.
+        longitudes (:obj:`list`): Station longitudes.
+        years (:obj:`list`): Years to extract.
+        output_file (:obj:`str`): netCDF file to make, with the data as a (station, member, time) array.
+        members (:obj:`list`): Members to extract. Defaults to all 80.
+        version (:obj:`str`): Reanalysis version. Defaults to '3'.
+        workers (:obj:`int`): Number of years to process at once. Defaults to None - one for each CPU.
+
+    Returns:
+        :obj:`str`: The name of the output file.
+
+    Raises:
+        StandardError: Data not on disc.
+
+    |
+    """
+    years = sorted(years)
+    members = list(members)
+    (rows, columns, weights) = _get_station_weights(
+        variable, years[0], members[0], latitudes, longitudes, version=version
+    )
+    get_year = functools.partial(
+        _extract_year,
+        variable,
+        rows=rows,
+        columns=columns,
+        weights=weights,
+        members=members,
+        output_file=output_file,
+        version=version,
+    )
+    if os.path.dirname(output_file) != "" and not os.path.isdir(
+        os.path.dirname(output_file)
+    ):
+        os.makedirs(os.path.dirname(output_file))
+    _create_station_file(
+        "%s.part" % output_file,
+        variable,
+        latitudes,
+        longitudes,
+        members,
+        {"source": "20CR version %s" % version, "interpolation": "bilinear"},
+    )
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 2 or len(years) < 2:
+        for year in years:
+            _append_year("%s.part" % output_file, variable, get_year(year))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            # Results in year order, appended as they come
+            for part_file in executor.map(get_year, years):
+                _append_year("%s.part" % output_file, variable, part_file)
+    os.rename("%s.part" % output_file, output_file)
+    return output_file
@@ -0,0 +1,194 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+
+# Read the v3-final member files from inside the downloaded (annual)
+#  tar files, without extracting them.
+#
+# The tar files are not compressed, so each member file is a contiguous
+#  block of bytes in the tar. An index (file name -> offset and length)
+#  is made once for each tar, and kept beside it. The tar is then
+#  memory-mapped, and netCDF opens each member file straight from
+#  its part of the map.
+
+import os
+import os.path
+import json
+import mmap
+import tarfile
+import functools
+import warnings
+import numpy as np
+import netCDF4
+import iris
+import dask.array as da
+
+from .utils import _get_tar_file_name
+
+
+def _get_index_file_name(tar_file_name):
+    return "%s.index" % tar_file_name
+
+
+def _make_tar_index(tar_file_name):
+    """Make the index of a downloaded tar file - the offset and length
+    of each file in it, keyed by file name (without directories)."""
+    index = {}
+    with tarfile.open(tar_file_name, "r:") as tar:
+        for member in tar:
+            if member.isfile():
+                index[os.path.basename(member.name)] = (
+                    member.offset_data,
+                    member.size,
+                )
+    index_file_name = _get_index_file_name(tar_file_name)
+    with open("%s.part" % index_file_name, "w") as f:
+        json.dump(index, f)
+    os.rename("%s.part" % index_file_name, index_file_name)
+    return index
+
+
+# Index for a tar, (re)made if missing or older than the tar.
+#  (mtime is in the key, so a replaced tar gets a new index.)
+@functools.lru_cache(maxsize=32)
+def _cached_tar_index(tar_file_name, mtime):
+    index_file_name = _get_index_file_name(tar_file_name)
+    if not os.path.isfile(index_file_name) or os.path.getmtime(index_file_name) < mtime:
+        return _make_tar_index(tar_file_name)
+    with open(index_file_name, "r") as f:
+        return {name: tuple(location) for (name, location) in json.load(f).items()}
+
+
+# Whole tar file, memory-mapped (read-only) - one map for each tar,
+#  however many member files are read from it.
+@functools.lru_cache(maxsize=32)
+def _cached_tar_map(tar_file_name, mtime):
+    with open(tar_file_name, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _get_tar_member(file_name, variable, year, version="3"):
+    """Find a data file in the downloaded tar, if it's there.
+
+    Returns (tar file name, offset, length) or None."""
+    tar_file_name = _get_tar_file_name(variable, year, version=version)
+    if not os.path.isfile(tar_file_name):
+        return None
+    index = _cached_tar_index(tar_file_name, os.path.getmtime(tar_file_name))
+    location = index.get(os.path.basename(file_name))
+    if location is None:
+        return None
+    return (tar_file_name,) + location
+
+
+def _open_tar_member(tar_member):
+    """Open a data file inside a tar, as a (read-only) netCDF4 Dataset"""
+    (tar_file_name, offset, length) = tar_member
+    tar_map = _cached_tar_map(tar_file_name, os.path.getmtime(tar_file_name))
+    return netCDF4.Dataset(
+        "%s:%d" % (tar_file_name, offset),
+        memory=memoryview(tar_map)[offset : offset + length],
+    )
+
+
+def _copy_time_slice(source, time_index):
+    """In-memory copy of a netCDF4 Dataset, with only one time."""
+    source.set_auto_maskandscale(False)
+    target = netCDF4.Dataset("time_slice", "w", diskless=True, persist=False)
+    target.setncatts({a: source.getncattr(a) for a in source.ncattrs()})
+    for (name, dim) in source.dimensions.items():
+        target.createDimension(name, 1 if name == "time" else len(dim))
+    for (name, var) in source.variables.items():
+        attributes = {a: var.getncattr(a) for a in var.ncattrs()}
+        fill_value = attributes.pop("_FillValue", None)
+        copy = target.createVariable(
+            name, var.dtype, var.dimensions, fill_value=fill_value
+        )
+        copy.setncatts(attributes)
+        key = tuple(
+            slice(time_index, time_index + 1) if dim == "time" else slice(None)
+            for dim in var.dimensions
+        )
+        copy[...] = var[key]
+    return target
+
+
+# Array-like view of a data variable in a file inside a tar - reads
+#  only what's asked for, when it's asked for, so it can be the
+#  source of a lazy (dask) array.
+class _TarMemberData:
+    def __init__(self, tar_member, var_name, shape, dtype):
+        self.tar_member = tar_member
+        self.var_name = var_name
+        self.shape = shape
+        self.dtype = dtype
+        self.ndim = len(shape)
+
+    def __getitem__(self, keys):
+        source = _open_tar_member(self.tar_member)
+        try:
+            return np.ma.asarray(source.variables[self.var_name][keys]).astype(
+                self.dtype
+            )
+        finally:
+            source.close()
+
+
+def _load_tar_member_cube(tar_member, constraint=None):
+    """Load a cube (with lazy data) from a data file in a tar.
+
+    The same as iris.load_cube on the extracted file would give. Iris
+    reads all the data when loading from an open Dataset, so get the
+    metadata from a single-time copy, and read the data on demand."""
+    source = _open_tar_member(tar_member)
+    try:
+        time_slice = _copy_time_slice(source, 0)
+        try:
+            with warnings.catch_warnings():  # Iris is v.fussy
+                warnings.simplefilter("ignore")
+                template = iris.load_cube(time_slice)
+                # Loading from a Dataset reads the data, so do that now.
+                template.data
+        finally:
+            time_slice.close()
+        var = source.variables[template.var_name]
+        time_var = source.variables["time"]
+        time_points = time_var[:]
+        time_bounds = None
+        if "bounds" in time_var.ncattrs():
+            time_bounds = source.variables[time_var.getncattr("bounds")][:]
+        shape = var.shape
+    finally:
+        source.close()
+    data = da.from_array(
+        _TarMemberData(tar_member, template.var_name, shape, template.dtype),
+        chunks=(1,) + shape[1:],
+        meta=np.ma.array([], dtype=template.dtype),
+        asarray=False,
+    )
+    cube = iris.cube.Cube(data)
+    cube.metadata = template.metadata
+    for coord in template.dim_coords:
+        if coord.name() == "time":
+            coord = coord.copy(points=time_points, bounds=time_bounds)
+        else:
+            coord = coord.copy()
+        cube.add_dim_coord(coord, template.coord_dims(coord.name()))
+    for coord in template.aux_coords:
+        cube.add_aux_coord(coord.copy(), template.coord_dims(coord))
+    if constraint is not None:
+        cube = cube.extract(constraint)
+        if cube is None:
+            raise iris.exceptions.ConstraintMismatchError(
+                "No data in %s:%d matches the constraint" % tar_member[:2]
+            )
+    return cube
@@ -14,6 +14,10 @@
 # Utility functions for version 3-final
 
 import os
+import functools
+import contextlib
+import time
+
 
 def _get_data_dir(version="3"):
     """Return the root directory containing 20CR netCDF files"""
@@ -21,6 +25,76 @@ def _get_data_dir(version="3"):
     return g
 
 
+# Listing of a data directory. Looking a name up in this is much
+#  cheaper than asking the file system about each file - on a
+#  parallel file system, that's a round-trip to the metadata server
+#  for every member, at every timestep. The directory mtime is in
+#  the key, so adding or removing a file gets a new listing.
+@functools.lru_cache(maxsize=64)
+def _cached_dir_listing(dir_name, mtime):
+    return frozenset(os.listdir(dir_name))
+
+
+# Directory listings already got, inside a _dir_snapshot
+_dir_listings = None
+
+
+@contextlib.contextmanager
+def _dir_snapshot():
+    """Inside this, check each data directory for changes only once -
+    so a whole load costs one stat for each directory, not several
+    for each file."""
+    global _dir_listings
+    if _dir_listings is not None:  # Already inside one
+        yield
+        return
+    _dir_listings = {}
+    try:
+        yield
+    finally:
+        _dir_listings = None
+
+
+def _get_dir_listing(dir_name):
+    """Return the names of the files in a directory (empty if there
+    is no such directory)."""
+    dir_name = os.path.normpath(dir_name)
+    if _dir_listings is not None and dir_name in _dir_listings:
+        return _dir_listings[dir_name]
+    try:
+        mtime = os.stat(dir_name).st_mtime_ns
+    except FileNotFoundError:
+        listing = frozenset()
+    else:
+        if time.time_ns() - mtime < 2e9:
+            # Changed very recently - might change again without a new
+            #  mtime (some file systems only keep whole seconds).
+            listing = frozenset(os.listdir(dir_name))
+        else:
+            listing = _cached_dir_listing(dir_name, mtime)
+    if _dir_listings is not None:
+        _dir_listings[dir_name] = listing
+    return listing
+
+
+def _is_data_file(file_name):
+    """Is there a file with this name? (Using the directory listing)"""
+    return os.path.basename(file_name) in _get_dir_listing(os.path.dirname(file_name))
+
+
+def _get_monthly_data_file_name(variable, year, month, version="3", member=1):
+    """Return the name of the monthly file for the requested
+    variable, month, and member (whether or not it exists)."""
+    return "%s/%04d/%s.%04d%02d_mem%03d.nc" % (
+        _get_data_dir(version=version),
+        year,
+        variable,
+        year,
+        month,
+        member,
+    )
+
+
 def _get_data_file_name(variable, year, month=None, version="3", member=1):
     """Return the name of the file containing data for the
     requested variable, at the specified time, from the
@@ -28,20 +102,55 @@ def _get_data_file_name(variable, year, month=None, version="3", member=1):
     base_dir = _get_data_dir(version=version)
     # If monthly file exists, use that, otherwise, annual file
     if month is not None:
-        name = "%s/%04d/%s.%04d%02d_mem%03d.nc" % (
+        name = _get_monthly_data_file_name(
+            variable, year, month, version=version, member=member
+        )
+    if month is None or not _is_data_file(name):
+        name = "%s/%04d/%s.%04d_mem%03d.nc" % (
             base_dir,
             year,
             variable,
             year,
-            month,
             member,
         )
-    if month is None or not os.path.isfile(name):
-        name = "%s/%04d/%s.%04d_mem%03d.nc" % (
+    return name
+
+
+def _get_tar_file_name(variable, year, version="3"):
+    """Return the name of the tar file, as downloaded, containing all the
+    member files for the requested variable and year."""
+    return "%s/%s_%04d.tar" % (_get_data_dir(version=version), variable, year)
+
+
+def _get_packed_file_name(variable, year, month=None, version="3"):
+    """Return the name of the file containing data for all the members,
+    for the requested variable and year (or month), as made by
+    :func:`repack`."""
+    base_dir = _get_data_dir(version=version)
+    if month is not None:
+        return "%s/%04d/%s.%04d%02d_ensemble.nc" % (
             base_dir,
             year,
             variable,
             year,
-            member,
+            month,
         )
-    return name
+    return "%s/%04d/%s.%04d_ensemble.nc" % (
+        base_dir,
+        year,
+        variable,
+        year,
+    )
+
+
+def _get_available_packed_file_name(variable, year, month, version="3"):
+    """Return the name of the packed (all members) file containing
+    data for the requested variable and month - monthly if there is
+    one, otherwise annual. None if there is no packed file."""
+    for name in (
+        _get_packed_file_name(variable, year, month, version=version),
+        _get_packed_file_name(variable, year, version=version),
+    ):
+        if _is_data_file(name):
+            return name
+    return None
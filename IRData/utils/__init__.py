@@ -17,3 +17,4 @@ This is the 'miscellaneous' section - a collection of useful functions that don'
 """
 
 from .cube_operations import *
+from .departures import *
@@ -0,0 +1,277 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+
+# Single-pass climatology (mean and standard deviation) calculation,
+#  shared by the datasets that have normals and standard deviations.
+#
+# Statistics are kept as (count, mean, M2) where M2 is the sum of
+#  squared differences from the mean (Welford), and partial
+#  statistics (from different groups of years) are combined with the
+#  pairwise update of Chan et al. So only one field, and one set of
+#  statistics, need be in memory at a time.
+
+import os
+import datetime
+import calendar
+import functools
+import concurrent.futures
+import numpy as np
+import dask
+import dask.array as da
+import netCDF4
+import iris
+
+# Climatologies are labelled with dates in this (non-leap) year
+climatology_year = 1981
+
+# Missing data value in the output files
+fill_value = 1.0e20
+
+
+# Lazy cube with all the data in a file. Each worker process only
+#  needs to read the metadata for each file once, however many
+#  fields it then reads from it. (mtime is in the key, so a
+#  file replaced on disc gets re-read.)
+@functools.lru_cache(maxsize=32)
+def _cached_file_cube(file_name, mtime):
+    return iris.load_cube(file_name)
+
+
+# One field, from a cube with a time dimension, reading only that field
+def _field_at_time(cube, dtime):
+    tc = cube.coord("time")
+    offset = np.abs(tc.points - tc.units.date2num(dtime))
+    index = np.argmin(offset)
+    if offset[index] > 1.0e-6:
+        raise Exception("No data for %s" % dtime.strftime("%Y-%m-%d:%H"))
+    return cube[index]
+
+
+# Statistics for a set of samples (first dimension)
+def _sample_stats(samples):
+    count = samples.shape[0]
+    mean = np.mean(samples, axis=0)
+    m2 = np.sum((samples - mean) ** 2, axis=0)
+    return (count, mean, m2)
+
+
+# Combine two sets of statistics
+def _merge_stats(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    (n_a, mean_a, m2_a) = a
+    (n_b, mean_b, m2_b) = b
+    count = n_a + n_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (n_b / count)
+    m2 = m2_a + m2_b + delta**2 * (n_a * n_b / count)
+    return (count, mean, m2)
+
+
+# Field data as float64 samples, with any ensemble members as
+#  separate samples, and any masked points as NaN.
+def _field_samples(field):
+    data = np.ma.filled(np.ma.asarray(field.data, dtype=np.float64), np.nan)
+    return data.reshape((-1,) + data.shape[-2:])
+
+
+# A single-timestep field, with no ensemble dimension, to be
+#  the template for the output.
+def _field_template(field):
+    while field.ndim > 2:
+        field = field[0]
+    field = field.copy(data=np.zeros(field.shape, dtype=np.float32))
+    for coord in field.coords(dimensions=()):
+        if coord.name() != "time":
+            field.remove_coord(coord)
+    return field
+
+
+# Accumulate the statistics for one slot (day and hour of the month),
+#  over a group of years. Run in a worker process.
+def _slot_stats(get_field, get_kwargs, month, day, hour, years):
+    stats = None
+    template = None
+    # The process is the unit of parallelism - and dask's thread
+    #  pool does not survive being forked into a worker process.
+    with dask.config.set(scheduler="synchronous"):
+        for year in years:
+            field = get_field(year=year, month=month, day=day, hour=hour, **get_kwargs)
+            if template is None:
+                template = _field_template(field)
+            stats = _merge_stats(stats, _sample_stats(_field_samples(field)))
+    return (stats, template)
+
+
+# Split years into (at most) n contiguous groups
+def _year_groups(years, n):
+    n = max(1, min(n, len(years)))
+    return [g.tolist() for g in np.array_split(np.array(years), n)]
+
+
+# The day and hour slots in a month
+def _month_slots(month, hours):
+    # Non-leap year, so no 29th February
+    n_days = calendar.monthrange(climatology_year, month)[1]
+    return [(day, hour) for day in range(1, n_days + 1) for hour in hours]
+
+
+# Existing statistics for one slot, recovered from the normal and
+#  standard deviation files
+def _existing_slot_stats(normal, sd, n_samples, month, day, hour):
+    dtime = datetime.datetime(climatology_year, month, day, hour)
+    mean = _field_samples(_field_at_time(normal, dtime))[0]
+    sdv = _field_samples(_field_at_time(sd, dtime))[0]
+    return (n_samples, mean, sdv**2 * n_samples)
+
+
+# Make an output file with all the metadata, and space for a field
+#  for each slot. The fields are filled in one at a time by _write_slot.
+def _create_output_file(template, month, slots, attributes, file_name):
+    tc = template.coord("time")
+    time = iris.coords.DimCoord(
+        [
+            tc.units.date2num(datetime.datetime(climatology_year, month, day, hour))
+            for (day, hour) in slots
+        ],
+        standard_name="time",
+        units=tc.units,
+    )
+    cube = iris.cube.Cube(
+        da.zeros(
+            (len(slots),) + template.shape,
+            dtype=np.float32,
+            chunks=(1,) + template.shape,
+        )
+    )
+    cube.metadata = template.metadata
+    cube.attributes.update(attributes)
+    cube.add_dim_coord(time, 0)
+    for coord in template.dim_coords:
+        cube.add_dim_coord(coord.copy(), template.coord_dims(coord)[0] + 1)
+    iris.save(cube, file_name, saver="nc", fill_value=fill_value)
+
+
+# Put the field for one slot into an output file
+def _write_slot(file_name, index, data):
+    with netCDF4.Dataset(file_name, "a") as nc:
+        for var in nc.variables.values():
+            if len(var.dimensions) == 3:
+                var[index] = np.ma.masked_invalid(data.astype(np.float32))
+
+
+def _build_climatology(
+    get_field,
+    get_kwargs,
+    month,
+    hours,
+    years,
+    normal_file,
+    sd_file,
+    workers=None,
+):
+    """Make (or update) the normal and standard deviation files for one month.
+
+    get_field(year=,month=,day=,hour=,**get_kwargs) must be a module-level
+    function (so it can be run in a worker process) returning a cube with
+    the data for that time.
+
+    Returns the list of years added (empty if all the years were
+    already in the climatology)."""
+
+    # Which years are already in the climatology?
+    old_years = []
+    normal = None
+    if os.path.isfile(normal_file) and os.path.isfile(sd_file):
+        normal = iris.load_cube(normal_file)
+        sd = iris.load_cube(sd_file)
+        old_years = [int(y) for y in normal.attributes["years"].split()]
+        samples_per_year = int(normal.attributes["samples_per_year"])
+    new_years = sorted(set(years) - set(old_years))
+    if len(new_years) == 0:
+        return []
+    all_years = sorted(old_years + new_years)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    groups = _year_groups(new_years, workers)
+    executor = None
+    if workers > 1 and len(groups) > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+    for file_name in (normal_file, sd_file):
+        if not os.path.isdir(os.path.dirname(file_name)):
+            os.makedirs(os.path.dirname(file_name))
+    slots = _month_slots(month, hours)
+    try:
+        for (index, (day, hour)) in enumerate(slots):
+            if executor is None:
+                partials = [
+                    _slot_stats(get_field, get_kwargs, month, day, hour, group)
+                    for group in groups
+                ]
+            else:
+                partials = [
+                    f.result()
+                    for f in [
+                        executor.submit(
+                            _slot_stats, get_field, get_kwargs, month, day, hour, group
+                        )
+                        for group in groups
+                    ]
+                ]
+            stats = None
+            for partial in partials:
+                stats = _merge_stats(stats, partial[0])
+            n_new = stats[0] // len(new_years)
+            if normal is not None:
+                if n_new != samples_per_year:
+                    raise Exception(
+                        "Climatology has %d samples a year, new data has %d"
+                        % (samples_per_year, n_new)
+                    )
+                stats = _merge_stats(
+                    _existing_slot_stats(
+                        normal,
+                        sd,
+                        samples_per_year * len(old_years),
+                        month,
+                        day,
+                        hour,
+                    ),
+                    stats,
+                )
+            if index == 0:
+                attributes = {
+                    "years": " ".join("%04d" % y for y in all_years),
+                    "samples_per_year": n_new,
+                }
+                for file_name in (normal_file, sd_file):
+                    _create_output_file(
+                        partials[0][1],
+                        month,
+                        slots,
+                        attributes,
+                        "%s.part" % file_name,
+                    )
+            (count, mean, m2) = stats
+            _write_slot("%s.part" % normal_file, index, mean)
+            _write_slot("%s.part" % sd_file, index, np.sqrt(m2 / count))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    for file_name in (normal_file, sd_file):
+        os.rename("%s.part" % file_name, file_name)
+    return new_years
@@ -0,0 +1,153 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+
+# Compare observations with an ensemble of fields.
+#
+# The bilinear interpolation weights (four grid points and four
+#  weights per observation) are found for all the observations at
+#  once, and then every member is interpolated to every observation
+#  with one gather from the (member, grid point) array. Observations
+#  are done in blocks, so memory use doesn't grow with the number of
+#  observations.
+
+import numpy as np
+
+# Observations done at once
+_block_size = 16384
+
+
+# Position of each value between the points of a (monotonic)
+#  coordinate: index of the point below, and the fraction of the way
+#  to the next one. Clamped to the ends, or (circular) wrapped.
+def _coordinate_weights(points, values, circular=False):
+    points = np.asarray(points, dtype=np.float64)
+    if points[0] > points[-1]:
+        (index, fraction) = _coordinate_weights(points[::-1], values, circular)
+        # Same point pairs, counted from the other end
+        return (len(points) - 2 - index, 1.0 - fraction)
+    if circular:
+        values = points[0] + (values - points[0]) % 360.0
+        points = np.append(points, points[0] + 360.0)
+    index = np.clip(
+        np.searchsorted(points, values, side="right") - 1, 0, len(points) - 2
+    )
+    fraction = np.clip(
+        (values - points[index]) / (points[index + 1] - points[index]), 0.0, 1.0
+    )
+    return (index, fraction)
+
+
+def _bilinear_weights(latitude, longitude, latitudes, longitudes):
+    """Grid point indices (into the flattened lat x lon grid) and
+    weights for bilinear interpolation to each position - both (n,4)."""
+    (i_lat, f_lat) = _coordinate_weights(latitude.points, latitudes)
+    circular = getattr(longitude, "circular", False) or (
+        len(longitude.points) > 1
+        and abs(
+            (longitude.points[-1] - longitude.points[0])
+            + (longitude.points[1] - longitude.points[0])
+            - 360.0
+        )
+        < 1.0e-6
+    )
+    # Longitudes into the grid's range (-180 is 180)
+    longitudes = np.min(longitude.points) + (
+        (longitudes - np.min(longitude.points)) % 360.0
+    )
+    (i_lon, f_lon) = _coordinate_weights(longitude.points, longitudes, circular)
+    n_lon = len(longitude.points)
+    j_lon = (i_lon + 1) % n_lon
+    j_lat = i_lat + 1
+    indices = np.stack(
+        (
+            i_lat * n_lon + i_lon,
+            i_lat * n_lon + j_lon,
+            j_lat * n_lon + i_lon,
+            j_lat * n_lon + j_lon,
+        ),
+        axis=1,
+    )
+    weights = np.stack(
+        (
+            (1 - f_lat) * (1 - f_lon),
+            (1 - f_lat) * f_lon,
+            f_lat * (1 - f_lon),
+            f_lat * f_lon,
+        ),
+        axis=1,
+    )
+    return (indices, weights)
+
+
+# (member, grid point) array of the cube's data
+def _member_grid(cube):
+    latitude = cube.coord("latitude")
+    longitude = cube.coord("longitude")
+    (lat_dim,) = cube.coord_dims(latitude)
+    (lon_dim,) = cube.coord_dims(longitude)
+    data = np.ma.filled(cube.data.astype(np.float64), np.nan)
+    data = np.moveaxis(data, (lat_dim, lon_dim), (-2, -1))
+    return data.reshape((-1, len(latitude.points) * len(longitude.points)))
+
+
+def observation_departures(obs, cube, value="Observed", units=None):
+    """Compare observations with an ensemble of fields: the ensemble mean and spread at each observation, the observation-minus-ensemble-mean departure, and the rank of the observation in the ensemble.
+
+    Each member is bilinearly interpolated to each observation's position. This is done for all the observations and all the members at once (not by interpolating the cube for each observation), so it's fast even for hundreds of thousands of observations.
+
+    Args:
+        obs (:obj:`pandas.DataFrame`): Observations - as from :func:`IRData.twcr.load_observations_fortime` - with columns 'Latitude', 'Longitude', and the observed value.
+        cube (:obj:`iris.cube.Cube`): Ensemble of fields (e.g. from :func:`IRData.twcr.load`), with latitude and longitude dimensions. Any other dimension (normally 'member') is the ensemble.
+        value (:obj:`str`): Name of the observed value column. Defaults to 'Observed'.
+        units (:obj:`str`): Units of the observed values (e.g. 'hPa'). If given, the fields are converted to these units. Defaults to None - no conversion.
+
+    Returns:
+        :obj:`pandas.DataFrame`: The observations, with added columns 'mean' (ensemble mean at the observation), 'spread' (ensemble standard deviation), 'departure' (observation - mean), and 'rank' (number of members less than the observation - so numpy.bincount of the ranks is the rank histogram). These are NaN for observations with no position or value.
+
+    |
+    """
+    if units is not None:
+        cube = cube.copy()
+        cube.convert_units(units)
+    fields = _member_grid(cube)
+    latitudes = obs.Latitude.to_numpy(dtype=np.float64)
+    longitudes = obs.Longitude.to_numpy(dtype=np.float64)
+    values = obs[value].to_numpy(dtype=np.float64)
+    mean = np.full(len(values), np.nan)
+    spread = np.full(len(values), np.nan)
+    rank = np.full(len(values), np.nan)
+    good = np.flatnonzero(
+        np.isfinite(latitudes) & np.isfinite(longitudes) & np.isfinite(values)
+    )
+    for first in range(0, len(good), _block_size):
+        block = good[first : first + _block_size]
+        (indices, weights) = _bilinear_weights(
+            cube.coord("latitude"),
+            cube.coord("longitude"),
+            latitudes[block],
+            longitudes[block],
+        )
+        # (member, observation) - one corner at a time
+        members = fields[:, indices[:, 0]] * weights[:, 0]
+        for corner in (1, 2, 3):
+            members += fields[:, indices[:, corner]] * weights[:, corner]
+        mean[block] = members.mean(axis=0)
+        if members.shape[0] > 1:
+            spread[block] = members.std(axis=0, ddof=1)
+        rank[block] = (members < values[block]).sum(axis=0)
+    result = obs.copy()
+    result["mean"] = mean
+    result["spread"] = spread
+    result["departure"] = values - mean
+    result["rank"] = rank
+    return result
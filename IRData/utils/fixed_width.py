@@ -0,0 +1,500 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+
+# Fast reader for fixed-width text tables (the 20CR observation files).
+#
+# Does the job of pandas.read_fwf with per-column converters (str, int,
+#  or float) and a list of missing-value strings - but on the whole
+#  file at once: the file is read as bytes into a (line, character)
+#  array, each column is a slice of that, and the numbers are converted,
+#  and the missing values found, for a whole column in one go.
+#
+# Gives the same values as read_fwf, with the same missing values. One
+#  difference: where read_fwf's converter fails on a missing-value
+#  string (e.g. '***' in a float column), pandas leaves the column as
+#  objects - here numeric columns are always numeric (float64, or
+#  int64 for an int column with nothing missing).
+#
+# Anything this can't read exactly as read_fwf would (an empty file,
+#  an unexpected compression, a field the converter can't read) is
+#  passed to read_fwf instead.
+#
+# The parsed columns can be cached (as numpy .npy - typed columns,
+#  read back without any parsing) beside the text file. The cache is
+#  memory mapped, so if only some rows or columns are wanted (or only
+#  the rows that pass some conditions), only those are read from it,
+#  and only those are made into the DataFrame.
+
+import os
+import codecs
+import gzip
+import threading
+import numpy as np
+import pandas
+
+# pandas' default missing-value strings - also missing here
+_default_na_values = (
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+)
+
+# Stripped from each end of each field (as read_fwf does)
+_blank = b" \t\r\n"
+
+
+# File contents as bytes - None if it needs read_fwf's decompression
+def _read_bytes(file_name):
+    if file_name.endswith(".gz"):
+        with gzip.open(file_name, "rb") as f:
+            return f.read()
+    if file_name.endswith((".bz2", ".zip", ".xz", ".zst", ".tar")):
+        return None
+    with open(file_name, "rb") as f:
+        return f.read()
+
+
+# (line, character) array of the first 'width' characters of each line,
+#  padded with blanks
+def _character_grid(data, width):
+    if b"\r" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    if not data.endswith(b"\n"):
+        data = data + b"\n"
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buffer == ord("\n"))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    if lengths.min() == lengths.max():
+        # All the same length - just a reshape
+        grid = buffer.reshape((len(ends), lengths[0] + 1))
+        grid = grid[:, : min(width, lengths[0])]
+        if grid.shape[1] < width:
+            grid = np.pad(
+                grid, ((0, 0), (0, width - grid.shape[1])), constant_values=ord(" ")
+            )
+        return grid
+    position = np.arange(width)
+    index = np.minimum(starts[:, np.newaxis] + position, len(buffer) - 1)
+    return np.where(
+        position < lengths[:, np.newaxis], buffer[index], np.uint8(ord(" "))
+    )
+
+
+# One column (just the given rows, if rows is not None), as a 1-d
+#  array of stripped byte strings
+def _column(grid, start, end, rows=None):
+    if rows is None:
+        field = np.ascontiguousarray(grid[:, start:end])
+    else:
+        field = np.ascontiguousarray(grid[rows, start:end])
+    field = field.view("S%d" % (end - start)).ravel()
+    return np.char.strip(field, _blank)
+
+
+# All the strings pandas treats as missing: the given ones, the default
+#  ones, and, for whole numbers, both '9' and '9.0' forms
+def _na_strings(na_values, encoding):
+    result = set(_default_na_values)
+    for value in na_values:
+        result.add(value)
+        try:
+            number = float(value)
+            if number == int(number):
+                result.add("%d.0" % int(number))
+                result.add("%d" % int(number))
+        except (ValueError, OverflowError):
+            pass
+    return sorted(value.encode(encoding) for value in result)
+
+
+# Numeric versions of the missing-value strings (pandas also treats
+#  these as missing, after conversion)
+def _na_floats(na_values):
+    result = []
+    for value in na_values:
+        try:
+            result.append(float(value))
+        except ValueError:
+            pass
+    return np.array(result, dtype=np.float64)
+
+
+# Which of the values are in the list (a few comparisons of the whole
+#  column are much faster than np.isin for short lists)
+def _is_in(values, targets):
+    result = np.zeros(values.shape, dtype=bool)
+    for target in targets:
+        result |= values == target
+    return result
+
+
+# Bytes that can be part of a number (and the padding after a string)
+_numeric_bytes = np.zeros(256, dtype=bool)
+_numeric_bytes[list(b"0123456789.+-eE\0")] = True
+
+
+# Which of a numeric column's strings are missing-value strings. Only
+#  those that aren't numbers need checking - a missing value that is a
+#  number ('-99') is found after conversion.
+def _non_numeric_missing(strings, na_strings):
+    width = strings.dtype.itemsize
+    codes = strings.view(np.uint8).reshape((len(strings), width))
+    check = np.flatnonzero(~_numeric_bytes[codes].all(axis=1) | (strings == b""))
+    missing = np.zeros(strings.shape, dtype=bool)
+    missing[check] = _is_in(strings[check], na_strings)
+    return missing
+
+
+# Byte strings to (unicode) strings. Each ISO-8859-1 byte is the
+#  unicode code point, so that decoding is just a cast.
+def _decode(strings, encoding):
+    if codecs.lookup(encoding).name != "iso8859-1" or strings.size == 0:
+        return np.char.decode(strings, encoding)
+    width = strings.dtype.itemsize
+    codes = strings.view(np.uint8).reshape((len(strings), width))
+    return codes.astype(np.uint32).view("U%d" % width).ravel()
+
+
+def _convert_column(strings, converter, na_strings, na_floats, encoding):
+    na_strings = [value for value in na_strings if len(value) <= strings.dtype.itemsize]
+    if converter is str:
+        # Missing strings are '' until the DataFrame is made
+        values = _decode(strings, encoding)
+        values[_is_in(strings, na_strings)] = ""
+        return values
+    missing = _non_numeric_missing(strings, na_strings)
+    if converter is int:
+        values = np.where(missing, b"0", strings).astype(np.int64)
+        missing |= _is_in(values, na_floats)
+        if not missing.any():
+            return values
+        values = values.astype(np.float64)
+    elif converter is float:
+        values = np.where(missing, b"nan", strings).astype(np.float64)
+        missing |= _is_in(values, na_floats)
+    else:
+        raise ValueError("Unsupported converter %s" % converter)
+    values[missing] = np.nan
+    return values
+
+
+# Which rows pass all the conditions in where - a dict of column name
+#  and condition: a value (rows with that value), a list or set (rows
+#  with any of those values), or a tuple (low, high) (rows with
+#  low<=value<=high, either can be None; if low>high, rows outside
+#  (high, low) - a longitude range crossing 0, say). Missing values
+#  never pass.
+def _where_rows(columns, where):
+    keep = None
+    for (name, condition) in where.items():
+        values = columns[name]
+        missing = values == "" if values.dtype.kind == "U" else np.isnan(values)
+        if isinstance(condition, tuple):
+            (low, high) = condition
+            if low is not None and high is not None and low > high:
+                passed = (values >= low) | (values <= high)
+            else:
+                passed = ~missing
+                if low is not None:
+                    passed &= values >= low
+                if high is not None:
+                    passed &= values <= high
+        elif isinstance(condition, (list, set, frozenset)):
+            passed = _is_in(values, list(condition))
+        else:
+            passed = values == condition
+        passed &= ~missing
+        keep = passed if keep is None else keep & passed
+    return keep
+
+
+def _parse_fixed_width(
+    data, colspecs, names, converters, na_values, encoding, usecols=None, where=None
+):
+    grid = _character_grid(data, max(end for (start, end) in colspecs))
+    # Lines with nothing in any of the fields are skipped
+    in_field = np.zeros(grid.shape[1], dtype=bool)
+    for (start, end) in colspecs:
+        in_field[start:end] = True
+    # (NULs too - they're dropped from byte strings)
+    used = ~_is_in(grid[:, in_field], list(_blank + b"\0")).all(axis=1)
+    # Only the columns wanted (or in the conditions) are converted
+    colspecs = dict(zip(names, colspecs))
+    if usecols is None:
+        usecols = names
+    wanted = [name for name in names if name in usecols or name in (where or {})]
+    na_strings = _na_strings(na_values, encoding)
+    na_floats = _na_floats(na_values)
+    rows = np.flatnonzero(used)
+    # Positions (in the table) of the rows that pass
+    index = None
+    result = {}
+    if where:
+        # Conditions first, then just the rows that pass those
+        for name in where:
+            result[name] = _convert_column(
+                _column(grid, *colspecs[name], rows=rows),
+                converters[name],
+                na_strings,
+                na_floats,
+                encoding,
+            )
+        keep = _where_rows(result, where)
+        rows = rows[keep]
+        index = np.flatnonzero(keep)
+        for name in where:
+            result[name] = result[name][keep]
+    for name in wanted:
+        if name not in result:
+            result[name] = _convert_column(
+                _column(grid, *colspecs[name], rows=rows),
+                converters[name],
+                na_strings,
+                na_floats,
+                encoding,
+            )
+    return ({name: result[name] for name in wanted}, index)
+
+
+# DataFrame from the converted columns - missing strings become NaN
+#  (and a column of nothing but missing strings is just NaNs)
+def _make_frame(columns, index=None):
+    result = {}
+    for (name, values) in columns.items():
+        if values.dtype.kind == "U":
+            missing = values == ""
+            if values.size > 0 and missing.all():
+                values = np.full(values.shape, np.nan)
+            else:
+                values = values.astype(object)
+                values[missing] = np.nan
+        result[name] = values
+    return pandas.DataFrame(result, index=index)
+
+
+# The converted columns are cached beside the text file: a .npy file
+#  with two arrays - a key, and the columns (as one record array, so
+#  they are all read at once). The key records the text file's
+#  modification time and size, and the layout, so the cache is only
+#  used if none of those changed.
+_cache_suffix = ".npy"
+_cache_format = 1
+
+
+# (Including part-written caches)
+def _is_cache_file(file_name):
+    return _cache_suffix in os.path.basename(file_name)
+
+
+def _cache_key(file_name, colspecs, names, converters, na_values, encoding):
+    stat = os.stat(file_name)
+    layout = (
+        [tuple(colspec) for colspec in colspecs],
+        list(names),
+        [converters[name].__name__ for name in names],
+        sorted(na_values),
+        encoding,
+    )
+    return "%d %d %d %r" % (_cache_format, stat.st_mtime_ns, stat.st_size, layout)
+
+
+# Cached columns, and the rows' labels (None for 0,1,...) - just the
+#  wanted columns (usecols), of the given rows (if rows is not None)
+#  that pass the conditions (if where). None if there's no cache, or
+#  it's out of date. The cache is memory mapped: the condition columns
+#  are looked at there, and only the wanted values are copied out.
+def _load_cache(cache_file, key, usecols, where=None, rows=None):
+    try:
+        with open(cache_file, "rb") as f:
+            if str(np.load(f, allow_pickle=False)) != key:
+                return None
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            elif version == (2, 0):
+                header = np.lib.format.read_array_header_2_0(f)
+            else:
+                return None
+            (shape, fortran_order, dtype) = header
+            offset = f.tell()
+        if shape[0] == 0:
+            records = np.empty(shape, dtype=dtype)
+        else:
+            records = np.memmap(
+                cache_file, dtype=dtype, mode="r", offset=offset, shape=shape
+            )
+        index = None
+        if rows is not None:
+            records = records[rows]
+            index = rows
+        if not where:
+            return ({name: np.array(records[name]) for name in usecols}, index)
+        keep = _where_rows({name: records[name] for name in where}, where)
+        if index is None:
+            index = np.flatnonzero(keep)
+        else:
+            index = index[keep]
+        return ({name: records[name][keep] for name in usecols}, index)
+    except (OSError, ValueError, KeyError, EOFError, IndexError):
+        return None
+
+
+# Write the cache, if we can. Written to a part file (unique to this
+#  process and thread) and renamed, so readers never see part of one.
+def _save_cache(cache_file, key, columns):
+    records = np.empty(
+        len(next(iter(columns.values()))),
+        dtype=[(name, values.dtype) for (name, values) in columns.items()],
+    )
+    for (name, values) in columns.items():
+        records[name] = values
+    part_file = "%s.%d.%d.part" % (cache_file, os.getpid(), threading.get_ident())
+    try:
+        with open(part_file, "wb") as f:
+            np.save(f, np.array(key))
+            np.save(f, records)
+        os.replace(part_file, cache_file)
+    except OSError:
+        if os.path.isfile(part_file):
+            os.remove(part_file)
+
+
+# DataFrame of the wanted columns, of the rows that pass the
+#  conditions. index is the rows' labels (None for 0,1,...).
+def _select(columns, usecols, where, index=None):
+    if where:
+        keep = _where_rows(columns, where)
+        if index is None:
+            index = np.arange(len(keep))
+        index = index[keep]
+        columns = {name: columns[name][keep] for name in usecols}
+    else:
+        columns = {name: columns[name] for name in usecols}
+    return _make_frame(columns, index=index)
+
+
+# Conditions on a DataFrame (from read_fwf - which can leave numeric
+#  columns as objects)
+def _where_frame_rows(frame, where, converters):
+    columns = {}
+    for name in where:
+        if converters[name] is str:
+            columns[name] = frame[name].fillna("").to_numpy().astype(str)
+        else:
+            columns[name] = pandas.to_numeric(frame[name], errors="coerce").to_numpy(
+                dtype=np.float64
+            )
+    return _where_rows(columns, where)
+
+
+def _read_fixed_width(
+    file_name,
+    colspecs,
+    names,
+    converters,
+    na_values,
+    encoding="ISO-8859-1",
+    cache=False,
+    rows=None,
+    usecols=None,
+    where=None,
+):
+    """Read a fixed-width text file, as pandas.read_fwf would with
+    header=None and the given colspecs, names, converters (str, int, or
+    float for each column), and na_values.
+
+    With cache=True, the columns are kept in a binary file beside the
+    text file, and read from there (with no parsing) next time.
+
+    With rows (positions in the table), only those rows are returned -
+    as read_fwf(...).iloc[rows] would.
+
+    With usecols (names), only those columns are returned (in file
+    order), and with where (see _where_rows), only the rows that pass
+    the conditions. Without a cache, other columns are not converted,
+    and other rows are not converted beyond the columns in the
+    conditions. (The cache has all the columns, so when it's made
+    everything is converted once.)
+
+    Returns a :obj:`pandas.DataFrame`."""
+    if rows is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+    usecols = [name for name in names if usecols is None or name in usecols]
+    needed = [name for name in names if name in usecols or name in (where or {})]
+    if cache:
+        cache_file = "%s%s" % (file_name, _cache_suffix)
+        key = _cache_key(file_name, colspecs, names, converters, na_values, encoding)
+        cached = _load_cache(cache_file, key, usecols, where=where, rows=rows)
+        if cached is not None:
+            return _make_frame(*cached)
+    data = _read_bytes(file_name)
+    if data is not None and len(data.strip(_blank)) > 0:
+        try:
+            if cache or rows is not None:
+                (columns, index) = _parse_fixed_width(
+                    data, colspecs, names, converters, na_values, encoding
+                )
+            else:
+                (columns, index) = _parse_fixed_width(
+                    data,
+                    colspecs,
+                    names,
+                    converters,
+                    na_values,
+                    encoding,
+                    usecols=usecols,
+                    where=where,
+                )
+                where = None
+        except (ValueError, OverflowError):
+            columns = None
+        if columns is not None:
+            if cache:
+                _save_cache(cache_file, key, columns)
+            if rows is not None:
+                columns = {name: columns[name][rows] for name in needed}
+                index = rows
+            return _select(columns, usecols, where, index=index)
+    result = pandas.read_fwf(
+        file_name,
+        colspecs=colspecs,
+        header=None,
+        encoding=encoding,
+        names=names,
+        converters=converters,
+        na_values=na_values,
+        comment=None,
+        compression="infer",
+    )
+    if rows is not None:
+        result = result.iloc[rows]
+    if where:
+        result = result[_where_frame_rows(result, where, converters)]
+    return result[usecols]
@@ -0,0 +1,750 @@
+# (C) British Crown Copyright 2017, Met Office
+#
+# This code is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This code is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+
+# Load observations for a period, from a reanalysis that keeps them in
+#  a file for each assimilation time (20CR).
+#
+# Only the assimilation times are visited, the files can be read in
+#  parallel (worker processes), each file's observations are selected
+#  by comparing the timestamp at the start of their UIDs as strings
+#  ('YYYYMMDDHH' sorts as the times do - no date parsing), and the
+#  result is concatenated once, at the end.
+
+import os
+import datetime
+import functools
+import zipfile
+import concurrent.futures
+import numpy as np
+import pandas
+import iris
+import iris.coords
+import iris.cube
+
+
+# Assimilation times with files that might have observations in the
+#  period - those within 'window' hours of it.
+def _assimilation_times(start, end, interval=6, window=3):
+    result = []
+    ct = start - datetime.timedelta(hours=window)
+    last = end + datetime.timedelta(hours=window)
+    while ct < last:
+        if ct.hour % interval == 0:
+            result.append(datetime.datetime(ct.year, ct.month, ct.day, ct.hour))
+            ct = ct + datetime.timedelta(hours=interval)
+        else:
+            ct = ct + datetime.timedelta(hours=1)
+    return result
+
+
+# 'YYYYMMDDHH' for the first whole hour at or after the time
+def _hour_string(dtime):
+    hour = datetime.datetime(dtime.year, dtime.month, dtime.day, dtime.hour)
+    if hour < dtime:
+        hour = hour + datetime.timedelta(hours=1)
+    return hour.strftime("%Y%m%d%H")
+
+
+# Time ('YYYYMMDDHH' - NaT if not) and sequence number (the rest - -1
+#  if not a number) from each UID
+def _decode_uids(uids):
+    strings = np.asarray(uids.fillna("").to_numpy(), dtype=str)
+    width = max(strings.dtype.itemsize // 4, 1)
+    codes = strings.view(np.uint32).reshape((len(strings), width)).astype(np.int64)
+    codes = codes - ord("0")
+    digits = (codes >= 0) & (codes <= 9)
+    times = np.full(len(strings), np.datetime64("NaT"), dtype="datetime64[h]")
+    sequence = np.full(len(strings), -1, dtype=np.int64)
+    if width < 10:
+        return (times, sequence)
+    valid = digits[:, :10].all(axis=1)
+    d = codes[valid, :10]
+    months = (d[:, 0] * 1000 + d[:, 1] * 100 + d[:, 2] * 10 + d[:, 3] - 1970) * 12 + (
+        d[:, 4] * 10 + d[:, 5] - 1
+    )
+    times[valid] = (
+        months.astype("datetime64[M]").astype("datetime64[D]")
+        + (d[:, 6] * 10 + d[:, 7] - 1).astype("timedelta64[D]")
+    ).astype("datetime64[h]") + (d[:, 8] * 10 + d[:, 9]).astype("timedelta64[h]")
+    if width > 10:
+        numbered = digits[:, 10:].all(axis=1)
+        number = np.zeros(numbered.sum(), dtype=np.int64)
+        for column in range(10, width):
+            number = number * 10 + codes[numbered, column]
+        sequence[numbered] = number
+    return (times, sequence)
+
+
+def _compact_observations(o):
+    """The observations, using less memory: strings (except UID) as
+    categoricals, UID as its time ('UID.time') and sequence number
+    ('UID.sequence'), floats as float32, and integers as the smallest
+    integer type that holds them."""
+    result = {}
+    for name in o.columns:
+        values = o[name]
+        if name == "UID":
+            (times, sequence) = _decode_uids(values)
+            result["UID.time"] = times.astype("datetime64[s]")
+            result["UID.sequence"] = pandas.to_numeric(sequence, downcast="integer")
+        elif pandas.api.types.is_float_dtype(values):
+            result[name] = values.to_numpy(dtype=np.float32)
+        elif pandas.api.types.is_integer_dtype(values):
+            result[name] = pandas.to_numeric(values.to_numpy(), downcast="integer")
+        else:
+            # Categories in order of appearance - sorting them is slow
+            (codes, categories) = pandas.factorize(values.to_numpy())
+            result[name] = pandas.Categorical.from_codes(codes, categories)
+    return pandas.DataFrame(result, index=o.index)
+
+
+def _concat_observations(frames):
+    """pandas.concat, keeping categoricals categorical (the categories
+    in each frame can be different)."""
+    result = pandas.concat(frames)
+    for name in result.columns:
+        if isinstance(frames[0][name].dtype, pandas.CategoricalDtype) and not (
+            isinstance(result[name].dtype, pandas.CategoricalDtype)
+        ):
+            result[name] = pandas.api.types.union_categoricals(
+                [frame[name] for frame in frames]
+            )
+    return result
+
+
+# Observations with UID hours in [first,last)
+def _select_period(o, first, last):
+    hours = np.asarray(o.UID, dtype=object).astype("U10")
+    return o[o.UID.notna().to_numpy() & (hours >= first) & (hours < last)]
+
+
+# Observations from one file with UID hours in [first,last) - just
+#  the given columns (and UID, to select on), if columns is not None
+def _load_file_period(
+    load_1file, first, last, dtime, columns=None, where=None, compact=False
+):
+    if columns is None:
+        o = _select_period(load_1file(dtime, where=where), first, last)
+    else:
+        o = load_1file(dtime, columns=list(columns) + ["UID"], where=where)
+        o = _select_period(o, first, last)[
+            [name for name in o.columns if name in columns]
+        ]
+    if compact:
+        o = _compact_observations(o)
+    return o
+
+
+def _load_observations_period(
+    load_1file, start, end, workers=None, columns=None, where=None, compact=False
+):
+    """Observations with UID times in [start,end), from the files at the
+    assimilation times around that period (compact, if compact=True -
+    see _compact_observations).
+
+    load_1file(dtime, columns=columns, where=where) loads one file (and
+    must be picklable if workers is 2 or more). Returns None if there
+    are no files to read."""
+    times = _assimilation_times(start, end)
+    if len(times) == 0:
+        return None
+    load_file = functools.partial(
+        _load_file_period,
+        load_1file,
+        _hour_string(start),
+        _hour_string(end),
+        columns=columns,
+        where=where,
+        compact=compact,
+    )
+    if workers is None or workers < 2 or len(times) < 2:
+        frames = [load_file(dtime) for dtime in times]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            frames = list(executor.map(load_file, times))
+    return _concat_observations(frames)
+
+
+def _load_observations_fortime(load_1file, files):
+    """Observations from each of the (dtime, weight) files, with a
+    'weight' column."""
+    frames = []
+    for (dtime, weight) in files:
+        o = load_1file(dtime)
+        o["weight"] = np.repeat(weight, len(o.index))
+        frames.append(o)
+    if len(frames) == 1:
+        return frames[0]
+    return _concat_observations(frames)
+
+
+# Observations for a sequence of times (the frames of an animation).
+#
+# Consecutive times mostly use the same files (at 15-minute frames,
+#  the same pair for up to 24 frames), with different weights. So the
+#  observations from the current files are kept, concatenated, and
+#  only the weights are made for each time. The next file (in the
+#  direction the times are going) is read in a background thread
+#  while the current ones are in use - a thread, not a process, so
+#  the observations don't have to be pickled back.
+
+
+class _ObservationsStream:
+    """Same as load_observations_fortime, for one time after another.
+
+    load_1file(dtime) loads one file, fortime_files(v_time) gives the
+    (dtime, weight) files for a time, and files are interval hours
+    apart."""
+
+    def __init__(self, load_1file, fortime_files, interval=6, prefetch=True):
+        self.load_1file = load_1file
+        self.fortime_files = fortime_files
+        self.interval = interval
+        self.executor = None
+        if prefetch:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.files = {}
+        self.pending = {}
+        self.times = None
+        self.window = None
+        self.lengths = None
+        self.last_time = None
+        self.forward = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stop reading ahead, and forget the observations."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.files = {}
+        self.pending = {}
+        self.times = None
+        self.window = None
+
+    # One file's observations - kept, read ahead, or read now
+    def _file(self, dtime):
+        if dtime in self.files:
+            return self.files[dtime]
+        if dtime in self.pending:
+            return self.pending.pop(dtime).result()
+        return self.load_1file(dtime)
+
+    # Start reading the file after the current ones (if it's not
+    #  already read, or being read). Errors (no such file) are kept
+    #  until the file is wanted. Nothing to do until there have been
+    #  two times, to give the direction.
+    def _read_ahead(self):
+        if self.executor is None or self.forward is None:
+            return
+        if self.forward:
+            dtime = self.times[-1] + datetime.timedelta(hours=self.interval)
+        else:
+            dtime = self.times[0] - datetime.timedelta(hours=self.interval)
+        if dtime in self.files or dtime in self.pending:
+            return
+        self.pending = {dtime: self.executor.submit(self.load_1file, dtime)}
+
+    def load_observations_fortime(self, v_time):
+        """Observations that contribute to fields at the time - as from
+        load_observations_fortime. The observations share their data
+        with the stream - copy them before changing any values."""
+        if self.last_time is not None and v_time != self.last_time:
+            self.forward = v_time > self.last_time
+        self.last_time = v_time
+        files = self.fortime_files(v_time)
+        times = [dtime for (dtime, weight) in files]
+        if times != self.times:
+            frames = [self._file(dtime) for dtime in times]
+            self.files = dict(zip(times, frames))
+            self.times = times
+            self.window = frames[0]
+            if len(frames) > 1:
+                self.window = _concat_observations(frames)
+            self.lengths = [len(frame.index) for frame in frames]
+        self._read_ahead()
+        result = self.window.copy(deep=False)
+        result["weight"] = np.concatenate(
+            [
+                np.repeat(weight, length)
+                for ((dtime, weight), length) in zip(files, self.lengths)
+            ]
+        )
+        return result
+
+
+# Spatial index over a year's observations.
+#
+# The position of each observation (with its file, and its row in
+#  that file) is kept, sorted into latitude-longitude bins - so a box,
+#  radius, or nearest-neighbour query only looks at the observations in
+#  the bins it overlaps, and then only reads the files (and rows) that
+#  have observations it wants. The index is saved (.npz) beside the
+#  observation files, with the modification time and size of each file
+#  it was made from, and is remade if any of those change.
+
+# Earth radius (km) for distances
+earth_radius = 6371.0
+
+_index_format = 1
+
+
+# The 6-hourly assimilation times in a year
+def _year_times(year, interval=6):
+    result = []
+    dtime = datetime.datetime(year, 1, 1)
+    while dtime.year == year:
+        result.append(dtime)
+        dtime = dtime + datetime.timedelta(hours=interval)
+    return result
+
+
+# (mtime_ns, size) of each file - (-1,-1) if it's not there
+def _file_stamps(file_names):
+    stamps = np.full((len(file_names), 2), -1, dtype=np.int64)
+    for (index, file_name) in enumerate(file_names):
+        if file_name is None:
+            continue
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            continue
+        stamps[index] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+
+def _bin_numbers(latitudes, longitudes, bin_size):
+    n_lat = int(round(180.0 / bin_size))
+    n_lon = int(round(360.0 / bin_size))
+    row = np.clip(np.floor((latitudes + 90.0) / bin_size).astype(int), 0, n_lat - 1)
+    column = np.clip(
+        np.floor((longitudes % 360.0) / bin_size).astype(int), 0, n_lon - 1
+    )
+    return row * n_lon + column
+
+
+def _build_observations_index(load_1file, times, file_names, bin_size=1.0):
+    """Index the observations in the files (those that are there).
+
+    Returns the index - a dict of numpy arrays."""
+    stamps = _file_stamps(file_names)
+    latitudes = []
+    longitudes = []
+    files = []
+    rows = []
+    for (index, dtime) in enumerate(times):
+        if stamps[index, 0] < 0:
+            continue
+        o = load_1file(dtime)
+        latitude = o.Latitude.to_numpy(dtype=np.float64)
+        longitude = o.Longitude.to_numpy(dtype=np.float64)
+        row = np.flatnonzero(np.isfinite(latitude) & np.isfinite(longitude))
+        latitudes.append(latitude[row])
+        longitudes.append(longitude[row] % 360.0)
+        files.append(np.full(len(row), index, dtype=np.int32))
+        rows.append(row.astype(np.int32))
+    if len(files) == 0:
+        raise IOError("No obs files to index")
+    latitudes = np.concatenate(latitudes)
+    longitudes = np.concatenate(longitudes)
+    bins = _bin_numbers(latitudes, longitudes, bin_size)
+    order = np.argsort(bins, kind="stable")
+    n_bins = int(round(180.0 / bin_size)) * int(round(360.0 / bin_size))
+    return {
+        "format": np.array(_index_format),
+        "bin_size": np.array(bin_size),
+        "times": np.array(times, dtype="datetime64[h]"),
+        "stamps": stamps,
+        "latitude": latitudes[order],
+        "longitude": longitudes[order],
+        "file_number": np.concatenate(files)[order],
+        "row": np.concatenate(rows)[order],
+        "bin_starts": np.searchsorted(bins[order], np.arange(n_bins + 1)),
+    }
+
+
+def _get_observations_index(
+    load_1file,
+    times,
+    file_names,
+    index_file,
+    build=_build_observations_index,
+    compress=False,
+):
+    """The index for the files - from the index file if it's up to date,
+    otherwise made (with build(load_1file, times, file_names)) and saved
+    (compressed, if compress=True)."""
+    try:
+        with np.load(index_file, allow_pickle=False) as saved:
+            index = {name: saved[name] for name in saved.files}
+        if (
+            int(index["format"]) == _index_format
+            and len(index["times"]) == len(times)
+            and (index["times"] == np.array(times, dtype="datetime64[h]")).all()
+            and (index["stamps"] == _file_stamps(file_names)).all()
+        ):
+            return index
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        pass
+    index = build(load_1file, times, file_names)
+    part_file = "%s.%d.part" % (index_file, os.getpid())
+    try:
+        with open(part_file, "wb") as f:
+            if compress:
+                np.savez_compressed(f, **index)
+            else:
+                np.savez(f, **index)
+        os.replace(part_file, index_file)
+    except OSError:
+        if os.path.isfile(part_file):
+            os.remove(part_file)
+    return index
+
+
+# Indices of the observations in the bins that overlap a
+#  latitude-longitude box (longitudes in [0,360), wrapping if
+#  lon_min>lon_max)
+def _index_candidates(index, lat_min, lat_max, lon_min, lon_max):
+    bin_size = float(index["bin_size"])
+    n_lat = int(round(180.0 / bin_size))
+    n_lon = int(round(360.0 / bin_size))
+    row_0 = max(0, int(np.floor((lat_min + 90.0) / bin_size)))
+    row_1 = min(n_lat - 1, int(np.floor((lat_max + 90.0) / bin_size)))
+    column_0 = min(n_lon - 1, int(np.floor(lon_min / bin_size)))
+    column_1 = min(n_lon - 1, int(np.floor(lon_max / bin_size)))
+    if column_0 <= column_1:
+        column_ranges = [(column_0, column_1)]
+    else:
+        column_ranges = [(column_0, n_lon - 1), (0, column_1)]
+    bin_starts = index["bin_starts"]
+    candidates = []
+    for row in range(row_0, row_1 + 1):
+        for (first, last) in column_ranges:
+            candidates.append(
+                np.arange(
+                    bin_starts[row * n_lon + first], bin_starts[row * n_lon + last + 1]
+                )
+            )
+    if len(candidates) == 0:
+        return np.zeros(0, dtype=int)
+    return np.concatenate(candidates)
+
+
+# Longitude range, in [0,360) - lon_min>lon_max if it crosses 0
+def _longitude_range(lon_min, lon_max):
+    if lon_max - lon_min >= 360.0:
+        return (0.0, 360.0)
+    return (lon_min % 360.0, lon_max % 360.0)
+
+
+def _in_longitude_range(longitudes, lon_min, lon_max):
+    if lon_min <= lon_max:
+        return (longitudes >= lon_min) & (longitudes <= lon_max)
+    return (longitudes >= lon_min) | (longitudes <= lon_max)
+
+
+# Positions in file (time) order, and row order within each file
+def _time_order(index, positions):
+    return positions[
+        np.lexsort((index["row"][positions], index["file_number"][positions]))
+    ]
+
+
+def _index_box(index, lat_min, lat_max, lon_min, lon_max):
+    """Indices of the observations in a box (edges included)."""
+    (lon_min, lon_max) = _longitude_range(lon_min, lon_max)
+    candidates = _index_candidates(index, lat_min, lat_max, lon_min, lon_max)
+    latitudes = index["latitude"][candidates]
+    inside = (
+        (latitudes >= lat_min)
+        & (latitudes <= lat_max)
+        & _in_longitude_range(index["longitude"][candidates], lon_min, lon_max)
+    )
+    return _time_order(index, candidates[inside])
+
+
+# Great-circle distances (km)
+def _distances(latitude, longitude, latitudes, longitudes):
+    (lat_0, lon_0, lats, lons) = (
+        np.radians(latitude),
+        np.radians(longitude),
+        np.radians(latitudes),
+        np.radians(longitudes),
+    )
+    h = (
+        np.sin((lats - lat_0) / 2) ** 2
+        + np.cos(lat_0) * np.cos(lats) * np.sin((lons - lon_0) / 2) ** 2
+    )
+    return 2 * earth_radius * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
+def _index_radius(index, latitude, longitude, radius):
+    """Indices of the observations within radius (km) of the point, and
+    their distances from it."""
+    angle = radius / earth_radius
+    # (A little extra, so rounding can't lose a bin)
+    d_lat = np.degrees(angle) + 1.0e-6
+    lat_min = latitude - d_lat
+    lat_max = latitude + d_lat
+    # Smallest longitude range that holds the circle
+    if lat_min <= -90 or lat_max >= 90 or np.sin(angle) >= np.cos(np.radians(latitude)):
+        (lon_min, lon_max) = (0.0, 360.0)
+    else:
+        d_lon = (
+            np.degrees(np.arcsin(np.sin(angle) / np.cos(np.radians(latitude)))) + 1.0e-6
+        )
+        (lon_min, lon_max) = _longitude_range(longitude - d_lon, longitude + d_lon)
+    candidates = _index_candidates(index, lat_min, lat_max, lon_min, lon_max)
+    distances = _distances(
+        latitude,
+        longitude,
+        index["latitude"][candidates],
+        index["longitude"][candidates],
+    )
+    inside = distances <= radius
+    (candidates, distances) = (candidates[inside], distances[inside])
+    order = np.lexsort((index["row"][candidates], index["file_number"][candidates]))
+    return (candidates[order], distances[order])
+
+
+def _index_nearest(index, latitude, longitude, count, radius=500.0):
+    """Indices of the 'count' observations nearest the point, nearest
+    first, and their distances from it."""
+    while True:
+        (candidates, distances) = _index_radius(index, latitude, longitude, radius)
+        if len(candidates) >= count or radius > np.pi * earth_radius:
+            break
+        radius = radius * 2
+    order = np.argsort(distances, kind="stable")[:count]
+    return (candidates[order], distances[order])
+
+
+def _index_records(load_1file, index, positions, distances=None):
+    """The observations (all their columns) at the positions in the
+    index, in that order - reading only the files (and rows) that have
+    any of them. With their distances, if given, as column 'distance'.
+
+    load_1file(dtime, rows=rows) loads the given rows of one file."""
+    order = np.lexsort((index["row"][positions], index["file_number"][positions]))
+    files = index["file_number"][positions][order]
+    rows = index["row"][positions][order]
+    times = index["times"].astype(datetime.datetime)
+    frames = []
+    for file in np.unique(files):
+        frames.append(load_1file(times[file], rows=rows[files == file]))
+    if len(frames) == 0:
+        return None
+    result = pandas.concat(frames).iloc[np.argsort(order)]
+    if distances is not None:
+        result["distance"] = distances
+    return result
+
+
+# Platform index over a year's observations.
+#
+# The file and row of each observation, sorted by platform (the
+#  observations' ID), so one platform's observations (a ship's track,
+#  or a station's record) can be read without looking at any of the
+#  others. Made in one pass over the year's files (which can be read in
+#  parallel), and saved and checked just as the spatial index is.
+
+
+# Platform IDs in one file, and their rows
+def _platform_rows(load_1file, dtime):
+    o = load_1file(dtime)
+    row = np.flatnonzero(o.ID.notna().to_numpy())
+    return (np.asarray(o.ID, dtype=object)[row].astype(str), row)
+
+
+def _build_platform_index(load_1file, times, file_names, workers=None):
+    """Index the observations in the files by platform ID.
+
+    Returns the index - a dict of numpy arrays."""
+    stamps = _file_stamps(file_names)
+    present = [index for index in range(len(times)) if stamps[index, 0] >= 0]
+    if len(present) == 0:
+        raise IOError("No obs files to index")
+    load_file = functools.partial(_platform_rows, load_1file)
+    if workers is None or workers < 2 or len(present) < 2:
+        found = [load_file(times[index]) for index in present]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            found = list(executor.map(load_file, [times[index] for index in present]))
+    platforms = np.concatenate([ids for (ids, row) in found])
+    files = np.concatenate(
+        [
+            np.full(len(row), index, dtype=np.int32)
+            for (index, (ids, row)) in zip(present, found)
+        ]
+    )
+    rows = np.concatenate([row for (ids, row) in found]).astype(np.int32)
+    order = np.lexsort((rows, files, platforms))
+    (platform, starts) = np.unique(platforms[order], return_index=True)
+    return {
+        "format": np.array(_index_format),
+        "times": np.array(times, dtype="datetime64[h]"),
+        "stamps": stamps,
+        "platform": platform,
+        "platform_starts": np.append(starts, len(order)),
+        "file_number": files[order],
+        "row": rows[order],
+    }
+
+
+def _index_platform(index, platform):
+    """Indices of a platform's observations, in time order."""
+    number = np.searchsorted(index["platform"], platform)
+    if number >= len(index["platform"]) or index["platform"][number] != platform:
+        return np.zeros(0, dtype=int)
+    return np.arange(
+        index["platform_starts"][number], index["platform_starts"][number + 1]
+    )
+
+
+def _load_platform(load_1file, get_index, platform, start, end):
+    """A platform's observations with UID times in [start,end).
+
+    get_index(year) gets the platform index for a year. Returns None if
+    there are no such observations."""
+    # Files up to 3 hours into the next (or previous) year can have
+    #  observations from this one - those years are used if they are there
+    years = range(
+        (start - datetime.timedelta(hours=3)).year,
+        (end + datetime.timedelta(hours=3)).year + 1,
+    )
+    frames = []
+    for year in years:
+        try:
+            index = get_index(year)
+        except IOError:
+            if start.year <= year <= (end - datetime.timedelta(microseconds=1)).year:
+                raise
+            continue
+        positions = _index_platform(index, platform)
+        # Only the files that can have observations in the period
+        times = index["times"][index["file_number"][positions]]
+        positions = positions[
+            (times >= np.datetime64(start - datetime.timedelta(hours=3)))
+            & (times < np.datetime64(end + datetime.timedelta(hours=3)))
+        ]
+        o = _index_records(load_1file, index, positions)
+        if o is not None:
+            frames.append(_select_period(o, _hour_string(start), _hour_string(end)))
+    if len(frames) == 0:
+        return None
+    result = pandas.concat(frames)
+    if len(result.index) == 0:
+        return None
+    return result
+
+
+# Observation coverage: the number of observations in each
+#  latitude-longitude grid box, at each assimilation time in a year.
+#
+# Each file's counts are one histogram of all its positions (a
+#  bincount of their box numbers), the files can be counted in
+#  parallel, and the year's (time, latitude, longitude) counts are
+#  saved (compressed - most boxes are empty) beside the observation
+#  files, and checked just as the indexes are, so they need only be
+#  made once.
+
+
+# Observation counts in each grid box, for one file
+def _coverage_counts(load_1file, resolution, dtime):
+    o = load_1file(dtime)
+    latitudes = o.Latitude.to_numpy(dtype=np.float64)
+    longitudes = o.Longitude.to_numpy(dtype=np.float64)
+    positioned = (
+        np.isfinite(latitudes)
+        & np.isfinite(longitudes)
+        & (latitudes >= -90)
+        & (latitudes <= 90)
+    )
+    n_lat = int(round(180.0 / resolution))
+    n_lon = int(round(360.0 / resolution))
+    bins = _bin_numbers(latitudes[positioned], longitudes[positioned], resolution)
+    counts = np.bincount(bins, minlength=n_lat * n_lon)
+    return counts.reshape((n_lat, n_lon)).astype(np.int32)
+
+
+def _build_coverage(load_1file, times, file_names, resolution=2.0, workers=None):
+    """Observation counts in each grid box, at each time (those with
+    files).
+
+    Returns a dict of numpy arrays - counts is (time, latitude,
+    longitude)."""
+    if (180.0 / resolution) % 1 != 0 or (360.0 / resolution) % 1 != 0:
+        raise Exception("Resolution %g does not divide 180 degrees" % resolution)
+    stamps = _file_stamps(file_names)
+    present = [index for index in range(len(times)) if stamps[index, 0] >= 0]
+    if len(present) == 0:
+        raise IOError("No obs files to count")
+    count_file = functools.partial(_coverage_counts, load_1file, resolution)
+    if workers is None or workers < 2 or len(present) < 2:
+        found = [count_file(times[index]) for index in present]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            found = list(executor.map(count_file, [times[index] for index in present]))
+    counts = np.zeros(
+        (len(times), int(round(180.0 / resolution)), int(round(360.0 / resolution))),
+        dtype=np.int32,
+    )
+    counts[present] = found
+    return {
+        "format": np.array(_index_format),
+        "times": np.array(times, dtype="datetime64[h]"),
+        "stamps": stamps,
+        "resolution": np.array(resolution),
+        "counts": counts,
+    }
+
+
+def _coverage_cube(coverage):
+    """Cube of the counts - times without a file are masked."""
+    coord_s = iris.coord_systems.GeogCS(iris.fileformats.pp.EARTH_RADIUS)
+    resolution = float(coverage["resolution"])
+    counts = coverage["counts"]
+    time = iris.coords.DimCoord(
+        coverage["times"].astype("datetime64[h]").astype(np.int64).astype(np.float64),
+        standard_name="time",
+        units="hours since 1970-01-01 00:00:00",
+    )
+    latitude = iris.coords.DimCoord(
+        -90 + resolution * (np.arange(counts.shape[1]) + 0.5),
+        standard_name="latitude",
+        units="degrees",
+        coord_system=coord_s,
+    )
+    longitude = iris.coords.DimCoord(
+        resolution * (np.arange(counts.shape[2]) + 0.5),
+        standard_name="longitude",
+        units="degrees",
+        coord_system=coord_s,
+    )
+    for coord in (latitude, longitude):
+        coord.guess_bounds()
+    missing = coverage["stamps"][:, 0] < 0
+    return iris.cube.Cube(
+        np.ma.array(
+            counts,
+            mask=np.broadcast_to(missing[:, np.newaxis, np.newaxis], counts.shape),
+        ),
+        long_name="observation_count",
+        units="1",
+        dim_coords_and_dims=[(time, 0), (latitude, 1), (longitude, 2)],
+    )
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+# Benchmark getting a year's observations from a small region of
+#  20CR: loading every file and selecting (as had to be done before
+#  the spatial index) against twcr.load_observations_in_box and
+#  twcr.load_observations_near (the first query makes the index, later
+#  ones reuse it).
+#
+# Makes a synthetic year (6-hourly files, in the v3 layout, each with
+#  observations scattered over the globe) in a temporary $SCRATCH, so
+#  no real data is needed. Files are parsed (and cached) before the
+#  timings.
+#
+# Usage: python twcr_observations_index.py --files 1460 --lines 5000
+
+import os
+import argparse
+import datetime
+import random
+import tempfile
+import shutil
+import time
+import numpy
+import pandas
+import iris
+import iris.coord_systems
+import iris.fileformats.pp
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--lines", help="Observations in each file", type=int, default=5000)
+parser.add_argument("--files", help="Files in the year", type=int, default=1460)
+args = parser.parse_args()
+
+scratch = tempfile.mkdtemp()
+os.environ["SCRATCH"] = scratch
+import IRData.twcr as twcr
+import IRData.twcr.version_3_release.observations as observations
+
+
+def make_text(dtime, n_lines, rng):
+    lines = []
+    for index in range(n_lines):
+        line = [" "] * 223
+        for (number, (start, end)) in enumerate(observations._obs_colspecs):
+            name = observations._obs_names[number]
+            width = end - start
+            if name == "UID":
+                value = "%s%09d" % (dtime.strftime("%Y%m%d%H"), index)
+            elif name == "Latitude":
+                value = "%.1f" % numpy.degrees(numpy.arcsin(rng.uniform(-1, 1)))
+            elif name == "Longitude":
+                value = "%.1f" % rng.uniform(-180, 180)
+            elif observations._obs_converters[name] is str:
+                value = "".join(rng.choice("ABCDEFGH0123456789") for i in range(width))
+            elif observations._obs_converters[name] is int:
+                value = "%d" % rng.randint(0, 8)
+            else:
+                value = "%.*f" % (max(0, min(3, width - 6)), rng.uniform(-99, 999))
+            line[start:end] = list(value[:width].rjust(width))
+        lines.append("".join(line))
+    return ("\n".join(lines) + "\n").encode("ISO-8859-1")
+
+
+# Load everything, then select
+def load_all(select):
+    frames = []
+    for dtime in dtimes:
+        o = observations.load_observations_1file(dtime, version="3")
+        frames.append(o[select(o)])
+    return pandas.concat(frames)
+
+
+try:
+    rng = random.Random(1)
+    dtimes = [
+        datetime.datetime(1969, 1, 1) + datetime.timedelta(hours=6 * i)
+        for i in range(args.files)
+    ]
+    for dtime in dtimes:
+        file_name = "%s/20CR/version_3/observations/%04d/%s_psobs_posterior.txt" % (
+            scratch,
+            dtime.year,
+            dtime.strftime("%Y%m%d%H"),
+        )
+        if not os.path.isdir(os.path.dirname(file_name)):
+            os.makedirs(os.path.dirname(file_name))
+        with open(file_name, "wb") as f:
+            f.write(make_text(dtime, args.lines, rng))
+        observations.load_observations_1file(dtime, version="3")
+
+    print("%d files of %d observations" % (args.files, args.lines))
+    print("%24s %12s %12s %12s" % ("query", "load all", "1st", "indexed"))
+    box = (50, 60, -10, 2)
+    queries = (
+        (
+            "box %g-%gN %g-%gE" % box,
+            lambda o: (o.Latitude >= box[0])
+            & (o.Latitude <= box[1])
+            & (o.Longitude >= box[2])
+            & (o.Longitude <= box[3]),
+            lambda: twcr.load_observations_in_box(1969, *box, version="3"),
+        ),
+        (
+            "500km of 52N 0E",
+            lambda o: (
+                6371.0
+                * numpy.arccos(
+                    numpy.clip(
+                        numpy.sin(numpy.radians(52))
+                        * numpy.sin(numpy.radians(o.Latitude))
+                        + numpy.cos(numpy.radians(52))
+                        * numpy.cos(numpy.radians(o.Latitude))
+                        * numpy.cos(numpy.radians(o.Longitude)),
+                        -1,
+                        1,
+                    )
+                )
+                <= 500
+            ),
+            lambda: twcr.load_observations_near(1969, 52, 0, 500, version="3"),
+        ),
+    )
+    for (label, select, query) in queries:
+        start = time.time()
+        old = load_all(select)
+        old_time = time.time() - start
+        times = []
+        for attempt in ("first", "indexed"):
+            start = time.time()
+            new = query()
+            times.append(time.time() - start)
+        if len(new.index) != len(old.index):
+            raise Exception("Different results for %s" % label)
+        print("%24s %12.2f %12.2f %12.2f" % ((label, old_time) + tuple(times)))
+finally:
+    shutil.rmtree(scratch)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# Benchmark the memory needed to hold a year of 20CR observations
+#  (twcr.load_observations for the whole year): the usual DataFrame
+#  (Python strings for the text columns and the UID, float64 for the
+#  numbers) against the compact one (categoricals, the UID as a time
+#  and a sequence number, float32).
+#
+# Makes a synthetic year (6-hourly files, in the v3 layout) in a
+#  temporary $SCRATCH, so no real data is needed. The text columns
+#  take their values from realistic numbers of platforms.
+#
+# Usage: python twcr_observations_memory.py --lines 5000
+
+import os
+import argparse
+import datetime
+import random
+import tempfile
+import shutil
+import time
+import pandas
+import iris
+import iris.coord_systems
+import iris.fileformats.pp
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--year", help="Year to make", type=int, default=1969)
+parser.add_argument("--days", help="Length of the year", type=int, default=365)
+parser.add_argument("--lines", help="Observations in each file", type=int, default=5000)
+args = parser.parse_args()
+
+scratch = tempfile.mkdtemp()
+os.environ["SCRATCH"] = scratch
+import IRData.twcr as twcr
+import IRData.twcr.version_3_release.observations as observations
+
+
+# A file's worth of observation lines, with times within 3 hours of
+#  the file's time (written as 'YYYYMMDDHH' - put in for each file).
+#  Names and IDs from 2000 platforms, and a few types.
+def make_template(n_lines):
+    rng = random.Random(1)
+    platforms = [
+        "".join(rng.choice("ABCDEFGH0123456789") for i in range(8)) for i in range(2000)
+    ]
+    lines = []
+    for index in range(n_lines):
+        line = [" "] * 223
+        platform = rng.choice(platforms)
+        for (number, (start, end)) in enumerate(observations._obs_colspecs):
+            name = observations._obs_names[number]
+            width = end - start
+            if name == "UID":
+                value = "%+03d%7s%09d" % (rng.randint(-3, 2), "", index)
+            elif name in ("Name", "ID"):
+                value = platform
+            elif observations._obs_converters[name] is str:
+                value = rng.choice(("SHIP", "BUOY", "LAND", "PLAT"))
+            elif observations._obs_converters[name] is int:
+                value = "%d" % rng.randint(0, 8)
+            else:
+                value = "%.*f" % (max(0, min(3, width - 6)), rng.uniform(-99, 999))
+            line[start:end] = list(value[:width].rjust(width))
+        lines.append("".join(line))
+    return lines
+
+
+def make_text(template, dtime):
+    lines = []
+    for line in template:
+        hour = dtime + datetime.timedelta(hours=int(line[0:3]))
+        lines.append("%s%s" % (hour.strftime("%Y%m%d%H"), line[10:]))
+    return ("\n".join(lines) + "\n").encode("ISO-8859-1")
+
+
+try:
+    start = datetime.datetime(args.year, 1, 1)
+    end = start + datetime.timedelta(days=args.days)
+    template = make_template(args.lines)
+    dtime = start - datetime.timedelta(hours=6)
+    while dtime <= end:
+        file_name = "%s/20CR/version_3/observations/%04d/%s_psobs_posterior.txt" % (
+            scratch,
+            dtime.year,
+            dtime.strftime("%Y%m%d%H"),
+        )
+        if not os.path.isdir(os.path.dirname(file_name)):
+            os.makedirs(os.path.dirname(file_name))
+        with open(file_name, "wb") as f:
+            f.write(make_text(template, dtime))
+        observations.load_observations_1file(dtime, version="3")
+        dtime = dtime + datetime.timedelta(hours=6)
+
+    print("%d days, %d observations in each file" % (args.days, args.lines))
+    print("%12s %12s %12s %12s" % ("", "rows", "memory (MB)", "time (s)"))
+    sizes = {}
+    for compact in (False, True):
+        t0 = time.time()
+        o = twcr.load_observations(start, end, version="3", compact=compact)
+        elapsed = time.time() - t0
+        sizes[compact] = o.memory_usage(deep=True).sum() / 1.0e6
+        print(
+            "%12s %12d %12.1f %12.2f"
+            % (("full", "compact")[compact], len(o.index), sizes[compact], elapsed)
+        )
+        del o
+    print("Reduction: %.1f times less memory" % (sizes[False] / sizes[True]))
+finally:
+    shutil.rmtree(scratch)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+# Benchmark reading a year of 20CR observation files: pandas.read_fwf
+#  (as load_observations_1file used to) against the NumPy
+#  fixed-width reader (IRData.utils.fixed_width) it uses now, and
+#  against load_observations_1file's cache of the parsed files (the
+#  first load parses each file and writes the cache, later loads just
+#  read the cache).
+#
+# Makes a synthetic year (1460 6-hourly files, in the v3 layout) in a
+#  temporary $SCRATCH, so no real data is needed. Checks the two give
+#  the same values.
+#
+# Usage: python twcr_observations_parse.py --lines 5000 [--files 1460] [--gzip]
+
+import os
+import argparse
+import datetime
+import gzip
+import random
+import tempfile
+import shutil
+import time
+import pandas
+import iris
+import iris.coord_systems
+import iris.fileformats.pp
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--lines", help="Observations in each file", type=int, default=5000)
+parser.add_argument("--files", help="Files in the year", type=int, default=1460)
+parser.add_argument("--gzip", help="Compress the files", action="store_true")
+args = parser.parse_args()
+
+scratch = tempfile.mkdtemp()
+os.environ["SCRATCH"] = scratch
+import IRData.twcr as twcr
+import IRData.twcr.version_3_release.observations as observations
+import IRData.utils.fixed_width as fixed_width
+
+
+# A file's worth of observation lines - a mix of numbers and
+#  missing-value strings, as in the real files
+def make_text(n_lines):
+    rng = random.Random(1)
+    lines = []
+    for index in range(n_lines):
+        line = [" "] * 223
+        for (number, (start, end)) in enumerate(observations._obs_colspecs):
+            name = observations._obs_names[number]
+            width = end - start
+            if observations._obs_converters[name] is str:
+                value = "".join(rng.choice("ABCDEFGH0123456789") for i in range(width))
+            elif observations._obs_converters[name] is int:
+                value = "%d" % rng.randint(0, 8)
+            elif rng.random() < 0.1:
+                value = rng.choice(("***", "-99", "9999.99", "-9.99"))
+            else:
+                value = "%.*f" % (max(0, min(3, width - 6)), rng.uniform(-99, 999))
+            line[start:end] = list(value[:width].rjust(width))
+        lines.append("".join(line))
+    return ("\n".join(lines) + "\n").encode("ISO-8859-1")
+
+
+def read_fwf(file_name):
+    return pandas.read_fwf(
+        file_name,
+        colspecs=observations._obs_colspecs,
+        header=None,
+        encoding="ISO-8859-1",
+        names=observations._obs_names,
+        converters=observations._obs_converters,
+        na_values=observations._obs_na_values,
+        comment=None,
+        compression="infer",
+    )
+
+
+try:
+    text = make_text(args.lines)
+    obs_dir = "%s/20CR/version_3/observations/1969" % scratch
+    os.makedirs(obs_dir)
+    dtimes = [
+        datetime.datetime(1969, 1, 1) + datetime.timedelta(hours=6 * i)
+        for i in range(args.files)
+    ]
+    file_names = []
+    for dtime in dtimes:
+        file_name = "%s/%s_psobs_posterior.txt" % (
+            obs_dir,
+            dtime.strftime("%Y%m%d%H"),
+        )
+        if args.gzip:
+            file_name = "%s.gz" % file_name
+            with gzip.open(file_name, "wb") as f:
+                f.write(text)
+        else:
+            with open(file_name, "wb") as f:
+                f.write(text)
+        file_names.append(file_name)
+
+    start = time.time()
+    for file_name in file_names:
+        old = read_fwf(file_name)
+    old_time = time.time() - start
+    start = time.time()
+    for file_name in file_names:
+        new = fixed_width._read_fixed_width(
+            file_name,
+            colspecs=observations._obs_colspecs,
+            names=observations._obs_names,
+            converters=observations._obs_converters,
+            na_values=observations._obs_na_values,
+        )
+    new_time = time.time() - start
+    pandas.testing.assert_frame_equal(new, old.infer_objects(), check_dtype=False)
+    cached_times = []
+    for load in ("first", "cached"):
+        start = time.time()
+        for dtime in dtimes:
+            cached = twcr.load_observations_1file(dtime, version="3")
+        cached_times.append(time.time() - start)
+    pandas.testing.assert_frame_equal(cached, new)
+
+    print(
+        "%d files of %d observations%s"
+        % (args.files, args.lines, " (gzipped)" if args.gzip else "")
+    )
+    print(
+        "%12s %12s %12s %12s"
+        % ("read_fwf (s)", "numpy (s)", "1st load (s)", "cached (s)")
+    )
+    print("%12.2f %12.2f %12.2f %12.2f" % ((old_time, new_time) + tuple(cached_times)))
+finally:
+    shutil.rmtree(scratch)
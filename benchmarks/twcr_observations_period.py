@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# Benchmark loading all the 20CR observations for a long period
+#  (twcr.load_observations): the old hour-by-hour loop (to_datetime on
+#  each file's UIDs, and the result grown with pandas.concat for each
+#  file) against the period loader (assimilation times only, string
+#  UID comparisons, one concat), with different numbers of workers.
+#
+# Makes a synthetic season (6-hourly files, in the v3 layout) in a
+#  temporary $SCRATCH, so no real data is needed. Files are parsed
+#  (and cached) before the timings, so these are loads from the cache.
+#
+# Usage: python twcr_observations_period.py --days 90 --workers 1 2 4 8
+
+import os
+import argparse
+import datetime
+import random
+import tempfile
+import shutil
+import time
+import pandas
+import iris
+import iris.coord_systems
+import iris.fileformats.pp
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--days", help="Length of the period", type=int, default=90)
+parser.add_argument("--lines", help="Observations in each file", type=int, default=5000)
+parser.add_argument(
+    "--workers",
+    help="Numbers of workers to try",
+    type=int,
+    nargs="+",
+    default=[1, 2, 4, 8],
+)
+args = parser.parse_args()
+
+scratch = tempfile.mkdtemp()
+os.environ["SCRATCH"] = scratch
+import IRData.twcr as twcr
+import IRData.twcr.version_3_release.observations as observations
+
+
+# A file's worth of observation lines, with times within 3 hours of
+#  the file's time
+def make_text(dtime, n_lines):
+    rng = random.Random(1)
+    lines = []
+    for index in range(n_lines):
+        line = [" "] * 223
+        for (number, (start, end)) in enumerate(observations._obs_colspecs):
+            name = observations._obs_names[number]
+            width = end - start
+            if name == "UID":
+                value = "%s%09d" % (
+                    (dtime + datetime.timedelta(hours=rng.randint(-3, 2))).strftime(
+                        "%Y%m%d%H"
+                    ),
+                    index,
+                )
+            elif observations._obs_converters[name] is str:
+                value = "".join(rng.choice("ABCDEFGH0123456789") for i in range(width))
+            elif observations._obs_converters[name] is int:
+                value = "%d" % rng.randint(0, 8)
+            else:
+                value = "%.*f" % (max(0, min(3, width - 6)), rng.uniform(-99, 999))
+            line[start:end] = list(value[:width].rjust(width))
+        lines.append("".join(line))
+    return ("\n".join(lines) + "\n").encode("ISO-8859-1")
+
+
+# The old loader
+def hourly_load(start, end):
+    result = None
+    ct = start - datetime.timedelta(hours=3)
+    while ct < (end + datetime.timedelta(hours=3)):
+        if int(ct.hour) % 6 != 0:
+            ct = ct + datetime.timedelta(hours=1)
+            continue
+        o = observations.load_observations_1file(ct, version="3")
+        dtm = pandas.to_datetime(o.UID.str.slice(0, 10), format="%Y%m%d%H")
+        o2 = o[(dtm >= start) & (dtm < end)]
+        if result is None:
+            result = o2
+        else:
+            result = pandas.concat([result, o2])
+        ct = ct + datetime.timedelta(hours=1)
+    return result
+
+
+try:
+    start = datetime.datetime(1969, 3, 1)
+    end = start + datetime.timedelta(days=args.days)
+    dtime = start - datetime.timedelta(hours=6)
+    while dtime <= end:
+        file_name = "%s/20CR/version_3/observations/%04d/%s_psobs_posterior.txt" % (
+            scratch,
+            dtime.year,
+            dtime.strftime("%Y%m%d%H"),
+        )
+        if not os.path.isdir(os.path.dirname(file_name)):
+            os.makedirs(os.path.dirname(file_name))
+        with open(file_name, "wb") as f:
+            f.write(make_text(dtime, args.lines))
+        observations.load_observations_1file(dtime, version="3")
+        dtime = dtime + datetime.timedelta(hours=6)
+
+    t0 = time.time()
+    old = hourly_load(start, end)
+    old_time = time.time() - t0
+    print("%d days, %d observations" % (args.days, len(old.index)))
+    print("%12s %12s" % ("workers", "time (s)"))
+    print("%12s %12.2f" % ("old", old_time))
+    for workers in args.workers:
+        t0 = time.time()
+        new = twcr.load_observations(start, end, version="3", workers=workers)
+        print("%12d %12.2f" % (workers, time.time() - t0))
+    pandas.testing.assert_frame_equal(new, old)
+finally:
+    shutil.rmtree(scratch)
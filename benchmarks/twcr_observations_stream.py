@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+# Benchmark getting the 20CR observations for each frame of an
+#  animation: twcr.load_observations_fortime for every frame (reads the
+#  files around each frame, every time) against a stream
+#  (twcr.observations_stream - keeps the files in use, and reads the
+#  next one in the background), with and without reading ahead.
+#
+# Makes synthetic observations files (6-hourly, in the v3 layout) in a
+#  temporary $SCRATCH, so no real data is needed. Files are parsed
+#  (and cached) before the timings, so these are loads from the cache -
+#  unless --uncached, when the caches are removed before each timing
+#  (so each file is parsed the first time it's read). Set --render to spend some time on each frame (as plotting it
+#  would), to see the reading ahead overlap with it.
+#
+# Usage: python twcr_observations_stream.py --days 2 --minutes 15 --render 0.05
+
+import os
+import argparse
+import datetime
+import random
+import tempfile
+import shutil
+import time
+import pandas
+import iris
+import iris.coord_systems
+import iris.fileformats.pp
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--days", help="Length of the animation", type=int, default=2)
+parser.add_argument("--minutes", help="Time between frames", type=int, default=15)
+parser.add_argument(
+    "--lines", help="Observations in each file", type=int, default=20000
+)
+parser.add_argument(
+    "--render", help="Time spent on each frame (s)", type=float, default=0.0
+)
+parser.add_argument(
+    "--uncached", help="Parse the files in each timing", action="store_true"
+)
+args = parser.parse_args()
+
+scratch = tempfile.mkdtemp()
+os.environ["SCRATCH"] = scratch
+import IRData.twcr as twcr
+import IRData.twcr.version_3_release.observations as observations
+
+
+# A file's worth of observation lines, with times within 3 hours of
+#  the file's time
+def make_text(dtime, n_lines):
+    rng = random.Random(1)
+    lines = []
+    for index in range(n_lines):
+        line = [" "] * 223
+        for (number, (start, end)) in enumerate(observations._obs_colspecs):
+            name = observations._obs_names[number]
+            width = end - start
+            if name == "UID":
+                value = "%s%09d" % (
+                    (dtime + datetime.timedelta(hours=rng.randint(-3, 2))).strftime(
+                        "%Y%m%d%H"
+                    ),
+                    index,
+                )
+            elif observations._obs_converters[name] is str:
+                value = "".join(rng.choice("ABCDEFGH0123456789") for i in range(width))
+            elif observations._obs_converters[name] is int:
+                value = "%d" % rng.randint(0, 8)
+            else:
+                value = "%.*f" % (max(0, min(3, width - 6)), rng.uniform(-99, 999))
+            line[start:end] = list(value[:width].rjust(width))
+        lines.append("".join(line))
+    return ("\n".join(lines) + "\n").encode("ISO-8859-1")
+
+
+def remove_caches():
+    if not args.uncached:
+        return
+    for (dir_name, dirs, files) in os.walk(scratch):
+        for file_name in files:
+            if file_name.endswith(".npy"):
+                os.remove(os.path.join(dir_name, file_name))
+
+
+try:
+    start = datetime.datetime(1969, 3, 1)
+    end = start + datetime.timedelta(days=args.days)
+    dtime = start
+    while dtime <= end + datetime.timedelta(hours=6):
+        file_name = "%s/20CR/version_3/observations/%04d/%s_psobs_posterior.txt" % (
+            scratch,
+            dtime.year,
+            dtime.strftime("%Y%m%d%H"),
+        )
+        if not os.path.isdir(os.path.dirname(file_name)):
+            os.makedirs(os.path.dirname(file_name))
+        with open(file_name, "wb") as f:
+            f.write(make_text(dtime, args.lines))
+        observations.load_observations_1file(dtime, version="3")
+        dtime = dtime + datetime.timedelta(hours=6)
+    frames = []
+    dtime = start
+    while dtime < end:
+        frames.append(dtime)
+        dtime = dtime + datetime.timedelta(minutes=args.minutes)
+
+    print(
+        "%d frames, %d observations in each file, %.2f s rendering each frame"
+        % (len(frames), args.lines, args.render)
+    )
+    print("%24s %12s" % ("", "time (s)"))
+    remove_caches()
+    t0 = time.time()
+    for v_time in frames:
+        expected = twcr.load_observations_fortime(v_time, version="3")
+        time.sleep(args.render)
+    print("%24s %12.2f" % ("load_observations_fortime", time.time() - t0))
+    for prefetch in (False, True):
+        remove_caches()
+        t0 = time.time()
+        with twcr.observations_stream(version="3", prefetch=prefetch) as stream:
+            for v_time in frames:
+                o = stream.load_observations_fortime(v_time)
+                time.sleep(args.render)
+        print(
+            "%24s %12.2f"
+            % (("stream", "stream, reading ahead")[prefetch], time.time() - t0)
+        )
+    pandas.testing.assert_frame_equal(o, expected)
+finally:
+    shutil.rmtree(scratch)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+# Benchmark finding the 20CRv3 member files for one (interpolated,
+#  all-member) load: checking each file name on disc, as
+#  version_3_release.utils used to, against looking the names up in
+#  the (cached) directory listing.
+#
+# Counts the stat calls each way, and times them - locally, and with
+#  an added delay for each stat to stand in for a slow (parallel)
+#  file system, where each one is a round-trip to a metadata server.
+#
+# Usage: python twcr_v3_file_index.py --stat-ms 0 1 5
+
+import os
+import argparse
+import tempfile
+import shutil
+import time
+from unittest.mock import patch
+import iris
+import iris.coord_systems
+import iris.fileformats.pp
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--stat-ms",
+    help="Added delay for each stat (ms)",
+    type=float,
+    nargs="+",
+    default=[0, 1, 5],
+)
+parser.add_argument("--repeats", help="Timings for each case", type=int, default=5)
+args = parser.parse_args()
+
+scratch = tempfile.mkdtemp()
+os.environ["SCRATCH"] = scratch
+import IRData.twcr.version_3_release.utils as utils
+
+
+# One member file name, checking the disc (the old way)
+def probed_file_name(variable, year, month, member):
+    name = "%s/%04d/%s.%04d%02d_mem%03d.nc" % (
+        utils._get_data_dir(),
+        year,
+        variable,
+        year,
+        month,
+        member,
+    )
+    if not os.path.isfile(name):
+        name = "%s/%04d/%s.%04d_mem%03d.nc" % (
+            utils._get_data_dir(),
+            year,
+            variable,
+            year,
+            member,
+        )
+    return name
+
+
+# File names for an interpolated all-member load - two timesteps
+def probed_load():
+    for timestep in range(2):
+        for member in range(1, 81):
+            probed_file_name("PRMSL", 1969, 3, member)
+
+
+def indexed_load():
+    with utils._dir_snapshot():
+        for timestep in range(2):
+            utils._get_available_packed_file_name("PRMSL", 1969, 3)
+            for member in range(1, 81):
+                utils._get_data_file_name("PRMSL", 1969, 3, member=member)
+
+
+# Best time, and number of stat calls, for a load
+def time_load(load, stat_ms):
+    real_stat = os.stat
+    count = [0]
+
+    def slow_stat(*args, **kwargs):
+        count[0] += 1
+        time.sleep(stat_ms / 1000.0)
+        return real_stat(*args, **kwargs)
+
+    best = None
+    for repeat in range(args.repeats):
+        count[0] = 0
+        with patch.object(os, "stat", side_effect=slow_stat):
+            start = time.time()
+            load()
+            elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return (best, count[0])
+
+
+try:
+    data_dir = "%s/1969" % utils._get_data_dir()
+    os.makedirs(data_dir)
+    for member in range(1, 81):
+        open("%s/PRMSL.1969_mem%03d.nc" % (data_dir, member), "w").close()
+    # Listing cached from here on, as it would be after the first load
+    then = time.time() - 10
+    os.utime(data_dir, (then, then))
+    indexed_load()
+    print(
+        "%8s %8s %12s %8s %12s %12s"
+        % ("stat ms", "stats", "probed (ms)", "stats", "indexed (ms)", "saved (ms)")
+    )
+    for stat_ms in args.stat_ms:
+        (probed, n_probed) = time_load(probed_load, stat_ms)
+        (indexed, n_indexed) = time_load(indexed_load, stat_ms)
+        print(
+            "%8.1f %8d %12.2f %8d %12.2f %12.2f"
+            % (
+                stat_ms,
+                n_probed,
+                probed * 1000,
+                n_indexed,
+                indexed * 1000,
+                (probed - indexed) * 1000,
+            )
+        )
+finally:
+    shutil.rmtree(scratch)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# Benchmark loading all 80 members of a 20CRv3 field, with different
+#  numbers of parallel readers (IRData.twcr.load(..., workers=n)).
+#
+# Makes a set of synthetic member files (one per member, as in the
+#  v3 release) in a temporary $SCRATCH, so no real data is needed.
+#
+# With workers, each member file is opened and read in a worker
+#  process (one set of processes for each load), so any speed-up
+#  needs as many CPUs (and disc bandwidth) as workers - on one CPU the
+#  workers only add the cost of starting them and pickling the data
+#  back. Measured so far only on one CPU (--nlat 46 --nlon 90):
+#  1 worker 1.45 s (3-hourly) 2.37 s (interpolated), 2 workers 1.37 s
+#  2.31 s, 4 workers 1.91 s 3.22 s - no multi-core numbers yet.
+#
+# Usage: python twcr_v3_members.py --workers 1 2 4 8 16 [--packed]
+
+import os
+import sys
+import argparse
+import datetime
+import tempfile
+import shutil
+import time
+import numpy
+import iris
+import iris.coords
+import iris.cube
+import iris.coord_systems
+import iris.fileformats.pp
+import cf_units
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--workers",
+    help="Numbers of workers to try",
+    type=int,
+    nargs="+",
+    default=[1, 2, 4, 8, 16],
+)
+parser.add_argument("--nlat", help="Grid latitudes", type=int, default=181)
+parser.add_argument("--nlon", help="Grid longitudes", type=int, default=360)
+parser.add_argument("--repeats", help="Timings for each case", type=int, default=3)
+parser.add_argument(
+    "--packed", help="Also time loads from a repacked file", action="store_true"
+)
+args = parser.parse_args()
+
+scratch = tempfile.mkdtemp()
+os.environ["SCRATCH"] = scratch
+import IRData.twcr as twcr
+
+
+# One month (3-hourly) of one member
+def make_member_file(member):
+    file_name = "%s/20CR/version_3/1969/PRMSL.196903_mem%03d.nc" % (scratch, member)
+    if not os.path.isdir(os.path.dirname(file_name)):
+        os.makedirs(os.path.dirname(file_name))
+    hours = [
+        (datetime.datetime(1969, 3, 1) - datetime.datetime(1800, 1, 1)).total_seconds()
+        / 3600
+        + h
+        for h in range(0, 31 * 24, 3)
+    ]
+    time = iris.coords.DimCoord(
+        hours,
+        standard_name="time",
+        units=cf_units.Unit("hours since 1800-01-01 00:00:0.0", calendar="gregorian"),
+    )
+    latitude = iris.coords.DimCoord(
+        numpy.linspace(-90, 90, args.nlat), standard_name="latitude", units="degrees"
+    )
+    longitude = iris.coords.DimCoord(
+        numpy.linspace(0, 359, args.nlon), standard_name="longitude", units="degrees"
+    )
+    cube = iris.cube.Cube(
+        numpy.random.rand(len(hours), args.nlat, args.nlon).astype(numpy.float32)
+        + member,
+        var_name="PRMSL",
+        units="Pa",
+        dim_coords_and_dims=[(time, 0), (latitude, 1), (longitude, 2)],
+    )
+    iris.save(cube, file_name, saver="nc")
+
+
+# Best times to load 3-hourly and interpolated fields
+def time_loads(workers=None):
+    timings = []
+    for dtime in (
+        datetime.datetime(1969, 3, 12, 6),
+        datetime.datetime(1969, 3, 12, 7),
+    ):
+        best = None
+        for repeat in range(args.repeats):
+            start = time.time()
+            field = twcr.load("PRMSL", dtime, version="3", workers=workers)
+            field.data  # Include reading the data
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        timings.append(best)
+    return timings
+
+
+try:
+    for member in range(1, 81):
+        make_member_file(member)
+    print("%d CPUs" % os.cpu_count())
+    print("%8s %12s %12s" % ("workers", "3-hourly (s)", "interp. (s)"))
+    for workers in args.workers:
+        timings = time_loads(workers)
+        print("%8d %12.2f %12.2f" % (workers, timings[0], timings[1]))
+    if args.packed:
+        start = time.time()
+        twcr.version_3_release.repack("PRMSL", 1969, 3)
+        print("Repacked in %.2f s" % (time.time() - start))
+        timings = time_loads()
+        print("%8s %12.2f %12.2f" % ("packed", timings[0], timings[1]))
+finally:
+    shutil.rmtree(scratch)